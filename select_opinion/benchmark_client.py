@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+观点筛选客户端基准测试
+使用本地模拟服务，离线测量不同并发度下的吞吐量和延迟
+"""
+
+import json
+import time
+import asyncio
+import argparse
+from llm_client import AsyncLLMClient
+from stub_server import StubLLMServer
+from opinion_selector import OpinionSelector, load_transcript
+
+
+async def run_level(sentences, concurrency: int, args) -> dict:
+    """在指定并发度下执行一轮筛选"""
+    server = StubLLMServer(latency=args.latency, jitter=args.jitter,
+                           error_rate=args.error_rate, seed=0)
+    await server.start()
+    client = AsyncLLMClient(api_key="mock", base_url=server.base_url, model="mock",
+                            concurrency=concurrency, rate_limit=args.rate_limit,
+                            backoff_base=0.05)
+    try:
+        start = time.perf_counter()
+        selected, summary = await OpinionSelector(client).select(sentences)
+        elapsed = time.perf_counter() - start
+    finally:
+        await client.close()
+        await server.stop()
+
+    llm = summary["llm"]
+    return {
+        "concurrency": concurrency,
+        "seconds": elapsed,
+        "requests_per_second": llm["requests"] / elapsed if elapsed else 0.0,
+        "latency_p50": llm["latency_p50"],
+        "latency_p95": llm["latency_p95"],
+        "retries": llm["retries"],
+        "failures": llm["failures"],
+        "connections": server.stats["connections"],
+        "selected": len(selected),
+    }
+
+
+async def run_benchmark(args) -> list:
+    sentences = load_transcript(args.transcript)
+    results = []
+    for concurrency in args.concurrency:
+        result = await run_level(sentences, concurrency, args)
+        results.append(result)
+        print(f"并发 {concurrency:>3}: {result['seconds']:.2f}s, "
+              f"{result['requests_per_second']:.1f} 请求/秒, "
+              f"p50 {result['latency_p50'] * 1000:.0f}ms, p95 {result['latency_p95'] * 1000:.0f}ms, "
+              f"重试 {result['retries']}, 连接 {result['connections']}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="观点筛选客户端离线基准测试")
+    parser.add_argument("transcript", help="转录JSON文件（如 ../video_to_text/test_transcript.json）")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32],
+                       help="要测试的并发度（默认: 1 2 4 8 16 32）")
+    parser.add_argument("--latency", type=float, default=0.2, help="模拟服务延迟（秒），默认: 0.2")
+    parser.add_argument("--jitter", type=float, default=0.1, help="模拟服务延迟抖动（秒），默认: 0.1")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="模拟服务错误率（默认: 0）")
+    parser.add_argument("--rate-limit", type=float, default=None, help="客户端限流（请求/秒）")
+    parser.add_argument("-o", "--output", help="将结果保存为JSON文件")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_benchmark(args))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+观点去重基准测试
+测量 MinHash 签名速度，以及 LSH 索引在 10^3 到 10^6 个段落规模下的建索引和查询耗时、召回率
+"""
+
+import json
+import time
+import argparse
+import numpy as np
+from dedup import MinHasher, LSHIndex, NUM_PERM, NUM_BANDS
+from opinion_selector import load_transcript
+
+
+def measure_signatures(transcript: str, repeat: int) -> dict:
+    """用真实转录文本测量签名速度"""
+    texts = [s.get("text", "") for s in load_transcript(transcript)] * repeat
+    hasher = MinHasher()
+    start = time.perf_counter()
+    hasher.signatures(texts)
+    elapsed = time.perf_counter() - start
+    return {"texts": len(texts), "seconds": elapsed, "per_text_us": elapsed / len(texts) * 1e6}
+
+
+def planted_queries(signatures: np.ndarray, count: int, similarity: float,
+                    rng: np.random.Generator) -> tuple:
+    """
+    从库中随机抽取签名并替换一部分取值，模拟估计相似度约为 similarity 的近似重复
+
+    不相关段落的 MinHash 取值几乎独立，因此库本身用随机签名代替
+    """
+    targets = rng.choice(len(signatures), size=count, replace=False)
+    queries = signatures[targets].copy()
+    changed = rng.random(queries.shape) > similarity
+    queries[changed] = rng.integers(0, 1 << 31, size=int(changed.sum()), dtype=np.uint32)
+    return queries, targets
+
+
+def run_size(size: int, args, rng: np.random.Generator) -> dict:
+    corpus = rng.integers(0, 1 << 31, size=(size, NUM_PERM), dtype=np.uint32)
+    queries, targets = planted_queries(corpus, args.queries, args.similarity, rng)
+
+    index = LSHIndex(NUM_PERM, args.bands)
+    start = time.perf_counter()
+    index.add(corpus)
+    index.candidates(queries[:1])  # 触发排序建索引
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    best, _ = index.query(queries, args.threshold)
+    query = time.perf_counter() - start
+    candidates = len(index.candidates(queries)[0])
+
+    result = {
+        "size": size,
+        "build_seconds": build,
+        "query_ms_per_1k": query / len(queries) * 1000 * 1000,
+        "candidates_per_query": candidates / len(queries),
+        "recall": float((best == targets).mean()),
+    }
+    if size <= args.brute_force_max:
+        start = time.perf_counter()
+        for q in queries:
+            (corpus == q).mean(axis=1).argmax()
+        result["brute_ms_per_1k"] = (time.perf_counter() - start) / len(queries) * 1000 * 1000
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="观点去重基准测试")
+    parser.add_argument("--transcript", default="../video_to_text/test_transcript.json",
+                       help="用于测量签名速度的转录文件")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6],
+                       help="索引规模（默认: 1e3 1e4 1e5 1e6）")
+    parser.add_argument("--queries", type=int, default=1000, help="每个规模的查询数（默认: 1000）")
+    parser.add_argument("--similarity", type=float, default=0.8, help="植入重复的相似度（默认: 0.8）")
+    parser.add_argument("--threshold", type=float, default=0.6, help="判定重复的相似度阈值（默认: 0.6）")
+    parser.add_argument("--bands", type=int, default=NUM_BANDS, help=f"LSH 分段数（默认: {NUM_BANDS}）")
+    parser.add_argument("--brute-force-max", type=int, default=10 ** 5,
+                       help="不超过该规模时同时测量逐个比较的耗时（默认: 1e5）")
+    parser.add_argument("-o", "--output", help="把结果写入JSON文件")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    signature_stats = measure_signatures(args.transcript, 20)
+    print(f"签名: {signature_stats['texts']} 段, 每段 {signature_stats['per_text_us']:.0f}µs")
+
+    results = []
+    for size in args.sizes:
+        result = run_size(size, args, rng)
+        results.append(result)
+        line = (f"规模 {size:>8}: 建索引 {result['build_seconds']:.2f}s, "
+                f"查询 {result['query_ms_per_1k']:.1f}ms/千次, "
+                f"候选 {result['candidates_per_query']:.2f}/次, 召回 {result['recall'] * 100:.1f}%")
+        if "brute_ms_per_1k" in result:
+            line += f", 逐个比较 {result['brute_ms_per_1k']:.0f}ms/千次"
+        print(line)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"signatures": signature_stats, "lsh": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
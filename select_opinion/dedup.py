@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+跨视频观点去重
+用字符 shingle 的 MinHash 签名和 LSH 分桶查找近似重复的段落，
+同一位嘉宾在不同节目里的相同观点只保留一次（或标注为重复），避免重复裁剪
+"""
+
+import os
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+SHINGLE_SIZE = 4
+NUM_PERM = 128
+NUM_BANDS = 32
+
+# 2^31 - 1：哈希系数 a < 2^31、shingle 哈希 < 2^32，乘积不会超出 uint64
+_PRIME = np.uint64((1 << 31) - 1)
+_MASK32 = np.uint64(0xFFFFFFFF)
+
+
+def normalize_text(text: str) -> str:
+    """去掉空白、统一小写，ASR 断句差异不影响 shingle"""
+    return "".join(text.split()).lower()
+
+
+def shingle_hashes(text: str, size: int = SHINGLE_SIZE) -> np.ndarray:
+    """
+    计算文本所有长度为 size 的字符 shingle 的 32 位哈希（去重后）
+
+    Args:
+        text: 文本
+        size: shingle 长度（字符数）
+
+    Returns:
+        np.ndarray: uint64 数组，取值小于 2^32
+    """
+    codes = np.frombuffer(normalize_text(text).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    if len(codes) == 0:
+        return np.zeros(1, dtype=np.uint64)
+    size = min(size, len(codes))
+    # 多项式滚动哈希，uint64 溢出即为对 2^64 取模
+    powers = np.uint64(1000003) ** np.arange(size - 1, -1, -1, dtype=np.uint64)
+    windows = sliding_window_view(codes, size)
+    return np.unique((windows * powers).sum(axis=1) & _MASK32)
+
+
+class MinHasher:
+    """MinHash 签名计算"""
+
+    def __init__(self, num_perm: int = NUM_PERM, shingle_size: int = SHINGLE_SIZE, seed: int = 1):
+        """
+        Args:
+            num_perm: 签名长度（哈希函数个数）
+            shingle_size: shingle 长度（字符数）
+            seed: 哈希函数的随机种子，持久化的索引必须使用相同的种子
+        """
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.seed = seed
+        self._a = rng.integers(1, int(_PRIME), size=num_perm, dtype=np.uint64)[:, None]
+        self._b = rng.integers(0, int(_PRIME), size=num_perm, dtype=np.uint64)[:, None]
+
+    def signature(self, text: str) -> np.ndarray:
+        """单个文本的签名：每个哈希函数在所有 shingle 上的最小值"""
+        hashes = shingle_hashes(text, self.shingle_size)[None, :]
+        return ((self._a * hashes + self._b) % _PRIME).min(axis=1).astype(np.uint32)
+
+    def signatures(self, texts: List[str]) -> np.ndarray:
+        """多个文本的签名矩阵 (文本数 × num_perm)"""
+        result = np.empty((len(texts), self.num_perm), dtype=np.uint32)
+        for i, text in enumerate(texts):
+            result[i] = self.signature(text)
+        return result
+
+
+class LSHIndex:
+    """
+    MinHash 签名的 LSH 索引
+
+    签名分成 num_bands 段，每段哈希为一个桶键；每段的桶键排序存放，
+    查询时二分查找，复杂度与已有段落数呈对数关系
+    """
+
+    def __init__(self, num_perm: int = NUM_PERM, num_bands: int = NUM_BANDS):
+        if num_perm % num_bands:
+            raise ValueError("num_perm 必须是 num_bands 的整数倍")
+        self.num_perm = num_perm
+        self.num_bands = num_bands
+        self.rows = num_perm // num_bands
+        self._signatures = np.empty((0, num_perm), dtype=np.uint32)
+        self._pending: List[np.ndarray] = []
+        self._sorted: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        rng = np.random.default_rng(0)
+        self._band_mult = rng.integers(1, 1 << 62, size=self.rows, dtype=np.uint64) | np.uint64(1)
+
+    def __len__(self) -> int:
+        return len(self._signatures) + sum(len(p) for p in self._pending)
+
+    @property
+    def signatures(self) -> np.ndarray:
+        self._flush()
+        return self._signatures
+
+    def band_keys(self, signatures: np.ndarray) -> np.ndarray:
+        """每个签名每一段的桶键 (签名数 × num_bands)，uint64"""
+        bands = signatures.astype(np.uint64).reshape(len(signatures), self.num_bands, self.rows)
+        return (bands * self._band_mult).sum(axis=2)
+
+    def add(self, signatures: np.ndarray):
+        """追加签名，下标按追加顺序递增"""
+        if len(signatures):
+            self._pending.append(np.asarray(signatures, dtype=np.uint32))
+            self._sorted = None
+
+    def keep(self, mask: np.ndarray):
+        """只保留 mask 为 True 的签名（下标随之重新编号）"""
+        self._signatures = self.signatures[mask]
+        self._sorted = None
+
+    def _flush(self):
+        if self._pending:
+            self._signatures = np.concatenate([self._signatures] + self._pending)
+            self._pending = []
+
+    def _build(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self._sorted is None:
+            keys = self.band_keys(self.signatures)
+            order = np.argsort(keys, axis=0, kind="stable")
+            self._sorted = (np.take_along_axis(keys, order, axis=0), order)
+        return self._sorted
+
+    def candidates(self, signatures: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        查找至少有一段桶键相同的候选对
+
+        Returns:
+            tuple: (查询下标数组, 索引中的下标数组)，已去重
+        """
+        if len(self) == 0 or len(signatures) == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+        sorted_keys, order = self._build()
+        query_keys = self.band_keys(signatures)
+        queries, matches = [], []
+        for band in range(self.num_bands):
+            column = sorted_keys[:, band]
+            lo = np.searchsorted(column, query_keys[:, band], side="left")
+            hi = np.searchsorted(column, query_keys[:, band], side="right")
+            counts = hi - lo
+            total = int(counts.sum())
+            if total == 0:
+                continue
+            # 把每个查询命中的 [lo, hi) 区间展开成一维下标
+            starts = np.repeat(lo - (np.cumsum(counts) - counts), counts)
+            queries.append(np.repeat(np.arange(len(signatures)), counts))
+            matches.append(order[starts + np.arange(total), band])
+        if not queries:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+        pairs = np.unique(np.stack([np.concatenate(queries), np.concatenate(matches)]), axis=1)
+        return pairs[0], pairs[1]
+
+    def query(self, signatures: np.ndarray, threshold: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        为每个查询找到估计 Jaccard 相似度最高且不低于阈值的已有签名
+
+        Returns:
+            tuple: (匹配下标数组，无匹配为 -1, 相似度数组)
+        """
+        best = np.full(len(signatures), -1, dtype=np.int64)
+        similarity = np.zeros(len(signatures))
+        queries, matches = self.candidates(signatures)
+        if len(queries) == 0:
+            return best, similarity
+        scores = (self.signatures[matches] == signatures[queries]).mean(axis=1)
+        hit = scores >= threshold
+        queries, matches, scores = queries[hit], matches[hit], scores[hit]
+        # 每个查询取相似度最高的匹配
+        order = np.lexsort((-scores, queries))
+        queries, first = np.unique(queries[order], return_index=True)
+        best[queries] = matches[order][first]
+        similarity[queries] = scores[order][first]
+        return best, similarity
+
+
+class DuplicateIndex:
+    """可持久化的跨视频段落去重索引"""
+
+    def __init__(self, num_perm: int = NUM_PERM, num_bands: int = NUM_BANDS,
+                 shingle_size: int = SHINGLE_SIZE, seed: int = 1):
+        self.hasher = MinHasher(num_perm, shingle_size, seed)
+        self.lsh = LSHIndex(num_perm, num_bands)
+        self.entries: List[Dict[str, Any]] = []
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def remove_source(self, source: str) -> int:
+        """删除某个视频的全部段落（重新筛选同一视频时先清除旧结果）"""
+        mask = np.array([entry["video"] != source for entry in self.entries], dtype=bool)
+        removed = int(len(mask) - mask.sum())
+        if removed:
+            self.lsh.keep(mask)
+            self.entries = [entry for entry, keep in zip(self.entries, mask) if keep]
+        return removed
+
+    def deduplicate(self, sentences: List[Dict[str, Any]], source: str,
+                    threshold: float = 0.6, mode: str = "drop") -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        对一个视频的入选段落去重，并把保留下来的段落加入索引
+
+        与已有视频或本视频中更早的段落近似重复的段落：
+        mode="drop" 时直接丢弃；mode="link" 时保留并添加 duplicate_of 字段，video_clipper 会跳过它们
+
+        Args:
+            sentences: 入选段落
+            source: 视频名（转录文件名去掉 _transcript 后缀）
+            threshold: 估计 Jaccard 相似度阈值
+            mode: drop 或 link
+
+        Returns:
+            tuple: (处理后的段落列表, 统计信息)
+        """
+        start = time.perf_counter()
+        self.remove_source(source)
+        signatures = self.hasher.signatures([s.get("text", "") for s in sentences])
+        best, similarity = self.lsh.query(signatures, threshold)
+
+        result = []
+        duplicates = 0
+        added: List[int] = []
+        for i, sentence in enumerate(sentences):
+            match, score = None, 0.0
+            if best[i] >= 0:
+                match, score = self.entries[best[i]], float(similarity[i])
+            elif added:
+                # 与本视频中已保留的段落比较（段落数很少，直接比较签名）
+                scores = (signatures[added] == signatures[i]).mean(axis=1)
+                k = int(np.argmax(scores))
+                if scores[k] >= threshold:
+                    match, score = self._entry(sentences[added[k]], source), float(scores[k])
+            if match is None:
+                added.append(i)
+                result.append(sentence)
+                continue
+            duplicates += 1
+            if mode == "link":
+                result.append(dict(sentence, duplicate_of=dict(match, similarity=round(score, 3))))
+
+        self.lsh.add(signatures[added])
+        self.entries.extend(self._entry(sentences[i], source) for i in added)
+        stats = {
+            "paragraphs": len(sentences),
+            "duplicates": duplicates,
+            "indexed": len(self.entries),
+            "milliseconds": (time.perf_counter() - start) * 1000,
+        }
+        return result, stats
+
+    @staticmethod
+    def _entry(sentence: Dict[str, Any], source: str) -> Dict[str, Any]:
+        return {"video": source, "id": sentence.get("id"),
+                "start_time": sentence.get("start_time"), "end_time": sentence.get("end_time")}
+
+    def save(self, path: str):
+        """原子地保存索引（签名矩阵和段落信息）"""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, signatures=self.lsh.signatures,
+                     entries=np.array(json.dumps(self.entries, ensure_ascii=False)),
+                     params=np.array([self.hasher.num_perm, self.lsh.num_bands,
+                                      self.hasher.shingle_size, self.hasher.seed]))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "DuplicateIndex":
+        """读取索引，文件不存在时返回空索引"""
+        if not os.path.exists(path):
+            return cls()
+        with np.load(path) as data:
+            num_perm, num_bands, shingle_size, seed = (int(v) for v in data["params"])
+            index = cls(num_perm, num_bands, shingle_size, seed)
+            index.lsh.add(data["signatures"])
+            index.entries = json.loads(str(data["entries"]))
+        return index
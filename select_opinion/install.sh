@@ -26,7 +26,7 @@ echo "检查依赖安装..."
 python3 -c "
 try:
     import openai
-    import requests
+    import httpx
     print('✅ 所有依赖安装成功')
 except ImportError as e:
     print(f'❌ 依赖安装失败: {e}')
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步大模型客户端
+基于 OpenAI 兼容接口，支持连接池、并发上限、令牌桶限流和指数退避重试
+"""
+
+import time
+import random
+import asyncio
+from typing import Any, Dict, List, Optional
+import httpx
+import openai
+
+# 预置的模型服务（均为 OpenAI 兼容接口）
+MODEL_PRESETS = {
+    "deepseek": {
+        "base_url": "https://api.deepseek.com",
+        "model": "deepseek-chat",
+        "api_key_env": "DEEPSEEK_API_KEY",
+    },
+    "openai": {
+        "base_url": "https://api.openai.com/v1",
+        "model": "gpt-4o-mini",
+        "api_key_env": "OPENAI_API_KEY",
+    },
+    "qwen": {
+        "base_url": "https://dashscope.aliyuncs.com/compatible-mode/v1",
+        "model": "qwen-plus",
+        "api_key_env": "DASHSCOPE_API_KEY",
+    },
+}
+
+# 可重试的错误：限流、服务端错误、超时和连接错误
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+)
+
+
+class TokenBucket:
+    """令牌桶限流器"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        初始化令牌桶
+
+        Args:
+            rate: 每秒补充的令牌数（即每秒最多请求数）
+            capacity: 桶容量（允许的突发请求数），默认等于 rate
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: float = 1.0):
+        """获取令牌，令牌不足时等待"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+
+class AsyncLLMClient:
+    """带并发控制、限流和重试的异步聊天补全客户端"""
+
+    def __init__(self, api_key: str, base_url: str, model: str,
+                 concurrency: int = 8, rate_limit: Optional[float] = None,
+                 burst: Optional[float] = None, max_retries: int = 4,
+                 backoff_base: float = 0.5, backoff_max: float = 8.0,
+                 timeout: float = 60.0, temperature: float = 0.0):
+        """
+        初始化客户端
+
+        Args:
+            api_key: API密钥
+            base_url: 接口地址
+            model: 模型名称
+            concurrency: 同时进行的最大请求数，同时也是连接池大小
+            rate_limit: 每秒最多请求数，None 表示不限流
+            burst: 令牌桶容量（允许的突发请求数）
+            max_retries: 可重试错误的最大重试次数
+            backoff_base: 指数退避的初始等待时间（秒）
+            backoff_max: 单次退避的最长等待时间（秒）
+            timeout: 单次请求超时时间（秒）
+            temperature: 采样温度
+        """
+        self.model = model
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.temperature = temperature
+
+        self._http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=concurrency,
+                                max_keepalive_connections=concurrency),
+            timeout=timeout
+        )
+        # 重试由本客户端统一处理，关闭 SDK 自带的重试
+        self._client = openai.AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            max_retries=0,
+            http_client=self._http_client
+        )
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._bucket = TokenBucket(rate_limit, burst) if rate_limit else None
+
+        self.stats = {"requests": 0, "retries": 0, "failures": 0,
+                      "prompt_tokens": 0, "completion_tokens": 0}
+        self.latencies: List[float] = []
+
+    async def chat(self, messages: List[Dict[str, str]], **params: Any) -> str:
+        """
+        发送一次聊天补全请求
+
+        Args:
+            messages: 对话消息列表
+            params: 其他请求参数
+
+        Returns:
+            str: 模型回复内容
+
+        Raises:
+            openai.OpenAIError: 重试耗尽或不可重试的错误
+        """
+        params.setdefault("temperature", self.temperature)
+        attempt = 0
+        while True:
+            if self._bucket is not None:
+                await self._bucket.acquire()
+            async with self._semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await self._client.chat.completions.create(
+                        model=self.model, messages=messages, **params
+                    )
+                except RETRYABLE_ERRORS as e:
+                    error = e
+                else:
+                    self.latencies.append(time.perf_counter() - start)
+                    self.stats["requests"] += 1
+                    if response.usage is not None:
+                        self.stats["prompt_tokens"] += response.usage.prompt_tokens or 0
+                        self.stats["completion_tokens"] += response.usage.completion_tokens or 0
+                    return response.choices[0].message.content or ""
+
+            if attempt >= self.max_retries:
+                self.stats["failures"] += 1
+                raise error
+            attempt += 1
+            self.stats["retries"] += 1
+            await asyncio.sleep(self.retry_delay(attempt, error))
+
+    def retry_delay(self, attempt: int, error: Exception) -> float:
+        """计算重试等待时间：优先使用 Retry-After，否则为带抖动的指数退避"""
+        response = getattr(error, "response", None)
+        if response is not None:
+            retry_after = response.headers.get("retry-after")
+            try:
+                if retry_after is not None:
+                    return min(self.backoff_max, float(retry_after))
+            except ValueError:
+                pass
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        return delay * random.uniform(0.5, 1.5)
+
+    def summary(self) -> Dict[str, Any]:
+        """请求统计（次数、重试、延迟分位数）"""
+        latencies = sorted(self.latencies)
+
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+        return dict(self.stats,
+                    latency_p50=percentile(0.50),
+                    latency_p95=percentile(0.95),
+                    latency_max=latencies[-1] if latencies else 0.0)
+
+    async def close(self):
+        """关闭连接池"""
+        await self._client.close()
+        await self._http_client.aclose()
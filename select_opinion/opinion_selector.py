@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+观点筛选工具
+将转录结果中的段落发送给大模型，筛选出包含明确观点的段落，供视频裁剪使用
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from llm_client import AsyncLLMClient, MODEL_PRESETS
+from response_cache import ResponseCache, make_cache_key
+from stub_server import StubLLMServer
+from token_budget import estimate_tokens, pack_paragraphs
+from prefilter import ParagraphPrefilter
+from dedup import DuplicateIndex
+
+# 读取 video_to_text 生成的二进制转录格式
+TRANSCRIBER_DIR = Path(__file__).resolve().parent.parent / "video_to_text"
+
+SYSTEM_PROMPT = (
+    "你是一名财经视频编辑，负责从访谈转录文本中挑选包含明确观点的段落。"
+    "观点指嘉宾对市场、行业、公司或投资策略给出的判断、预期或建议；"
+    "主持人寒暄、介绍嘉宾、单纯复述数据的段落不算观点。"
+)
+
+USER_PROMPT_TEMPLATE = (
+    "请逐段判断以下段落是否包含明确观点，并给出0-10的观点强度评分。\n"
+    "只返回JSON，格式为 {{\"results\": [{{\"id\": 段落id, \"is_opinion\": true/false, "
+    "\"score\": 评分, \"reason\": \"简要理由\"}}]}}。\n"
+    "段落:\n{paragraphs}"
+)
+
+
+def load_env_file(path: str = ".env"):
+    """读取 .env 文件中的 KEY=VALUE 配置（不覆盖已有环境变量）"""
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#") or "=" not in line:
+                continue
+            key, value = line.split("=", 1)
+            os.environ.setdefault(key.strip(), value.strip().strip('"').strip("'"))
+
+
+def load_transcript(transcript_path: str) -> List[Dict[str, Any]]:
+    """读取 video_to_text 生成的转录（JSON 或二进制格式），返回 sentences 列表"""
+    if str(TRANSCRIBER_DIR) not in sys.path:
+        sys.path.append(str(TRANSCRIBER_DIR))
+    from transcript_binary import load_sentences
+    return load_sentences(transcript_path)
+
+
+def transcript_source(transcript_path: str) -> str:
+    """由转录文件名得到视频名（去掉 _transcript 后缀）"""
+    name = os.path.splitext(os.path.basename(transcript_path))[0]
+    return name[:-len("_transcript")] if name.endswith("_transcript") else name
+
+
+class OpinionSelector:
+    """基于大模型的观点段落筛选器"""
+
+    def __init__(self, client: AsyncLLMClient, min_score: int = 6,
+                 cache: Optional[ResponseCache] = None,
+                 token_budget: int = 0, max_batch: int = 0,
+                 prefilter: Optional[ParagraphPrefilter] = None,
+                 top_k: Optional[int] = None, prefilter_threshold: Optional[float] = None):
+        """
+        初始化观点筛选器
+
+        Args:
+            client: 异步大模型客户端
+            min_score: 入选的最低观点强度评分
+            cache: 响应缓存，None 表示不使用缓存
+            token_budget: 每个请求的 token 预算，0 表示每个段落单独请求
+            max_batch: 每个请求最多段落数，0 表示只受 token 预算限制
+            prefilter: 本地预筛选器，None 表示所有段落都交给模型判断
+            top_k: 预筛选后最多保留的段落数
+            prefilter_threshold: 预筛选的最低得分
+        """
+        self.client = client
+        self.min_score = min_score
+        self.cache = cache
+        self.token_budget = token_budget
+        self.max_batch = max_batch
+        self.prompt_tokens = estimate_tokens(SYSTEM_PROMPT + USER_PROMPT_TEMPLATE)
+        self.prefilter = prefilter
+        self.top_k = top_k
+        self.prefilter_threshold = prefilter_threshold
+
+    def cache_key(self, paragraph: Dict[str, Any]) -> str:
+        """段落判断的缓存键：段落文本、提示词模板、模型名称和参数"""
+        return make_cache_key(
+            text=paragraph["text"],
+            system_prompt=SYSTEM_PROMPT,
+            user_prompt=USER_PROMPT_TEMPLATE,
+            model=self.client.model,
+            temperature=self.client.temperature
+        )
+
+    def build_messages(self, paragraphs: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """构造请求消息，段落以 JSON 数组形式附在用户消息末尾"""
+        payload = json.dumps(
+            [{"id": p["id"], "text": p["text"]} for p in paragraphs],
+            ensure_ascii=False
+        )
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": USER_PROMPT_TEMPLATE.format(paragraphs=payload)},
+        ]
+
+    def parse_response(self, content: str) -> Dict[Any, Dict[str, Any]]:
+        """
+        解析模型回复
+
+        Returns:
+            Dict: 段落id到判断结果的映射，无法解析时为空
+        """
+        start, end = content.find("{"), content.rfind("}")
+        if start == -1 or end <= start:
+            return {}
+        try:
+            data = json.loads(content[start:end + 1])
+        except json.JSONDecodeError:
+            return {}
+        results = data.get("results", []) if isinstance(data, dict) else []
+        # 模型可能把 id 写成字符串，统一按字符串匹配
+        return {str(item.get("id")): item for item in results if isinstance(item, dict)}
+
+    async def judge(self, paragraphs: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        """
+        请求模型判断一组段落
+
+        Returns:
+            List: 与输入段落一一对应的判断结果，未获回复的位置为 None
+        """
+        try:
+            content = await self.client.chat(self.build_messages(paragraphs))
+        except Exception as e:
+            print(f"⚠️  段落 {[p['id'] for p in paragraphs]} 请求失败: {e}")
+            return [None] * len(paragraphs)
+        answers = self.parse_response(content)
+        return [answers.get(str(p["id"])) for p in paragraphs]
+
+    async def judge_batch(self, paragraphs: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        """判断一批段落，批量回复中遗漏的段落再单独请求一次"""
+        verdicts = await self.judge(paragraphs)
+        if len(paragraphs) > 1:
+            missing = [i for i, verdict in enumerate(verdicts) if verdict is None]
+            retried = await asyncio.gather(*(self.judge([paragraphs[i]]) for i in missing))
+            for i, (verdict,) in zip(missing, retried):
+                verdicts[i] = verdict
+        return verdicts
+
+    async def select(self, sentences: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        并发判断所有段落并筛选观点
+
+        Args:
+            sentences: 转录结果中的段落列表
+
+        Returns:
+            tuple: (入选段落列表, 运行统计)
+        """
+        start = time.perf_counter()
+
+        # 本地预筛选，只有得分靠前的段落才交给模型
+        candidates = list(range(len(sentences)))
+        prefilter_stats = None
+        if self.prefilter is not None:
+            candidates, prefilter_stats = self.prefilter.select(
+                sentences, top_k=self.top_k, threshold=self.prefilter_threshold)
+
+        # 先查缓存，只有新增或文本变化的段落才请求模型
+        verdicts: Dict[int, Dict[str, Any]] = {}
+        pending = []
+        for index in candidates:
+            sentence = sentences[index]
+            cached = self.cache.get(self.cache_key(sentence)) if self.cache is not None else None
+            if cached is not None:
+                verdicts[index] = cached
+            else:
+                pending.append(index)
+
+        # 按 token 预算把待判断段落打包成请求，段落在批次中的位置用于映射回原始段落
+        if self.token_budget > 0:
+            batches = pack_paragraphs([sentences[i] for i in pending], self.token_budget,
+                                      self.prompt_tokens, self.max_batch)
+        else:
+            batches = [[sentences[i]] for i in pending]
+        results = await asyncio.gather(*(self.judge_batch(batch) for batch in batches))
+        batch_verdicts = [verdict for batch_result in results for verdict in batch_result]
+
+        for index, verdict in zip(pending, batch_verdicts):
+            if verdict is None:
+                continue
+            verdicts[index] = verdict
+            if self.cache is not None:
+                self.cache.put(self.cache_key(sentences[index]),
+                               {k: v for k, v in verdict.items() if k != "id"})
+
+        selected = []
+        unanswered = 0
+        for index in candidates:
+            sentence = sentences[index]
+            verdict = verdicts.get(index)
+            if verdict is None:
+                unanswered += 1
+                continue
+            score = verdict.get("score", 0)
+            if verdict.get("is_opinion") and isinstance(score, (int, float)) and score >= self.min_score:
+                selected.append(dict(sentence, score=score, reason=verdict.get("reason", "")))
+
+        summary = {
+            "paragraphs": len(sentences),
+            "selected": len(selected),
+            "unanswered": unanswered,
+            "batches": len(batches),
+            "seconds": time.perf_counter() - start,
+            "llm": self.client.summary(),
+        }
+        if self.cache is not None:
+            summary["cache"] = self.cache.summary()
+        if prefilter_stats is not None:
+            summary["prefilter"] = prefilter_stats
+        return selected, summary
+
+
+def save_result(selected: List[Dict[str, Any]], summary: Dict[str, Any], output_path: str):
+    """保存筛选结果（sentences 字段格式与转录结果一致，可直接交给 video_clipper）"""
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            "total_sentences": len(selected),
+            "sentences": selected,
+            "summary": summary
+        }, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存: {output_path}")
+
+
+def print_summary(summary: Dict[str, Any]):
+    """打印运行统计"""
+    llm = summary["llm"]
+    print("\n📊 筛选统计:")
+    print(f"  段落总数: {summary['paragraphs']}")
+    print(f"  入选观点: {summary['selected']}")
+    if "prefilter" in summary:
+        prefilter = summary["prefilter"]
+        print(f"  预筛选保留: {prefilter['kept']}/{prefilter['paragraphs']}"
+              f"（{prefilter['milliseconds']:.1f}ms）")
+    if "dedup" in summary:
+        dedup = summary["dedup"]
+        print(f"  近似重复: {dedup['duplicates']}/{dedup['paragraphs']}"
+              f"（索引 {dedup['indexed']} 段，{dedup['milliseconds']:.1f}ms）")
+    print(f"  未获回复: {summary['unanswered']}")
+    print(f"  请求批次: {summary['batches']}")
+    print(f"  总耗时: {summary['seconds']:.2f}s")
+    print(f"  请求数: {llm['requests']}，重试: {llm['retries']}，失败: {llm['failures']}")
+    print(f"  延迟 p50/p95: {llm['latency_p50'] * 1000:.0f}ms / {llm['latency_p95'] * 1000:.0f}ms")
+    if "cache" in summary:
+        cache = summary["cache"]
+        print(f"  缓存命中: {cache['hits']}，未命中: {cache['misses']}（命中率 {cache['hit_rate'] * 100:.1f}%）")
+
+
+async def run(args) -> bool:
+    """执行观点筛选"""
+    sentences = load_transcript(args.transcript)
+    if not sentences:
+        print("转录文件中没有找到句子数据")
+        return False
+    print(f"读取到 {len(sentences)} 个段落")
+
+    stub = None
+    if args.mock:
+        stub = StubLLMServer(latency=args.mock_latency, jitter=args.mock_latency / 2)
+        await stub.start()
+        print(f"模拟模式: 使用本地模拟服务 {stub.base_url}")
+        base_url, model, api_key = stub.base_url, "mock", "mock"
+    else:
+        preset = MODEL_PRESETS[args.model]
+        api_key = os.environ.get(preset["api_key_env"])
+        if not api_key:
+            print(f"未设置API密钥: {preset['api_key_env']}（可写入 .env 文件）")
+            return False
+        base_url, model = preset["base_url"], preset["model"]
+
+    client = AsyncLLMClient(
+        api_key=api_key,
+        base_url=base_url,
+        model=model,
+        concurrency=args.concurrency,
+        rate_limit=args.rate_limit,
+        max_retries=args.max_retries
+    )
+    cache = None
+    if not args.no_cache:
+        cache = ResponseCache(args.cache, ttl=args.cache_ttl * 3600,
+                              max_bytes=int(args.cache_max_mb * 1024 * 1024))
+    try:
+        prefilter = None
+        if args.top_k is not None or args.prefilter_threshold is not None:
+            prefilter = ParagraphPrefilter()
+        selector = OpinionSelector(client, min_score=args.min_score, cache=cache,
+                                   token_budget=args.token_budget, max_batch=args.max_batch,
+                                   prefilter=prefilter, top_k=args.top_k,
+                                   prefilter_threshold=args.prefilter_threshold)
+        selected, summary = await selector.select(sentences)
+        if args.dedup:
+            dedup_index = DuplicateIndex.load(args.dedup_index)
+            selected, summary["dedup"] = dedup_index.deduplicate(
+                selected, transcript_source(args.transcript),
+                threshold=args.dedup_threshold, mode=args.dedup)
+            dedup_index.save(args.dedup_index)
+    finally:
+        if cache is not None:
+            cache.close()
+        await client.close()
+        if stub is not None:
+            await stub.stop()
+
+    save_result(selected, summary, args.output)
+    print_summary(summary)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="从转录结果中筛选观点段落")
+    parser.add_argument("transcript", help="video_to_text 生成的转录JSON文件")
+    parser.add_argument("-m", "--model", choices=list(MODEL_PRESETS), default="deepseek",
+                       help="使用的模型服务（默认: deepseek）")
+    parser.add_argument("-o", "--output", default="result.json",
+                       help="输出文件路径（默认: result.json）")
+    parser.add_argument("--mock", action="store_true",
+                       help="模拟模式，使用本地模拟服务，不调用真实API")
+    parser.add_argument("--mock-latency", type=float, default=0.2,
+                       help="模拟模式下每个请求的延迟（秒），默认: 0.2")
+    parser.add_argument("--concurrency", type=int, default=8,
+                       help="最大并发请求数（默认: 8）")
+    parser.add_argument("--rate-limit", type=float, default=None,
+                       help="每秒最多请求数（默认不限）")
+    parser.add_argument("--max-retries", type=int, default=4,
+                       help="限流/服务错误的最大重试次数（默认: 4）")
+    parser.add_argument("--min-score", type=int, default=6,
+                       help="入选的最低观点评分（默认: 6）")
+    parser.add_argument("--token-budget", type=int, default=4000,
+                       help="每个请求的 token 预算，多个段落打包发送（默认: 4000，0 表示逐段请求）")
+    parser.add_argument("--max-batch", type=int, default=0,
+                       help="每个请求最多段落数（默认: 0，不限）")
+    parser.add_argument("--top-k", type=int, default=None,
+                       help="本地预筛选后最多交给模型的段落数（默认不预筛选）")
+    parser.add_argument("--prefilter-threshold", type=float, default=None,
+                       help="本地预筛选的最低得分（默认不预筛选）")
+    parser.add_argument("--cache", default=".opinion_cache.sqlite",
+                       help="响应缓存文件（默认: .opinion_cache.sqlite）")
+    parser.add_argument("--no-cache", action="store_true",
+                       help="不使用响应缓存")
+    parser.add_argument("--cache-ttl", type=float, default=168.0,
+                       help="缓存有效期（小时），默认: 168")
+    parser.add_argument("--cache-max-mb", type=float, default=64.0,
+                       help="缓存大小上限（MB），默认: 64")
+    parser.add_argument("--dedup", choices=["drop", "link"], default=None,
+                       help="跨视频近似重复处理：drop 丢弃，link 保留并标注 duplicate_of（默认不去重）")
+    parser.add_argument("--dedup-index", default=".opinion_dedup.npz",
+                       help="去重索引文件（默认: .opinion_dedup.npz）")
+    parser.add_argument("--dedup-threshold", type=float, default=0.6,
+                       help="判定近似重复的相似度阈值（默认: 0.6）")
+
+    args = parser.parse_args()
+    load_env_file()
+
+    if not os.path.exists(args.transcript):
+        print(f"转录文件不存在: {args.transcript}")
+        sys.exit(1)
+
+    try:
+        success = asyncio.run(run(args))
+    except KeyboardInterrupt:
+        print("\n收到中断信号，退出")
+        sys.exit(1)
+
+    if not success:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
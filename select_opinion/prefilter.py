@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+段落本地预筛选
+在调用大模型之前，用字符 n-gram TF-IDF、长度和时长特征给段落打分，只保留最可能包含观点的段落
+"""
+
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+# 观点表达和寒暄用语词表（字符 n-gram）
+OPINION_TERMS = [
+    "我觉得", "我认为", "个人觉得", "我们认为", "看好", "看空", "建议", "应该", "判断",
+    "预计", "预期", "机会", "风险", "值得", "长期", "中长期", "估值", "配置", "布局",
+    "逻辑", "趋势", "拐点", "复苏", "增长", "修复", "景气", "高点", "低点", "性价比",
+    "关注", "推荐", "谨慎", "乐观", "悲观", "确定性", "空间", "弹性", "底部",
+]
+CHATTER_TERMS = [
+    "欢迎", "大家好", "感谢", "谢谢", "打个招呼", "下期", "节目", "观众", "朋友们",
+    "主持人", "今天我们", "请来了",
+]
+
+
+class ParagraphPrefilter:
+    """基于向量化特征的段落打分器"""
+
+    def __init__(self, opinion_terms: List[str] = None, chatter_terms: List[str] = None,
+                 weights: Dict[str, float] = None, min_duration: float = 10.0,
+                 min_chars: int = 40):
+        """
+        初始化预筛选器
+
+        Args:
+            opinion_terms: 观点用语词表
+            chatter_terms: 寒暄用语词表
+            weights: 各特征的权重 {"opinion", "chatter", "length", "duration"}
+            min_duration: 短于该时长（秒）的段落会被降权
+            min_chars: 少于该字数的段落会被降权
+        """
+        self.opinion_terms = list(dict.fromkeys(opinion_terms or OPINION_TERMS))
+        self.chatter_terms = list(dict.fromkeys(chatter_terms or CHATTER_TERMS))
+        self.weights = {"opinion": 1.0, "chatter": 1.0, "length": 0.5, "duration": 0.5}
+        self.weights.update(weights or {})
+        self.min_duration = min_duration
+        self.min_chars = min_chars
+
+    def features(self, sentences: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+        """
+        计算每个段落的特征
+
+        Returns:
+            Dict: 特征名到长度为段落数的数组
+        """
+        num = len(sentences)
+        texts = ["".join(s.get("text", "").split()) for s in sentences]
+        chars = np.fromiter((len(t) for t in texts), dtype=np.float64, count=num)
+
+        # 词表 n-gram 的 (段落 × 词) 计数矩阵，str.count 在 C 层完成匹配
+        terms = self.opinion_terms + self.chatter_terms
+        counts = np.array([[text.count(term) for term in terms] for text in texts],
+                          dtype=np.float64).reshape(num, len(terms))
+
+        # TF-IDF：词频按每百字归一化，IDF 压低在整篇转录中普遍出现的词
+        df = np.count_nonzero(counts, axis=0)
+        idf = np.log((1 + num) / (1 + df)) + 1
+        tfidf = counts / np.maximum(chars, 1)[:, None] * 100 * idf
+        split = len(self.opinion_terms)
+        opinion = tfidf[:, :split].sum(axis=1)
+        chatter = tfidf[:, split:].sum(axis=1)
+
+        durations = np.fromiter(
+            (s.get("end_time", 0) - s.get("start_time", 0) for s in sentences),
+            dtype=np.float64, count=num
+        )
+        return {
+            "opinion": opinion,
+            "chatter": chatter,
+            "length": np.minimum(chars / self.min_chars, 1.0),
+            "duration": np.minimum(durations / self.min_duration, 1.0),
+        }
+
+    def score(self, sentences: List[Dict[str, Any]]) -> np.ndarray:
+        """计算每个段落的综合得分（越高越可能包含观点）"""
+        if not sentences:
+            return np.zeros(0)
+        features = self.features(sentences)
+        w = self.weights
+        return (w["opinion"] * features["opinion"]
+                - w["chatter"] * features["chatter"]
+                + w["length"] * features["length"]
+                + w["duration"] * features["duration"])
+
+    def select(self, sentences: List[Dict[str, Any]], top_k: Optional[int] = None,
+               threshold: Optional[float] = None) -> Tuple[List[int], Dict[str, Any]]:
+        """
+        按得分筛选段落
+
+        Args:
+            sentences: 段落列表
+            top_k: 保留得分最高的 K 个段落
+            threshold: 保留得分不低于阈值的段落（与 top_k 同时给出时取交集）
+
+        Returns:
+            tuple: (保留段落的下标列表（按原顺序）, 统计信息)
+        """
+        start = time.perf_counter()
+        scores = self.score(sentences)
+        keep = np.ones(len(sentences), dtype=bool)
+        if threshold is not None:
+            keep &= scores >= threshold
+        if top_k is not None and top_k < len(sentences):
+            ranked = np.argsort(-scores, kind="stable")[:max(top_k, 0)]
+            top_mask = np.zeros(len(sentences), dtype=bool)
+            top_mask[ranked] = True
+            keep &= top_mask
+
+        kept = np.flatnonzero(keep).tolist()
+        stats = {
+            "paragraphs": len(sentences),
+            "kept": len(kept),
+            "dropped": len(sentences) - len(kept),
+            "milliseconds": (time.perf_counter() - start) * 1000,
+        }
+        return kept, stats
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+大模型响应缓存
+基于 SQLite 的持久化缓存，支持过期时间和按总大小的 LRU 淘汰
+"""
+
+import json
+import time
+import sqlite3
+import hashlib
+from typing import Any, Dict, Optional
+
+
+def make_cache_key(**parts: Any) -> str:
+    """对任意可序列化的组成部分计算稳定的 SHA-256 缓存键"""
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """持久化的键值缓存"""
+
+    def __init__(self, path: str, ttl: Optional[float] = 7 * 24 * 3600,
+                 max_bytes: int = 64 * 1024 * 1024):
+        """
+        初始化缓存
+
+        Args:
+            path: SQLite 数据库文件路径
+            ttl: 缓存有效期（秒），None 表示永不过期
+            max_bytes: 缓存值总大小上限，超过后淘汰最久未访问的条目
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "writes": 0}
+
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created REAL NOT NULL,"
+            " accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses(created)")
+        self._conn.commit()
+        self._total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        读取缓存
+
+        Returns:
+            缓存的值，不存在或已过期时返回 None
+        """
+        row = self._conn.execute(
+            "SELECT value, created FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        now = time.time()
+        if row is None:
+            self.stats["misses"] += 1
+            return None
+        if self.ttl is not None and now - row[1] > self.ttl:
+            self._delete(key)
+            self._conn.commit()
+            self.stats["expired"] += 1
+            self.stats["misses"] += 1
+            return None
+        self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        self.stats["hits"] += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Any):
+        """写入缓存，并在超出大小上限时淘汰旧条目"""
+        data = json.dumps(value, ensure_ascii=False)
+        size = len(data.encode("utf-8"))
+        now = time.time()
+        self._delete(key)
+        self._conn.execute(
+            "INSERT INTO responses (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+            (key, data, size, now, now)
+        )
+        self._total += size
+        self.stats["writes"] += 1
+        self.evict()
+        self._conn.commit()
+
+    def _delete(self, key: str):
+        row = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._total -= row[0]
+
+    def evict(self):
+        """删除过期条目，再按最久未访问的顺序淘汰到大小上限以内"""
+        if self.ttl is not None:
+            cutoff = time.time() - self.ttl
+            removed, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses WHERE created < ?",
+                (cutoff,)).fetchone()
+            if removed:
+                self._conn.execute("DELETE FROM responses WHERE created < ?", (cutoff,))
+                self._total -= size
+                self.stats["evictions"] += removed
+        while self._total > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY accessed LIMIT 64").fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if self._total <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._total -= size
+                self.stats["evictions"] += 1
+
+    def summary(self) -> Dict[str, Any]:
+        """缓存统计"""
+        entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return dict(self.stats,
+                    hit_rate=self.stats["hits"] / lookups if lookups else 0.0,
+                    entries=entries,
+                    bytes=self._total)
+
+    def close(self):
+        """提交并关闭数据库"""
+        self._conn.commit()
+        self._conn.close()
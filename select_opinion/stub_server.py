@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地模拟大模型服务
+提供 OpenAI 兼容的 /v1/chat/completions 接口，用于 --mock 模式和离线基准测试
+"""
+
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+from typing import Any, Dict, List, Optional
+
+# 观点类和寒暄类关键词，用于生成确定性的模拟判断
+OPINION_KEYWORDS = ["我觉得", "我认为", "个人觉得", "看好", "建议", "应该", "判断",
+                    "预计", "机会", "风险", "值得", "长期", "估值", "配置", "布局"]
+CHATTER_KEYWORDS = ["欢迎", "大家好", "感谢", "打个招呼", "谢谢", "下期"]
+
+
+def mock_judgement(paragraph: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    根据关键词给出确定性的观点判断
+
+    Args:
+        paragraph: 包含 id 和 text 的段落
+
+    Returns:
+        Dict: {"id", "is_opinion", "score", "reason"}
+    """
+    text = paragraph.get("text", "")
+    hits = [k for k in OPINION_KEYWORDS if k in text]
+    chatter = [k for k in CHATTER_KEYWORDS if k in text]
+    score = max(0, min(10, 2 * len(hits) - 3 * len(chatter)))
+    reason = f"观点关键词: {'、'.join(hits) or '无'}"
+    if chatter:
+        reason += f"；寒暄: {'、'.join(chatter)}"
+    return {"id": paragraph.get("id"), "is_opinion": score >= 6, "score": score, "reason": reason}
+
+
+def extract_paragraphs(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """从最后一条用户消息中取出段落 JSON 数组（位于消息末尾，单独成行）"""
+    for message in reversed(messages):
+        if message.get("role") != "user":
+            continue
+        content = message.get("content") or ""
+        start, end = content.rfind("\n[") + 1, content.rfind("]")
+        if start == 0 or end <= start:
+            return []
+        try:
+            data = json.loads(content[start:end + 1])
+        except json.JSONDecodeError:
+            return []
+        return [item for item in data if isinstance(item, dict)]
+    return []
+
+
+class StubLLMServer:
+    """模拟的 OpenAI 兼容聊天补全服务（支持 HTTP keep-alive）"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, seed: Optional[int] = None):
+        """
+        初始化模拟服务
+
+        Args:
+            host: 监听地址
+            port: 监听端口，0 表示由系统分配
+            latency: 每个请求的模拟延迟（秒）
+            jitter: 延迟的随机抖动幅度（秒）
+            error_rate: 返回 429/503 错误的概率，用于测试重试
+            seed: 随机种子
+        """
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self.stats = {"requests": 0, "errors": 0, "connections": 0}
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    def completion(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """生成聊天补全响应"""
+        messages = payload.get("messages") or []
+        paragraphs = extract_paragraphs(messages)
+        content = json.dumps({"results": [mock_judgement(p) for p in paragraphs]},
+                             ensure_ascii=False)
+        prompt_chars = sum(len(m.get("content") or "") for m in messages)
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_chars,
+                "completion_tokens": len(content),
+                "total_tokens": prompt_chars + len(content),
+            },
+        }
+
+    async def _handle_connection(self, reader: asyncio.StreamReader,
+                                 writer: asyncio.StreamWriter):
+        self.stats["connections"] += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    return
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0) or 0)
+                body = await reader.readexactly(length) if length else b""
+
+                status, data, extra = await self._route(method.upper(), path, body)
+                payload = json.dumps(data, ensure_ascii=False).encode("utf-8")
+                keep_alive = headers.get("connection", "").lower() != "close"
+                head = [f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}",
+                        "Content-Type: application/json",
+                        f"Content-Length: {len(payload)}",
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+                head.extend(f"{k}: {v}" for k, v in extra.items())
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + payload)
+                await writer.drain()
+                if not keep_alive:
+                    return
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method: str, path: str, body: bytes):
+        path = path.split("?", 1)[0].rstrip("/")
+        if method != "POST" or not path.endswith("/chat/completions"):
+            return 404, {"error": {"message": "not found"}}, {}
+        try:
+            payload = json.loads(body.decode("utf-8") or "{}")
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return 400, {"error": {"message": "invalid json"}}, {}
+
+        delay = self.latency + self._random.uniform(0, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if self.error_rate and self._random.random() < self.error_rate:
+            self.stats["errors"] += 1
+            if self._random.random() < 0.5:
+                return 429, {"error": {"message": "rate limited", "type": "rate_limit"}}, {"Retry-After": "0.05"}
+            return 503, {"error": {"message": "overloaded", "type": "server_error"}}, {}
+
+        self.stats["requests"] += 1
+        return 200, self.completion(payload), {}
+
+    async def start(self):
+        """启动服务"""
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        """停止服务"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+
+async def serve(server: StubLLMServer):
+    await server.start()
+    print(f"模拟大模型服务已启动: {server.base_url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟大模型服务（OpenAI 兼容）")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址（默认: 127.0.0.1）")
+    parser.add_argument("--port", type=int, default=8000, help="监听端口（默认: 8000）")
+    parser.add_argument("--latency", type=float, default=0.2, help="模拟延迟（秒），默认: 0.2")
+    parser.add_argument("--jitter", type=float, default=0.1, help="延迟抖动（秒），默认: 0.1")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="错误率（默认: 0）")
+    args = parser.parse_args()
+
+    server = StubLLMServer(args.host, args.port, args.latency, args.jitter, args.error_rate)
+    try:
+        asyncio.run(serve(server))
+    except KeyboardInterrupt:
+        print("\n收到中断信号，退出")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按 token 预算打包段落
+用本地估算的 token 数把多个段落装入同一个请求，减少重复的提示词开销
+"""
+
+from typing import Any, Dict, List
+
+# 估算系数：中文模型分词器通常约 0.6-1 个 token/汉字，其他字符约 4 个字符一个 token
+CJK_TOKENS_PER_CHAR = 1.0
+OTHER_CHARS_PER_TOKEN = 4.0
+
+# 每个段落在请求和回复中的额外开销（JSON 字段、id、判断结果）
+PARAGRAPH_OVERHEAD_TOKENS = 12
+ANSWER_TOKENS_PER_PARAGRAPH = 48
+
+
+def is_cjk(char: str) -> bool:
+    """是否为中日韩文字或全角标点"""
+    code = ord(char)
+    return (0x4E00 <= code <= 0x9FFF or 0x3400 <= code <= 0x4DBF
+            or 0x3000 <= code <= 0x303F or 0xFF00 <= code <= 0xFFEF)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    估算文本的 token 数（偏保守，宁可多估）
+
+    Args:
+        text: 文本
+
+    Returns:
+        int: 估算的 token 数
+    """
+    cjk = sum(1 for char in text if is_cjk(char))
+    other = len(text) - cjk
+    return int(cjk * CJK_TOKENS_PER_CHAR + other / OTHER_CHARS_PER_TOKEN + 0.999)
+
+
+def paragraph_cost(paragraph: Dict[str, Any]) -> int:
+    """单个段落占用的预算：正文、结构开销和预计的回复长度"""
+    return estimate_tokens(paragraph["text"]) + PARAGRAPH_OVERHEAD_TOKENS + ANSWER_TOKENS_PER_PARAGRAPH
+
+
+def pack_paragraphs(paragraphs: List[Dict[str, Any]], token_budget: int,
+                    prompt_tokens: int = 0, max_paragraphs: int = 0) -> List[List[Dict[str, Any]]]:
+    """
+    按原顺序贪心地把段落装入批次，每批估算 token 数不超过预算
+
+    单个段落超过预算时单独成批
+
+    Args:
+        paragraphs: 段落列表
+        token_budget: 每个请求的 token 预算（提示词 + 段落 + 回复）
+        prompt_tokens: 每个请求固定的提示词开销
+        max_paragraphs: 每批最多段落数，0 表示不限
+
+    Returns:
+        List[List[Dict]]: 段落批次
+    """
+    batches: List[List[Dict[str, Any]]] = []
+    current: List[Dict[str, Any]] = []
+    used = prompt_tokens
+    for paragraph in paragraphs:
+        cost = paragraph_cost(paragraph)
+        full = max_paragraphs and len(current) >= max_paragraphs
+        if current and (used + cost > token_budget or full):
+            batches.append(current)
+            current = []
+            used = prompt_tokens
+        current.append(paragraph)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+裁剪 I/O 调度基准测试
+比较按观点顺序直接裁剪（当前行为）与按字节偏移调度并预读两种方式的有效吞吐量。
+
+两种模式：
+- 默认：对真实视频运行 ffmpeg 裁剪，每次运行前把源文件逐出页缓存；
+  要模拟慢速存储，可以在限速的 cgroup 中运行，例如
+  systemd-run --scope -p "IOReadBandwidthMax=/dev/sda 50M" python3 benchmark_io.py video.mp4
+- --simulate：不运行 ffmpeg，读取线程按片段的字节范围读取源文件，
+  未缓存的读取按模拟的慢速存储计时（带宽上限，非顺序请求额外付出寻址延迟）
+"""
+
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import threading
+from typing import Any, Dict, List, Tuple
+from io_scheduler import ByteIndex, ReadAheadScheduler, plan_reads, DEFAULT_PREFETCH_BYTES, PREFETCH_CHUNK_BYTES
+
+
+def random_jobs(duration: float, count: int, min_seconds: float, max_seconds: float,
+                seed: int) -> List[Tuple[Any, float, float]]:
+    """随机生成片段（顺序与时间无关，模拟观点筛选结果的顺序）"""
+    rng = random.Random(seed)
+    jobs = []
+    for i in range(count):
+        length = rng.uniform(min_seconds, max_seconds)
+        start = rng.uniform(0, max(duration - length, 0))
+        jobs.append((i, start, start + length))
+    return jobs
+
+
+def evict(path: str):
+    """把文件逐出页缓存（只影响干净页，不需要 root）"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+
+class ThrottledStorage:
+    """模拟慢速存储：按块记录已缓存的数据，未缓存的请求依次占用存储（非顺序请求额外付出寻址延迟）"""
+
+    def __init__(self, path: str, bandwidth: float, seek_seconds: float, request_seconds: float,
+                 block: int):
+        self.path = path
+        self.bandwidth = bandwidth
+        self.seek_seconds = seek_seconds
+        self.request_seconds = request_seconds
+        self.block = block
+        self.available: Dict[int, float] = {}
+        self.link_free = 0.0
+        self.last_end = None
+        self.lock = threading.Lock()
+        self.fd = os.open(path, os.O_RDONLY)
+
+    def reset(self):
+        with self.lock:
+            self.available.clear()
+            self.link_free = 0.0
+            self.last_end = None
+
+    def fetch(self, offset: int, length: int):
+        """一次存储请求：未缓存的块按带宽和延迟计时，正在传输的块等到传输完成"""
+        first, last = offset // self.block, (offset + length - 1) // self.block
+        with self.lock:
+            blocks = range(first, last + 1)
+            missing = [b for b in blocks if b not in self.available]
+            now = time.perf_counter()
+            ready = max([self.available[b] for b in blocks if b in self.available], default=now)
+            if missing:
+                latency = self.request_seconds
+                if self.last_end != missing[0] * self.block:
+                    latency += self.seek_seconds
+                done = max(now, self.link_free) + latency + len(missing) * self.block / self.bandwidth
+                self.link_free = done
+                self.last_end = (missing[-1] + 1) * self.block
+                self.available.update((b, done) for b in missing)
+                ready = max(ready, done)
+        if ready > now:
+            time.sleep(ready - now)
+        os.pread(self.fd, length, offset)
+
+    def read_range(self, begin: int, end: int, chunk: int):
+        """按 chunk 大小的请求顺序读取 [begin, end)"""
+        for offset in range(begin, end, chunk):
+            self.fetch(offset, min(chunk, end - offset))
+
+    def close(self):
+        os.close(self.fd)
+
+
+class SimulatedScheduler(ReadAheadScheduler):
+    """预读改为通过模拟存储以大块请求读取"""
+
+    def __init__(self, storage: ThrottledStorage, *args, **kwargs):
+        super().__init__(storage.path, *args, **kwargs)
+        self.storage = storage
+
+    def advise(self, fd: int, begin: int, end: int):
+        self.storage.read_range(begin, end, PREFETCH_CHUNK_BYTES)
+
+
+async def simulate_run(storage: ThrottledStorage, index: ByteIndex, jobs, args, scheduled: bool,
+                       prefetch_bytes: int) -> Dict[str, Any]:
+    loop = asyncio.get_running_loop()
+    read_bytes = 0
+
+    async def clip(job) -> bool:
+        nonlocal read_bytes
+        begin, end = index.range(job[1], job[2])
+        read_bytes += end - begin
+        await loop.run_in_executor(None, storage.read_range, begin, end, args.read_kb * 1024)
+        return True
+
+    storage.reset()
+    start = time.perf_counter()
+    if scheduled:
+        scheduler = SimulatedScheduler(storage, args.jobs, prefetch_bytes)
+        await scheduler.run(plan_reads(jobs, index), clip)
+    else:
+        readers = asyncio.Semaphore(args.jobs)
+
+        async def limited(job):
+            async with readers:
+                return await clip(job)
+        await asyncio.gather(*(limited(job) for job in jobs))
+    seconds = time.perf_counter() - start
+    return {"seconds": seconds, "bytes": read_bytes, "mb_per_second": read_bytes / seconds / 1024 / 1024}
+
+
+def run_simulation(args) -> Dict[str, Any]:
+    path = args.source
+    created = None
+    if path is None:
+        created = tempfile.NamedTemporaryFile(suffix=".bin", delete=False)
+        block = os.urandom(1024 * 1024)
+        for _ in range(args.size_mb):
+            created.write(block)
+        created.close()
+        path = created.name
+    try:
+        info = {"size": os.path.getsize(path), "duration": args.duration, "keyframe_interval": 2.0}
+        index = ByteIndex(info)
+        jobs = random_jobs(args.duration, args.clips, args.min_seconds, args.max_seconds, args.seed)
+        storage = ThrottledStorage(path, args.bandwidth_mb * 1024 * 1024, args.seek_ms / 1000,
+                                   args.request_ms / 1000, args.block_kb * 1024)
+        runs = {}
+        try:
+            for name, scheduled, prefetch in (("baseline", False, 0),
+                                              ("sorted", True, 0),
+                                              ("scheduled", True, args.prefetch_mb * 1024 * 1024)):
+                runs[name] = asyncio.run(simulate_run(storage, index, jobs, args, scheduled, prefetch))
+        finally:
+            storage.close()
+        return runs
+    finally:
+        if created is not None:
+            os.unlink(path)
+
+
+def run_ffmpeg(args) -> Dict[str, Any]:
+    from video_clipper import VideoClipper
+    from source_probe import probe_source
+
+    info = probe_source(args.source, None)
+    jobs = random_jobs(info["duration"], args.clips, args.min_seconds, args.max_seconds, args.seed)
+    runs = {}
+    for name, io_schedule, prefetch in (("baseline", False, 0),
+                                        ("sorted", True, 0),
+                                        ("scheduled", True, args.prefetch_mb * 1024 * 1024)):
+        with tempfile.TemporaryDirectory() as output_dir:
+            clipper = VideoClipper(args.source, output_dir, probe_cache=None, max_concurrent=args.jobs,
+                                   io_schedule=io_schedule, prefetch_bytes=prefetch)
+            evict(args.source)
+            start = time.perf_counter()
+            if io_schedule:
+                results = asyncio.run(clipper.clip_scheduled(jobs))
+            else:
+                results = asyncio.run(clipper.clip_all(jobs))
+            seconds = time.perf_counter() - start
+            output_bytes = sum(os.path.getsize(os.path.join(output_dir, f)) for f in os.listdir(output_dir))
+        if not all(results):
+            print(f"❌ {name}: {results.count(False)} 个片段裁剪失败")
+        runs[name] = {"seconds": seconds, "bytes": output_bytes,
+                      "mb_per_second": output_bytes / seconds / 1024 / 1024}
+    return runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="裁剪 I/O 调度基准测试")
+    parser.add_argument("source", nargs="?", help="源视频（--simulate 时可省略，自动生成临时文件）")
+    parser.add_argument("--simulate", action="store_true", help="不运行 ffmpeg，模拟慢速存储上的读取")
+    parser.add_argument("--clips", type=int, default=60, help="片段数（默认: 60）")
+    parser.add_argument("--min-seconds", type=float, default=10.0, help="片段最短时长（默认: 10）")
+    parser.add_argument("--max-seconds", type=float, default=40.0, help="片段最长时长（默认: 40）")
+    parser.add_argument("-j", "--jobs", type=int, default=2, help="同时读取的进程数（默认: 2）")
+    parser.add_argument("--prefetch-mb", type=int, default=DEFAULT_PREFETCH_BYTES // 1024 // 1024,
+                        help="预读窗口（MB，默认: %(default)s）")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子（默认: 0）")
+    simulate = parser.add_argument_group("模拟存储（--simulate）")
+    simulate.add_argument("--size-mb", type=int, default=1024, help="生成的源文件大小（默认: 1024）")
+    simulate.add_argument("--duration", type=float, default=3600.0, help="视为视频时长（秒，默认: 3600）")
+    simulate.add_argument("--bandwidth-mb", type=float, default=100.0, help="存储带宽（MB/s，默认: 100）")
+    simulate.add_argument("--seek-ms", type=float, default=8.0, help="非顺序请求的寻址延迟（默认: 8ms）")
+    simulate.add_argument("--request-ms", type=float, default=0.5, help="每个请求的固定开销（默认: 0.5ms）")
+    simulate.add_argument("--block-kb", type=int, default=128, help="存储请求的最小单位（默认: 128KB）")
+    simulate.add_argument("--read-kb", type=int, default=128,
+                          help="裁剪进程每次读取的大小（默认: 128KB，与内核默认预读大小相同）")
+    parser.add_argument("-o", "--output", help="把结果写入JSON文件")
+    args = parser.parse_args()
+
+    if args.source is None and not args.simulate:
+        parser.error("需要指定源视频，或使用 --simulate")
+    runs = run_simulation(args) if args.simulate else run_ffmpeg(args)
+
+    baseline = runs["baseline"]["mb_per_second"]
+    print(f"\n{'方式':<12}{'耗时':>10}{'有效吞吐':>14}{'相对当前':>10}")
+    for name, run in runs.items():
+        print(f"{name:<12}{run['seconds']:>9.2f}s{run['mb_per_second']:>10.1f}MB/s"
+              f"{run['mb_per_second'] / baseline if baseline else 0:>9.2f}x")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"config": {k: v for k, v in vars(args).items() if k != "output"}, "runs": runs},
+                      f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
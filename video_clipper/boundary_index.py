@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+源视频边界索引
+对每个源视频做一次分析：用一个 ffmpeg 进程同时检测镜头切换（select 场景分数）和静音区间
+（silencedetect），结果按文件指纹缓存。裁剪时把片段的起止时间吸附到附近的边界上，
+查找只在内存中二分，不需要再次解码。
+"""
+
+import re
+import time
+import bisect
+import subprocess
+from typing import Any, Dict, List, Optional, Tuple
+from source_probe import file_fingerprint, load_cache, save_cache
+
+DEFAULT_BOUNDARY_CACHE = ".video_boundary_cache.json"
+
+# 场景分数阈值（0-1，越大只保留越明显的镜头切换）
+SCENE_THRESHOLD = 0.3
+
+# 低于该音量（dB）且持续不短于 SILENCE_MIN_SECONDS 的区间视为静音
+SILENCE_NOISE_DB = -35
+SILENCE_MIN_SECONDS = 0.4
+
+# 场景检测前把画面缩小到该宽度，减少计算量
+SCENE_SCALE_WIDTH = 320
+
+# 吸附到静音边界时在语音前后保留的余量（秒）
+SILENCE_PADDING = 0.15
+
+PTS_TIME_RE = re.compile(r"\bpts_time:\s*(-?[\d.]+)")
+SILENCE_RE = re.compile(r"\bsilence_(start|end):\s*(-?[\d.]+)")
+
+
+def build_analysis_command(video_path: str, has_video: bool, has_audio: bool,
+                           scene_threshold: float, noise_db: float, min_silence: float) -> List[str]:
+    """一次解码同时输出场景切换帧（showinfo）和静音区间（silencedetect）的 ffmpeg 命令"""
+    cmd = ['ffmpeg', '-hide_banner', '-nostats', '-loglevel', 'info', '-i', video_path]
+    if has_video:
+        cmd += ['-map', '0:v:0', '-vf',
+                f"scale={SCENE_SCALE_WIDTH}:-2,select='gt(scene,{scene_threshold})',showinfo"]
+    if has_audio:
+        cmd += ['-map', '0:a:0', '-af', f"silencedetect=n={noise_db}dB:d={min_silence}"]
+    return cmd + ['-f', 'null', '-']
+
+
+def parse_analysis_output(stderr: str, duration: float) -> Dict[str, Any]:
+    """
+    从 ffmpeg 日志中解析场景切换时间和静音区间
+
+    Returns:
+        Dict: {"scenes": [秒], "silences": [[开始, 结束]]}
+    """
+    scenes = []
+    silences = []
+    silence_start = None
+    for line in stderr.splitlines():
+        if "showinfo" in line:
+            match = PTS_TIME_RE.search(line)
+            if match:
+                scenes.append(float(match.group(1)))
+            continue
+        match = SILENCE_RE.search(line)
+        if not match:
+            continue
+        value = max(float(match.group(2)), 0.0)
+        if match.group(1) == "start":
+            silence_start = value
+        elif silence_start is not None:
+            silences.append([silence_start, value])
+            silence_start = None
+    # 静音一直持续到文件结尾时不会输出 silence_end
+    if silence_start is not None and duration > silence_start:
+        silences.append([silence_start, duration])
+    return {"scenes": sorted(set(scenes)), "silences": silences}
+
+
+def analyze_boundaries(video_path: str, info: Dict[str, Any],
+                       scene_threshold: float = SCENE_THRESHOLD,
+                       noise_db: float = SILENCE_NOISE_DB,
+                       min_silence: float = SILENCE_MIN_SECONDS) -> Dict[str, Any]:
+    """
+    解码一遍源视频，检测镜头切换和静音区间
+
+    Args:
+        video_path: 源视频路径
+        info: probe_source 返回的源视频信息（用于判断有哪些流）
+
+    Returns:
+        Dict: {"scenes", "silences", "seconds"}
+    """
+    stream_types = {stream.get("type") for stream in info.get("streams", [])}
+    has_video, has_audio = "video" in stream_types, "audio" in stream_types
+    if not has_video and not has_audio:
+        return {"scenes": [], "silences": [], "seconds": 0.0}
+
+    cmd = build_analysis_command(video_path, has_video, has_audio, scene_threshold, noise_db, min_silence)
+    start = time.perf_counter()
+    result = subprocess.run(cmd, capture_output=True, text=True, errors='replace')
+    if result.returncode != 0:
+        tail = "\n".join(result.stderr.strip().splitlines()[-5:])
+        raise RuntimeError(f"边界分析失败: {tail}")
+    boundaries = parse_analysis_output(result.stderr, info.get("duration") or 0.0)
+    boundaries["seconds"] = time.perf_counter() - start
+    return boundaries
+
+
+def load_boundaries(video_path: str, info: Dict[str, Any],
+                    cache_path: Optional[str] = DEFAULT_BOUNDARY_CACHE,
+                    scene_threshold: float = SCENE_THRESHOLD,
+                    noise_db: float = SILENCE_NOISE_DB,
+                    min_silence: float = SILENCE_MIN_SECONDS) -> Dict[str, Any]:
+    """
+    读取源视频的边界，按文件指纹和检测参数缓存（每个源视频只分析一次）
+
+    Args:
+        video_path: 源视频路径
+        info: probe_source 返回的源视频信息
+        cache_path: 缓存文件路径，None 表示不使用缓存
+
+    Returns:
+        Dict: analyze_boundaries 的结果，另含 cached（是否来自缓存）
+    """
+    fingerprint = info.get("fingerprint") or file_fingerprint(video_path)
+    params = {"scene_threshold": scene_threshold, "noise_db": noise_db, "min_silence": min_silence}
+    cache = load_cache(cache_path)
+    entry = cache.get(fingerprint)
+    if entry and entry.get("params") == params:
+        return dict(entry, cached=True)
+
+    boundaries = analyze_boundaries(video_path, info, scene_threshold, noise_db, min_silence)
+    boundaries["params"] = params
+    if cache_path:
+        cache[fingerprint] = boundaries
+        save_cache(cache_path, cache)
+    return dict(boundaries, cached=False)
+
+
+class BoundaryIndex:
+    """片段起止时间吸附：起点可吸附到镜头切换或静音结束处，终点可吸附到镜头切换或静音开始处"""
+
+    def __init__(self, scenes: List[float], silences: List[List[float]],
+                 padding: float = SILENCE_PADDING):
+        """
+        Args:
+            scenes: 镜头切换时间（秒）
+            silences: 静音区间 [开始, 结束]（秒）
+            padding: 吸附到静音边界时向静音内保留的余量，避免切掉语音的开头和结尾
+        """
+        self.scenes = sorted(scenes)
+        self.silences = [tuple(silence) for silence in silences]
+        self.starts = sorted(set(self.scenes) | {max(end - padding, start) for start, end in self.silences})
+        self.ends = sorted(set(self.scenes) | {min(start + padding, end) for start, end in self.silences})
+
+    @classmethod
+    def from_boundaries(cls, boundaries: Dict[str, Any]) -> "BoundaryIndex":
+        return cls(boundaries.get("scenes", []), boundaries.get("silences", []))
+
+    @staticmethod
+    def nearest(points: List[float], t: float, window: float) -> Optional[float]:
+        """二分查找离 t 最近且距离不超过 window 的边界"""
+        i = bisect.bisect_left(points, t)
+        candidates = points[max(i - 1, 0):i + 1]
+        best = min(candidates, key=lambda point: abs(point - t), default=None)
+        if best is None or abs(best - t) > window:
+            return None
+        return best
+
+    def snap(self, start: float, end: float, window: float) -> Tuple[float, float]:
+        """
+        把起止时间分别吸附到 window 秒内最近的边界；吸附后片段不再有效时保持原样
+
+        Returns:
+            Tuple[float, float]: 吸附后的 (开始, 结束)
+        """
+        snapped_start = self.nearest(self.starts, start, window)
+        snapped_end = self.nearest(self.ends, end, window)
+        snapped_start = start if snapped_start is None else snapped_start
+        snapped_end = end if snapped_end is None else snapped_end
+        if snapped_end <= snapped_start:
+            return start, end
+        return snapped_start, snapped_end
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步 ffmpeg 执行器
+用 asyncio 子进程运行 ffmpeg，解析 -progress 输出获得进度和吞吐量，
+支持单任务超时和取消，并把每个任务的统计汇总到共享的指标中。
+视频裁剪和音频提取共用这个执行器。
+"""
+
+import time
+import asyncio
+import threading
+import weakref
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+# 只保留 stderr 的最后若干行用于报错，不在内存中缓存全部输出
+STDERR_TAIL_LINES = 40
+
+# 超时或取消时，先终止进程，等待该时长后仍未退出则强制结束
+TERMINATE_GRACE_SECONDS = 5.0
+
+
+class FFmpegMetrics:
+    """ffmpeg 任务统计（线程安全，可在多个执行器之间共享）"""
+
+    def __init__(self, history: int = 200, parent: Optional["FFmpegMetrics"] = None):
+        """
+        Args:
+            history: 保留最近多少个任务的明细
+            parent: 同时汇总到的上级统计（如进程内共享的 DEFAULT_METRICS）
+        """
+        self.parent = parent
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=history)
+        self._totals = {"jobs": 0, "ok": 0, "failed": 0, "timeout": 0, "cancelled": 0,
+                        "bytes": 0, "seconds": 0.0, "media_seconds": 0.0}
+
+    def record(self, result: Dict[str, Any]):
+        """记录一个已结束的任务"""
+        with self._lock:
+            self._recent.append({key: result.get(key) for key in
+                                 ("name", "status", "seconds", "bytes", "media_seconds",
+                                  "bytes_per_second", "speed")})
+            totals = self._totals
+            totals["jobs"] += 1
+            totals[result["status"]] += 1
+            totals["bytes"] += result.get("bytes") or 0
+            totals["seconds"] += result.get("seconds") or 0.0
+            totals["media_seconds"] += result.get("media_seconds") or 0.0
+        if self.parent is not None:
+            self.parent.record(result)
+
+    def summary(self) -> Dict[str, Any]:
+        """汇总统计：任务数、各状态数量、总字节数、平均吞吐量和平均倍速"""
+        with self._lock:
+            totals = dict(self._totals)
+            recent = list(self._recent)
+        seconds = totals["seconds"]
+        totals["bytes_per_second"] = totals["bytes"] / seconds if seconds else 0.0
+        totals["speed"] = totals["media_seconds"] / seconds if seconds else 0.0
+        totals["recent"] = recent
+        return totals
+
+
+# 进程内默认共享的指标（本地服务通过它展示 ffmpeg 统计）
+DEFAULT_METRICS = FFmpegMetrics()
+
+
+def parse_progress_block(block: Dict[str, str]) -> Dict[str, Any]:
+    """
+    解析一组 -progress 键值
+
+    Returns:
+        Dict: {"out_seconds", "bytes", "speed", "finished"}
+    """
+    out_us = block.get("out_time_us") or block.get("out_time_ms")  # 两者单位都是微秒
+    try:
+        out_seconds = max(int(out_us), 0) / 1_000_000 if out_us not in (None, "N/A") else None
+    except ValueError:
+        out_seconds = None
+    try:
+        size = int(block.get("total_size", ""))
+    except ValueError:
+        size = None
+    speed_text = (block.get("speed") or "").strip().rstrip("x")
+    try:
+        speed = float(speed_text)
+    except ValueError:
+        speed = None
+    return {
+        "out_seconds": out_seconds,
+        "bytes": size,
+        "speed": speed,
+        "finished": block.get("progress") == "end",
+    }
+
+
+class FFmpegRunner:
+    """异步 ffmpeg 执行器"""
+
+    def __init__(self, max_concurrent: int = 1, timeout: Optional[float] = None,
+                 metrics: Optional[FFmpegMetrics] = None, binary: str = "ffmpeg"):
+        """
+        初始化执行器
+
+        Args:
+            max_concurrent: 同时运行的 ffmpeg 进程数上限
+            timeout: 默认的单任务超时（秒），None 表示不限
+            metrics: 统计对象，默认使用进程内共享的 DEFAULT_METRICS
+            binary: ffmpeg 可执行文件
+        """
+        self.max_concurrent = max_concurrent
+        self.timeout = timeout
+        self.metrics = metrics or DEFAULT_METRICS
+        self.binary = binary
+        self._semaphores: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # 信号量绑定在事件循环上，每个循环各建一个（run_sync 每次都会新建循环）
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            self._semaphores[loop] = asyncio.Semaphore(self.max_concurrent)
+        return self._semaphores[loop]
+
+    async def run(self, args: List[str], name: str = "ffmpeg",
+                  duration: Optional[float] = None, timeout: Optional[float] = None,
+                  on_progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        运行一个 ffmpeg 任务
+
+        Args:
+            args: ffmpeg 参数（不含可执行文件、-progress 等由执行器添加的参数）
+            name: 任务名称，用于日志和统计
+            duration: 输出的预期时长（秒），用于计算进度百分比
+            timeout: 本任务的超时（秒），默认使用执行器的设置
+            on_progress: 每次收到进度时的回调，参数包含 out_seconds、bytes、speed、percent
+
+        Returns:
+            Dict: {"name", "status"（ok/failed/timeout/cancelled）, "returncode", "seconds",
+                   "bytes", "media_seconds", "bytes_per_second", "speed", "stderr"}
+
+        任务被取消时会终止 ffmpeg 进程并记录统计，然后继续抛出 CancelledError
+        """
+        timeout = self.timeout if timeout is None else timeout
+        async with self._semaphore():
+            cmd = [self.binary, '-hide_banner', '-nostdin', '-nostats',
+                   '-progress', 'pipe:1'] + list(args)
+            start = time.perf_counter()
+            process = await asyncio.create_subprocess_exec(
+                *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+            stderr_tail: deque = deque(maxlen=STDERR_TAIL_LINES)
+            last = {"out_seconds": None, "bytes": None, "speed": None}
+
+            async def read_progress():
+                block: Dict[str, str] = {}
+                async for raw in process.stdout:
+                    key, _, value = raw.decode("utf-8", "replace").strip().partition("=")
+                    block[key] = value
+                    if key != "progress":
+                        continue
+                    progress = parse_progress_block(block)
+                    block = {}
+                    # 多路输出时最后一次报告可能取最短输出（如单帧封面）的时间，进度只保留最大值
+                    if progress["out_seconds"] is not None and last["out_seconds"] is not None \
+                            and progress["out_seconds"] < last["out_seconds"]:
+                        progress = dict(progress, out_seconds=None, speed=None)
+                    for field in ("out_seconds", "bytes", "speed"):
+                        if progress[field] is not None:
+                            last[field] = progress[field]
+                    if on_progress is not None:
+                        percent = None
+                        if duration and last["out_seconds"] is not None:
+                            percent = min(last["out_seconds"] / duration * 100, 100.0)
+                        on_progress(dict(last, percent=percent, finished=progress["finished"]))
+
+            async def read_stderr():
+                async for raw in process.stderr:
+                    stderr_tail.append(raw.decode("utf-8", "replace").rstrip())
+
+            status = "ok"
+            readers = asyncio.gather(read_progress(), read_stderr())
+            try:
+                await asyncio.wait_for(asyncio.shield(readers), timeout)
+                await process.wait()
+                if process.returncode != 0:
+                    status = "failed"
+            except asyncio.TimeoutError:
+                status = "timeout"
+                await self._terminate(process)
+            except asyncio.CancelledError:
+                status = "cancelled"
+                await self._terminate(process)
+                raise
+            finally:
+                if not readers.done():
+                    readers.cancel()
+                    try:
+                        await readers
+                    except (asyncio.CancelledError, Exception):
+                        pass
+                result = self._result(name, status, process.returncode, start, last, stderr_tail)
+                self.metrics.record(result)
+            return result
+
+    async def _terminate(self, process: asyncio.subprocess.Process):
+        if process.returncode is not None:
+            return
+        process.terminate()
+        try:
+            await asyncio.wait_for(process.wait(), TERMINATE_GRACE_SECONDS)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+
+    @staticmethod
+    def _result(name: str, status: str, returncode: Optional[int], start: float,
+                last: Dict[str, Any], stderr_tail: deque) -> Dict[str, Any]:
+        seconds = time.perf_counter() - start
+        size = last["bytes"] or 0
+        return {
+            "name": name,
+            "status": status,
+            "returncode": returncode,
+            "seconds": seconds,
+            "bytes": size,
+            "media_seconds": last["out_seconds"] or 0.0,
+            "bytes_per_second": size / seconds if seconds else 0.0,
+            "speed": last["speed"],
+            "stderr": "\n".join(stderr_tail),
+        }
+
+    def run_sync(self, args: List[str], **kwargs) -> Dict[str, Any]:
+        """在当前线程中同步运行一个任务（当前线程不能已有运行中的事件循环）"""
+        return asyncio.run(self.run(args, **kwargs))
+
+    async def run_many(self, jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        并发运行多个任务（受 max_concurrent 限制）
+
+        Args:
+            jobs: 每项为 run 的关键字参数
+
+        Returns:
+            List[Dict]: 与 jobs 一一对应的结果
+        """
+        return list(await asyncio.gather(*(self.run(**job) for job in jobs)))
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+裁剪任务的 I/O 调度
+源视频放在网络存储上时，按观点顺序裁剪会让读取在文件中来回跳转。
+调度器先估算每个片段在源文件中的字节范围，按偏移排序并把相邻的片段合并为读取组，
+依次执行读取组，同时用 posix_fadvise(WILLNEED) 把后面一段范围预读进页缓存，
+并限制同时读取源文件的进程数。
+"""
+
+import os
+import bisect
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+# 预读窗口：当前读取组之后最多预读多少字节
+DEFAULT_PREFETCH_BYTES = 256 * 1024 * 1024
+
+# 两个片段的字节范围间隔小于该值时合并为同一个读取组
+GROUP_GAP_BYTES = 16 * 1024 * 1024
+
+# 不支持 posix_fadvise 的平台上，用顺序读取代替预读时的块大小
+PREFETCH_CHUNK_BYTES = 8 * 1024 * 1024
+
+
+class ByteIndex:
+    """片段时间范围到源文件字节范围的映射：有关键帧字节索引时按索引查找，否则按平均码率估算"""
+
+    def __init__(self, info: Dict[str, Any], keyframes: Optional[List[List[float]]] = None):
+        """
+        Args:
+            info: probe_source 返回的源视频信息
+            keyframes: 关键帧的 [时间, 字节偏移] 列表（source_probe.load_keyframe_index）
+        """
+        self.size = info.get("size") or 0
+        self.duration = info.get("duration") or 0.0
+        self.keyframe_interval = info.get("keyframe_interval") or 0.0
+        keyframes = sorted(keyframes or [])
+        self.times = [k[0] for k in keyframes]
+        self.positions = [int(k[1]) for k in keyframes]
+
+    def _estimate(self, t: float) -> int:
+        if not self.duration:
+            return 0
+        return int(min(max(t / self.duration, 0.0), 1.0) * self.size)
+
+    def range(self, start: float, end: float) -> Tuple[int, int]:
+        """
+        片段需要读取的字节范围 [begin, end)
+
+        复制流裁剪从开始时间之前最近的关键帧读起，读到结束时间之后的下一个关键帧为止
+        """
+        if self.times:
+            i = bisect.bisect_right(self.times, start) - 1
+            j = bisect.bisect_left(self.times, end)
+            begin = self.positions[i] if i >= 0 else 0
+            stop = self.positions[j] if j < len(self.positions) else self.size
+        else:
+            begin = self._estimate(start - self.keyframe_interval)
+            stop = self._estimate(end + self.keyframe_interval)
+        return begin, max(stop, begin)
+
+
+def plan_reads(jobs: Sequence[Tuple[Any, float, float]], index: ByteIndex,
+               gap: int = GROUP_GAP_BYTES) -> List[Dict[str, Any]]:
+    """
+    按字节偏移排序并合并片段
+
+    Args:
+        jobs: (id, 开始时间, 结束时间) 列表
+        index: 字节范围映射
+        gap: 合并的最大间隔（字节）
+
+    Returns:
+        List[Dict]: 读取组 {"begin", "end", "ranges": 组内片段合并后的字节范围, "jobs": [(原始序号, job)]}，
+                    按 begin 排序
+    """
+    ranged = sorted(((index.range(job[1], job[2]), position, job) for position, job in enumerate(jobs)),
+                    key=lambda item: (item[0][0], item[1]))
+    groups: List[Dict[str, Any]] = []
+    for (begin, end), position, job in ranged:
+        if groups and begin <= groups[-1]["end"] + gap:
+            group = groups[-1]
+            group["end"] = max(group["end"], end)
+            group["jobs"].append((position, job))
+            # 只有重叠或相接的范围才合并，组内片段之间的空隙不预读
+            if begin <= group["ranges"][-1][1]:
+                group["ranges"][-1][1] = max(group["ranges"][-1][1], end)
+            else:
+                group["ranges"].append([begin, end])
+        else:
+            groups.append({"begin": begin, "end": end, "ranges": [[begin, end]], "jobs": [(position, job)]})
+    return groups
+
+
+class ReadAheadScheduler:
+    """按读取组的顺序执行裁剪，执行每组前预读后续窗口内的读取组"""
+
+    def __init__(self, source_path: str, max_readers: int = 1,
+                 prefetch_bytes: int = DEFAULT_PREFETCH_BYTES):
+        """
+        Args:
+            source_path: 源视频路径
+            max_readers: 同时读取源文件的读取组数
+            prefetch_bytes: 预读窗口大小（字节），0 表示不预读
+        """
+        self.source_path = source_path
+        self.max_readers = max(1, max_readers)
+        self.prefetch_bytes = prefetch_bytes
+        self.stats = {"groups": 0, "planned_bytes": 0, "prefetched_bytes": 0}
+
+    def advise(self, fd: int, begin: int, end: int):
+        """请求内核把 [begin, end) 读入页缓存（在线程池中调用）"""
+        # 空范围直接跳过：posix_fadvise 的长度为 0 表示一直到文件末尾
+        if end <= begin:
+            return
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(fd, begin, end - begin, os.POSIX_FADV_WILLNEED)
+            return
+        buffer = bytearray(PREFETCH_CHUNK_BYTES)
+        with open(self.source_path, 'rb', buffering=0) as f:
+            f.seek(begin)
+            remaining = end - begin
+            while remaining > 0:
+                read = f.readinto(memoryview(buffer)[:min(remaining, len(buffer))])
+                if not read:
+                    break
+                remaining -= read
+
+    async def run(self, groups: List[Dict[str, Any]],
+                  clip: Callable[[Tuple[Any, float, float]], Awaitable[bool]]) -> List[bool]:
+        """
+        执行所有读取组（组内片段依次裁剪，共享刚读入的页缓存）
+
+        预读是单独的一路顺序读取，始终领先最近开始的读取组，但不超过预读窗口
+
+        Args:
+            groups: plan_reads 的结果
+            clip: 裁剪单个 (id, 开始时间, 结束时间) 的协程函数
+
+        Returns:
+            List[bool]: 按原始 jobs 顺序排列的裁剪结果
+        """
+        loop = asyncio.get_running_loop()
+        readers = asyncio.Semaphore(self.max_readers)
+        progressed = asyncio.Event()
+        results: Dict[int, bool] = {}
+        position = groups[0]["begin"] if groups else 0
+        self.stats["groups"] = len(groups)
+        self.stats["planned_bytes"] = sum(end - begin for g in groups for begin, end in g["ranges"])
+
+        async def prefetch(fd: int):
+            for group in groups:
+                while group["begin"] >= position + self.prefetch_bytes:
+                    progressed.clear()
+                    await progressed.wait()
+                for begin, end in group["ranges"]:
+                    try:
+                        await loop.run_in_executor(None, self.advise, fd, begin, end)
+                    except OSError:
+                        # 预读只是建议，失败不影响裁剪
+                        return
+                    self.stats["prefetched_bytes"] += end - begin
+
+        async def run_group(group: Dict[str, Any]):
+            nonlocal position
+            # 信号量按等待顺序唤醒，读取组按偏移顺序开始
+            async with readers:
+                position = max(position, group["begin"])
+                progressed.set()
+                for index, job in group["jobs"]:
+                    results[index] = await clip(job)
+
+        prefetcher = None
+        fd = None
+        if self.prefetch_bytes > 0 and groups:
+            fd = os.open(self.source_path, os.O_RDONLY)
+            prefetcher = asyncio.ensure_future(prefetch(fd))
+        try:
+            await asyncio.gather(*(run_group(group) for group in groups))
+        finally:
+            if prefetcher is not None:
+                prefetcher.cancel()
+                await asyncio.gather(prefetcher, return_exceptions=True)
+                os.close(fd)
+        return [results[index] for index in sorted(results)]
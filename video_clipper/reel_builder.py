@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+观点集锦拼接工具
+把 VideoClipper 裁剪出的片段按 id 或时间顺序拼接成一个集锦视频：
+编码参数一致时用 concat demuxer 直接复制流（不重新编码），否则回退为一次 filter_complex 编码
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List
+
+# 读取 video_to_text 生成的二进制转录格式
+TRANSCRIBER_DIR = Path(__file__).resolve().parent.parent / "video_to_text"
+
+# 决定能否直接复制流拼接的参数
+VIDEO_KEYS = ("codec_name", "profile", "width", "height", "pix_fmt", "sample_aspect_ratio",
+              "r_frame_rate", "time_base")
+AUDIO_KEYS = ("codec_name", "profile", "sample_rate", "channels", "channel_layout", "time_base")
+
+
+def probe_streams(video_path: str) -> Dict[str, Any]:
+    """
+    用 ffprobe 读取文件的音视频流参数
+
+    Returns:
+        Dict: {"video": {...} 或 None, "audio": {...} 或 None}
+    """
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-show_entries', 'stream=codec_type,' + ",".join(sorted(set(VIDEO_KEYS + AUDIO_KEYS))),
+        '-of', 'json',
+        video_path
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe 读取失败: {video_path}: {result.stderr.strip()}")
+    streams = json.loads(result.stdout).get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), None)
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+    return {
+        "video": {key: video.get(key) for key in VIDEO_KEYS} if video else None,
+        "audio": {key: audio.get(key) for key in AUDIO_KEYS} if audio else None,
+    }
+
+
+def concat_list_entry(path: str) -> str:
+    """concat demuxer 列表中的一行（单引号按 ffmpeg 规则转义）"""
+    return "file '" + os.path.abspath(path).replace("'", "'\\''") + "'"
+
+
+class HighlightReelBuilder:
+    """观点集锦拼接器"""
+
+    def __init__(self, clip_dir: str = "output"):
+        """
+        初始化拼接器
+
+        Args:
+            clip_dir: VideoClipper 输出片段的目录
+        """
+        self.clip_dir = clip_dir
+
+    def collect_clips(self, result_file: str, order: str = "id") -> List[str]:
+        """
+        从观点筛选结果中找出已裁剪的片段
+
+        Args:
+            result_file: 观点筛选结果JSON文件
+            order: 排序方式，id 或 time（按 start_time）
+
+        Returns:
+            List[str]: 片段文件路径（跳过近似重复和不存在的片段）
+        """
+        if str(TRANSCRIBER_DIR) not in sys.path:
+            sys.path.append(str(TRANSCRIBER_DIR))
+        from transcript_binary import load_sentences
+        sentences = load_sentences(result_file)
+
+        sentences = [s for s in sentences if s.get("id") is not None and not s.get("duplicate_of")]
+        if order == "time":
+            sentences.sort(key=lambda s: (s.get("start_time", 0), s["id"]))
+        else:
+            sentences.sort(key=lambda s: s["id"])
+
+        clips = []
+        for sentence in sentences:
+            path = os.path.join(self.clip_dir, f"{sentence['id']}.mp4")
+            if os.path.exists(path):
+                clips.append(path)
+            else:
+                print(f"⚠️  片段不存在，跳过: {path}")
+        return clips
+
+    def can_stream_copy(self, probes: List[Dict[str, Any]]) -> bool:
+        """所有片段的音视频参数一致时才能直接复制流拼接"""
+        return all(probe == probes[0] for probe in probes[1:])
+
+    def build(self, clips: List[str], output_path: str, force_reencode: bool = False) -> Dict[str, Any]:
+        """
+        拼接片段
+
+        Args:
+            clips: 按播放顺序排列的片段路径
+            output_path: 输出文件路径
+            force_reencode: 即使参数一致也重新编码
+
+        Returns:
+            Dict: {"output", "clips", "mode"（copy 或 reencode）, "seconds", "success"}
+        """
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=min(8, len(clips)) or 1) as executor:
+            probes = list(executor.map(probe_streams, clips))
+
+        mode = "copy" if not force_reencode and self.can_stream_copy(probes) else "reencode"
+        if mode == "copy":
+            print(f"片段参数一致，直接复制流拼接 {len(clips)} 个片段")
+            success = self._concat_copy(clips, output_path)
+        else:
+            print(f"片段参数不一致，重新编码拼接 {len(clips)} 个片段")
+            success = self._concat_reencode(clips, probes, output_path)
+
+        return {
+            "output": output_path,
+            "clips": len(clips),
+            "mode": mode,
+            "seconds": time.perf_counter() - start,
+            "success": success,
+        }
+
+    def _run(self, cmd: List[str]) -> bool:
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"❌ 拼接失败: {result.stderr.strip()[-2000:]}")
+            return False
+        return True
+
+    def _concat_copy(self, clips: List[str], output_path: str) -> bool:
+        """concat demuxer + 流复制"""
+        list_path = f"{output_path}.{os.getpid()}.concat.txt"
+        with open(list_path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(concat_list_entry(clip) for clip in clips) + "\n")
+        try:
+            return self._run([
+                'ffmpeg', '-v', 'error',
+                '-f', 'concat', '-safe', '0',
+                '-i', list_path,
+                '-c', 'copy',
+                '-movflags', '+faststart',
+                '-y', output_path
+            ])
+        finally:
+            os.remove(list_path)
+
+    def _concat_reencode(self, clips: List[str], probes: List[Dict[str, Any]], output_path: str) -> bool:
+        """一次 filter_complex 编码：统一到第一个片段的分辨率后 concat"""
+        first_video = next((p["video"] for p in probes if p["video"]), None)
+        if first_video is None:
+            print("❌ 片段中没有视频流")
+            return False
+        width, height = first_video["width"], first_video["height"]
+        fps = first_video.get("r_frame_rate") or "30"
+        with_audio = all(p["audio"] for p in probes)
+
+        cmd = ['ffmpeg', '-v', 'error']
+        for clip in clips:
+            cmd += ['-i', clip]
+
+        filters, labels = [], []
+        for i in range(len(clips)):
+            filters.append(
+                f"[{i}:v:0]scale={width}:{height}:force_original_aspect_ratio=decrease,"
+                f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={fps},format=yuv420p[v{i}]")
+            labels.append(f"[v{i}]")
+            if with_audio:
+                filters.append(f"[{i}:a:0]aformat=sample_rates=48000:channel_layouts=stereo[a{i}]")
+                labels.append(f"[a{i}]")
+        filters.append(f"{''.join(labels)}concat=n={len(clips)}:v=1:a={int(with_audio)}"
+                       + ("[v][a]" if with_audio else "[v]"))
+
+        cmd += ['-filter_complex', ";".join(filters), '-map', '[v]']
+        if with_audio:
+            cmd += ['-map', '[a]', '-c:a', 'aac', '-b:a', '160k']
+        cmd += ['-c:v', 'libx264', '-preset', 'veryfast', '-crf', '20',
+                '-movflags', '+faststart', '-y', output_path]
+        return self._run(cmd)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="观点集锦拼接工具")
+    parser.add_argument("result_file", help="观点筛选结果JSON文件路径")
+    parser.add_argument("-d", "--clip-dir", default="output",
+                       help="片段所在目录（默认: output）")
+    parser.add_argument("-o", "--output", default="highlights.mp4",
+                       help="集锦输出路径（默认: highlights.mp4）")
+    parser.add_argument("--order", choices=["id", "time"], default="id",
+                       help="片段顺序（默认: id）")
+    parser.add_argument("--reencode", action="store_true",
+                       help="强制重新编码拼接")
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.result_file):
+        print(f"结果文件不存在: {args.result_file}")
+        sys.exit(1)
+
+    try:
+        builder = HighlightReelBuilder(args.clip_dir)
+        clips = builder.collect_clips(args.result_file, args.order)
+        if not clips:
+            print("没有可拼接的片段")
+            sys.exit(1)
+        report = builder.build(clips, args.output, force_reencode=args.reencode)
+    except (OSError, RuntimeError, ValueError) as e:
+        print(f"程序执行失败: {e}")
+        sys.exit(1)
+
+    if not report["success"]:
+        sys.exit(1)
+    print(f"\n🎉 集锦已生成: {report['output']}"
+          f"（{report['clips']} 个片段，{'复制流' if report['mode'] == 'copy' else '重新编码'}，"
+          f"用时 {report['seconds']:.1f}s）")
+
+
+if __name__ == "__main__":
+    main()
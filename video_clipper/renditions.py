@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多规格片段输出
+每个片段只解码一次：用 split 滤镜把解码后的画面分给各个规格的缩放和编码器，
+同时输出封面帧和可选的 GIF/WebP 动图预览。各规格写入输出目录下的同名子目录，
+例如 clips/1080p/12.mp4、clips/poster/12.jpg、clips/preview/12.gif。
+"""
+
+import os
+from typing import Dict, List, Optional
+
+# 规格名 -> 最大高度、x264 CRF、音频码率（不放大低于该高度的源视频）
+RENDITIONS = {
+    "1080p": {"height": 1080, "crf": 21, "audio_bitrate": "128k"},
+    "720p": {"height": 720, "crf": 23, "audio_bitrate": "128k"},
+    "480p": {"height": 480, "crf": 24, "audio_bitrate": "96k"},
+    "360p": {"height": 360, "crf": 26, "audio_bitrate": "64k"},
+}
+DEFAULT_RENDITIONS = ["1080p", "720p", "360p"]
+
+X264_PRESET = "veryfast"
+
+# 封面取片段中该比例位置的画面
+POSTER_POSITION = 0.3
+POSTER_HEIGHT = 720
+
+# 动图预览：片段开头若干秒，低帧率、小尺寸
+PREVIEW_FORMATS = ("gif", "webp")
+PREVIEW_SECONDS = 4.0
+PREVIEW_FPS = 10
+PREVIEW_WIDTH = 320
+
+
+def parse_renditions(names: List[str]) -> List[str]:
+    """校验规格名并按高度从高到低排序"""
+    unknown = [name for name in names if name not in RENDITIONS]
+    if unknown:
+        raise ValueError(f"未知的输出规格: {', '.join(unknown)}（可选: {', '.join(RENDITIONS)}）")
+    return sorted(dict.fromkeys(names), key=lambda name: RENDITIONS[name]["height"], reverse=True)
+
+
+def balance_threads(renditions: List[str], clip_threads: int) -> Dict[str, int]:
+    """按各规格的像素数分配一个片段的编码线程（每个编码器至少 1 个线程）"""
+    weights = {name: RENDITIONS[name]["height"] ** 2 for name in renditions}
+    total = sum(weights.values())
+    return {name: max(1, round(clip_threads * weight / total)) for name, weight in weights.items()}
+
+
+def output_paths(output_dir: str, clip_name: str, renditions: List[str], poster: bool = True,
+                 preview: Optional[str] = None) -> Dict[str, str]:
+    """各输出文件的路径：{规格名/"poster"/"preview": 路径}"""
+    paths = {name: os.path.join(output_dir, name, f"{clip_name}.mp4") for name in renditions}
+    if poster:
+        paths["poster"] = os.path.join(output_dir, "poster", f"{clip_name}.jpg")
+    if preview:
+        paths["preview"] = os.path.join(output_dir, "preview", f"{clip_name}.{preview}")
+    return paths
+
+
+def build_rendition_args(source: str, start_time: float, end_time: float, paths: Dict[str, str],
+                         renditions: List[str], clip_threads: int, has_audio: bool = True,
+                         preview: Optional[str] = None) -> List[str]:
+    """
+    构造一次解码、多路输出的 ffmpeg 参数
+
+    Args:
+        source: 源视频路径
+        start_time: 开始时间（秒）
+        end_time: 结束时间（秒）
+        paths: output_paths 的结果
+        renditions: 规格名（parse_renditions 的结果）
+        clip_threads: 这个片段可用的线程数，按像素数分给各规格的编码器
+        has_audio: 源视频是否有音频流
+        preview: 动图预览格式（gif/webp），None 表示不输出
+
+    Returns:
+        List[str]: ffmpeg 参数（不含可执行文件）
+    """
+    duration = end_time - start_time
+    video_outputs = [f"v{i}" for i in range(len(renditions))]
+    if "poster" in paths:
+        video_outputs.append("poster_in")
+    if preview:
+        video_outputs.append("preview_in")
+
+    # 只有一路输出时 split=1 也是合法的滤镜
+    chains = [f"[0:v]split={len(video_outputs)}" + "".join(f"[{label}]" for label in video_outputs)]
+    for i, name in enumerate(renditions):
+        height = RENDITIONS[name]["height"]
+        chains.append(f"[v{i}]scale=-2:'min(ih,{height})',format=yuv420p[{name}]")
+    if "poster" in paths:
+        chains.append(f"[poster_in]select='gte(t,{duration * POSTER_POSITION:.3f})',"
+                      f"scale=-2:'min(ih,{POSTER_HEIGHT})'[poster]")
+    if preview:
+        chain = (f"[preview_in]trim=duration={min(PREVIEW_SECONDS, duration):.3f},setpts=PTS-STARTPTS,"
+                 f"fps={PREVIEW_FPS},scale={PREVIEW_WIDTH}:-2:flags=lanczos")
+        if preview == "gif":
+            # 为预览单独生成调色板，避免 GIF 默认调色板的色带
+            chain += ",split[pa][pb];[pa]palettegen=stats_mode=diff[palette];[pb][palette]paletteuse[preview]"
+        else:
+            chain += "[preview]"
+        chains.append(chain)
+
+    threads = balance_threads(renditions, clip_threads)
+    args = ['-ss', f"{start_time:.3f}", '-t', f"{duration:.3f}", '-i', source,
+            '-filter_complex', ";".join(chains), '-filter_complex_threads', str(max(1, clip_threads // 2))]
+    for name in renditions:
+        spec = RENDITIONS[name]
+        args += ['-map', f"[{name}]", '-c:v', 'libx264', '-preset', X264_PRESET, '-crf', str(spec["crf"]),
+                 '-threads', str(threads[name])]
+        if has_audio:
+            args += ['-map', '0:a:0?', '-c:a', 'aac', '-b:a', spec["audio_bitrate"]]
+        args += ['-movflags', '+faststart', '-y', paths[name]]
+    if "poster" in paths:
+        args += ['-map', '[poster]', '-frames:v', '1', '-q:v', '3', '-y', paths["poster"]]
+    if preview == "gif":
+        args += ['-map', '[preview]', '-loop', '0', '-y', paths["preview"]]
+    elif preview == "webp":
+        args += ['-map', '[preview]', '-c:v', 'libwebp', '-lossless', '0', '-q:v', '60',
+                 '-loop', '0', '-y', paths["preview"]]
+    return args
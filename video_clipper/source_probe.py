@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+源视频探测与裁剪计划
+对源视频只做一次 ffprobe（按文件指纹缓存），得到时长、流、编码、关键帧间隔和码率，
+在启动任何 ffmpeg 进程之前校验、修正并估算每个裁剪片段
+"""
+
+import os
+import json
+import math
+import threading
+import hashlib
+import subprocess
+from typing import Any, Dict, List, Optional
+
+DEFAULT_CACHE_PATH = ".video_probe_cache.json"
+
+# 采样关键帧的时长（秒），足够估计 GOP 长度
+KEYFRAME_SAMPLE_SECONDS = 60
+
+# 复制流裁剪的耗时模型：每个 ffmpeg 进程的固定开销 + 按读写吞吐量计算的部分
+PROCESS_OVERHEAD_SECONDS = 0.15
+COPY_THROUGHPUT_BYTES = 200 * 1024 * 1024
+
+FINGERPRINT_BLOCK = 1024 * 1024
+
+
+def file_fingerprint(path: str) -> str:
+    """
+    文件指纹：大小、修改时间以及首尾各 1MB 内容的 SHA-1
+
+    不读取整个文件，几 GB 的视频也只需几毫秒
+    """
+    stat = os.stat(path)
+    digest = hashlib.sha1(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+    with open(path, 'rb') as f:
+        digest.update(f.read(FINGERPRINT_BLOCK))
+        if stat.st_size > FINGERPRINT_BLOCK:
+            f.seek(max(stat.st_size - FINGERPRINT_BLOCK, FINGERPRINT_BLOCK))
+            digest.update(f.read(FINGERPRINT_BLOCK))
+    return digest.hexdigest()
+
+
+def load_cache(cache_path: Optional[str]) -> Dict[str, Any]:
+    """读取按文件指纹索引的 JSON 缓存，不存在或损坏时返回空字典"""
+    if not cache_path or not os.path.exists(cache_path):
+        return {}
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(cache_path: str, cache: Dict[str, Any]):
+    """先写临时文件再原子替换，避免并发或中断时留下损坏的缓存"""
+    # 同一进程内的多个线程（本地服务的并发任务）也可能同时更新缓存，临时文件按线程区分
+    tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False)
+    os.replace(tmp_path, cache_path)
+
+
+def _fraction(value: Optional[str]) -> Optional[float]:
+    """把 ffprobe 的 "30000/1001" 形式转换为浮点数"""
+    if not value:
+        return None
+    try:
+        if "/" in value:
+            num, den = value.split("/", 1)
+            return float(num) / float(den) if float(den) else None
+        return float(value)
+    except ValueError:
+        return None
+
+
+def _number(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def run_ffprobe(video_path: str) -> Dict[str, Any]:
+    """
+    调用 ffprobe 读取源视频信息
+
+    Returns:
+        Dict: {"duration", "bit_rate", "size", "format", "streams", "keyframe_interval"}
+    """
+    cmd = ['ffprobe', '-v', 'error', '-show_format', '-show_streams', '-of', 'json', video_path]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe 读取失败: {result.stderr.strip()}")
+    data = json.loads(result.stdout)
+    fmt = data.get("format", {})
+
+    streams = []
+    for stream in data.get("streams", []):
+        streams.append({
+            "index": stream.get("index"),
+            "type": stream.get("codec_type"),
+            "codec": stream.get("codec_name"),
+            "width": stream.get("width"),
+            "height": stream.get("height"),
+            "fps": _fraction(stream.get("avg_frame_rate")) or _fraction(stream.get("r_frame_rate")),
+            "sample_rate": _number(stream.get("sample_rate")),
+            "channels": stream.get("channels"),
+            "bit_rate": _number(stream.get("bit_rate")),
+        })
+
+    duration = _number(fmt.get("duration")) or 0.0
+    size = _number(fmt.get("size")) or float(os.path.getsize(video_path))
+    bit_rate = _number(fmt.get("bit_rate")) or (size * 8 / duration if duration else None)
+    return {
+        "duration": duration,
+        "bit_rate": bit_rate,
+        "size": int(size),
+        "format": fmt.get("format_name"),
+        "streams": streams,
+        "keyframe_interval": probe_keyframe_interval(video_path),
+    }
+
+
+def probe_keyframe_interval(video_path: str) -> Optional[float]:
+    """只解析开头一段的关键帧时间，估计平均关键帧间隔（秒）"""
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-select_streams', 'v:0',
+        '-skip_frame', 'nokey',
+        '-read_intervals', f"%+{KEYFRAME_SAMPLE_SECONDS}",
+        '-show_entries', 'frame=best_effort_timestamp_time',
+        '-of', 'csv=p=0',
+        video_path
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    times = sorted(t for t in (_number(line.strip().rstrip(",")) for line in result.stdout.splitlines())
+                   if t is not None)
+    if len(times) < 2:
+        return None
+    return (times[-1] - times[0]) / (len(times) - 1)
+
+
+def probe_source(video_path: str, cache_path: Optional[str] = DEFAULT_CACHE_PATH) -> Dict[str, Any]:
+    """
+    读取源视频信息，按文件指纹缓存（文件内容变化后自动重新探测）
+
+    Args:
+        video_path: 源视频路径
+        cache_path: 缓存文件路径，None 表示不使用缓存
+
+    Returns:
+        Dict: run_ffprobe 的结果，另含 fingerprint 和 cached（是否来自缓存）
+    """
+    fingerprint = file_fingerprint(video_path)
+    cache = load_cache(cache_path)
+    if fingerprint in cache:
+        return dict(cache[fingerprint], fingerprint=fingerprint, cached=True)
+
+    info = run_ffprobe(video_path)
+    if cache_path:
+        cache[fingerprint] = info
+        save_cache(cache_path, cache)
+    return dict(info, fingerprint=fingerprint, cached=False)
+
+
+def probe_keyframe_offsets(video_path: str) -> List[List[float]]:
+    """
+    读取视频流所有关键帧的时间和字节偏移（只解复用不解码，但需要读完整个文件）
+
+    Returns:
+        List[List[float]]: 按时间排序的 [时间, 字节偏移]
+    """
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries', 'packet=pts_time,pos,flags',
+        '-of', 'csv=p=0',
+        video_path
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe 读取关键帧失败: {result.stderr.strip()}")
+    keyframes = []
+    for line in result.stdout.splitlines():
+        fields = line.strip().split(",")
+        if len(fields) < 3 or not fields[2].startswith("K"):
+            continue
+        t, pos = _number(fields[0]), _number(fields[1])
+        if t is not None and pos is not None:
+            keyframes.append([t, int(pos)])
+    keyframes.sort()
+    return keyframes
+
+
+def load_keyframe_index(video_path: str, info: Dict[str, Any],
+                        cache_path: Optional[str] = DEFAULT_CACHE_PATH) -> List[List[float]]:
+    """
+    读取关键帧字节索引，与探测结果存放在同一个缓存文件中（键为 "<指纹>:keyframes"）
+
+    Args:
+        video_path: 源视频路径
+        info: probe_source 返回的源视频信息
+        cache_path: 缓存文件路径，None 表示不使用缓存
+    """
+    key = f"{info.get('fingerprint') or file_fingerprint(video_path)}:keyframes"
+    cache = load_cache(cache_path)
+    if key in cache:
+        return cache[key]
+    keyframes = probe_keyframe_offsets(video_path)
+    if cache_path:
+        cache[key] = keyframes
+        save_cache(cache_path, cache)
+    return keyframes
+
+
+def plan_clips(sentences: List[Dict[str, Any]], info: Dict[str, Any],
+               min_duration: float = 0.1, boundaries=None,
+               snap_window: float = 0.0) -> Dict[str, Any]:
+    """
+    校验并修正每个片段的时间范围，估算输出大小和总耗时
+
+    超出视频时长的部分会被截断；开始时间不早于结束时间、完全超出视频范围、
+    截断后短于 min_duration 或时间不是有限数字的片段标记为无效。
+    ffprobe 未给出时长时不做范围检查和截断（只去掉负的开始时间）。
+    复制流裁剪从开始时间之前最近的关键帧开始，估算大小时按多出的半个关键帧间隔计算。
+    提供 boundaries 时，截断后的起止时间会吸附到 snap_window 秒内最近的镜头切换或静音边界。
+
+    Args:
+        sentences: 观点筛选结果中的片段
+        info: probe_source 返回的源视频信息
+        min_duration: 有效片段的最短时长（秒）
+        boundaries: 边界索引（boundary_index.BoundaryIndex），None 表示不吸附
+        snap_window: 吸附的最大移动距离（秒）
+
+    Returns:
+        Dict: {"clips": 每个片段的计划, "valid", "clamped", "snapped", "invalid",
+               "estimated_bytes", "estimated_seconds"}
+    """
+    duration = info.get("duration")
+    # 时长未知时以无穷大为上限，范围检查和截断都不生效
+    limit = duration if duration else math.inf
+    bytes_per_second = (info.get("bit_rate") or 0.0) / 8
+    keyframe_slack = (info.get("keyframe_interval") or 0.0) / 2
+
+    clips = []
+    for sentence in sentences:
+        plan = {"id": sentence.get("id"), "valid": False, "clamped": False, "snapped": False, "reason": None}
+        start = _number(sentence.get("start_time"))
+        end = _number(sentence.get("end_time"))
+        if plan["id"] is None or start is None or end is None \
+                or not math.isfinite(start) or not math.isfinite(end):
+            plan["reason"] = "缺少 id 或时间不是有效数字"
+        elif end <= start:
+            plan["reason"] = f"结束时间不晚于开始时间 ({start:.2f}s - {end:.2f}s)"
+        elif start >= limit or end <= 0:
+            plan["reason"] = f"超出视频时长 {duration:.2f}s" if duration else "结束时间不晚于 0s"
+        else:
+            clamped_start, clamped_end = max(start, 0.0), min(end, limit)
+            plan["clamped"] = (clamped_start, clamped_end) != (start, end)
+            if boundaries is not None and snap_window > 0:
+                snapped = boundaries.snap(clamped_start, clamped_end, snap_window)
+                snapped = (max(snapped[0], 0.0), min(snapped[1], limit))
+                if snapped[1] - snapped[0] >= min_duration and snapped != (clamped_start, clamped_end):
+                    plan["snapped"] = True
+                    plan["original"] = (clamped_start, clamped_end)
+                    clamped_start, clamped_end = snapped
+            if clamped_end - clamped_start < min_duration:
+                plan["reason"] = f"有效时长不足 {min_duration}s"
+            else:
+                plan.update(valid=True, start=clamped_start, end=clamped_end,
+                            duration=clamped_end - clamped_start)
+                plan["estimated_bytes"] = int((plan["duration"] + keyframe_slack) * bytes_per_second)
+                plan["estimated_seconds"] = (PROCESS_OVERHEAD_SECONDS
+                                             + plan["estimated_bytes"] / COPY_THROUGHPUT_BYTES)
+        clips.append(plan)
+
+    valid = [c for c in clips if c["valid"]]
+    return {
+        "clips": clips,
+        "valid": len(valid),
+        "clamped": sum(1 for c in valid if c["clamped"]),
+        "snapped": sum(1 for c in valid if c["snapped"]),
+        "invalid": len(clips) - len(valid),
+        "estimated_bytes": sum(c["estimated_bytes"] for c in valid),
+        "estimated_seconds": sum(c["estimated_seconds"] for c in valid),
+    }
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分阶段性能分析
+对流水线的每个阶段同时采集 cProfile 统计和定时采样的调用栈，
+调用栈写成 collapsed stack 格式（可直接用 flamegraph.pl 或 speedscope 生成火焰图），
+语音识别阶段还可以附加 torch.profiler 的算子耗时表（只记录一段模型调用，避免记录整个阶段的全部算子）。
+视频裁剪和视频转文字共用这个分析器。
+"""
+
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import threading
+from contextlib import contextmanager
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+# 采样间隔（秒）
+SAMPLE_INTERVAL = 0.005
+
+# 报告中每个阶段列出的函数/算子数
+TOP_FUNCTIONS = 15
+TOP_TORCH_OPS = 30
+
+# torch.profiler 的调度（单位为一次最外层模块的前向调用）：跳过最初的调用，
+# 预热后只记录一段连续的调用，之后不再记录
+TORCH_WAIT_STEPS = 10
+TORCH_WARMUP_STEPS = 2
+TORCH_ACTIVE_STEPS = 100
+
+
+def frame_label(frame) -> str:
+    """调用栈中一帧的名称：函数名 (文件名:首行号)"""
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler(threading.Thread):
+    """后台线程：定时采样目标线程的 Python 调用栈并按栈计数"""
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class ModelCallStepper:
+    """全局前向钩子：目标线程每完成一次最外层模块的前向调用，推进一步 torch.profiler 的调度"""
+
+    def __init__(self, torch, torch_profile, thread_id: int):
+        self.torch_profile = torch_profile
+        self.thread_id = thread_id
+        self.steps = 0
+        self._depth = 0
+        self._handles = [
+            torch.nn.modules.module.register_module_forward_pre_hook(self._before),
+            torch.nn.modules.module.register_module_forward_hook(self._after),
+        ]
+
+    def _before(self, module, inputs):
+        if threading.get_ident() == self.thread_id:
+            self._depth += 1
+
+    def _after(self, module, inputs, output):
+        if threading.get_ident() != self.thread_id:
+            return
+        self._depth -= 1
+        if self._depth == 0:
+            self.steps += 1
+            self.torch_profile.step()
+
+    @property
+    def recorded_steps(self) -> int:
+        """实际记录了算子的调用次数"""
+        return min(max(self.steps - TORCH_WAIT_STEPS - TORCH_WARMUP_STEPS, 0), TORCH_ACTIVE_STEPS)
+
+    def remove(self):
+        for handle in self._handles:
+            handle.remove()
+
+
+def top_functions(profile: cProfile.Profile, limit: int = TOP_FUNCTIONS) -> List[Dict[str, Any]]:
+    """cProfile 中自身耗时最多的函数"""
+    stats = pstats.Stats(profile).stats
+    rows = []
+    for (filename, line, name), (_, calls, tottime, cumtime, _) in stats.items():
+        rows.append({
+            "function": f"{name} ({os.path.basename(filename)}:{line})",
+            "calls": calls,
+            "tottime": tottime,
+            "cumtime": cumtime,
+        })
+    rows.sort(key=lambda row: row["tottime"], reverse=True)
+    return rows[:limit]
+
+
+class StageProfiler:
+    """分阶段性能分析器（未启用时各方法不做任何事）"""
+
+    def __init__(self, output_dir: str, prefix: str, enabled: bool = True,
+                 interval: float = SAMPLE_INTERVAL):
+        """
+        初始化分析器
+
+        Args:
+            output_dir: 分析结果的输出目录
+            prefix: 输出文件名前缀，例如 "video_profile"
+            enabled: 是否启用
+            interval: 调用栈采样间隔（秒）
+        """
+        self.output_dir = output_dir
+        self.prefix = prefix
+        self.enabled = enabled
+        self.interval = interval
+        self.stages: List[Dict[str, Any]] = []
+        self.extra: Dict[str, Any] = {}
+
+    def _path(self, suffix: str) -> str:
+        return os.path.join(self.output_dir, f"{self.prefix}{suffix}")
+
+    @contextmanager
+    def stage(self, name: str, torch_ops: bool = False):
+        """
+        分析一个阶段（阶段之间不能嵌套）
+
+        Args:
+            name: 阶段名，用于输出文件名
+            torch_ops: 是否同时记录 torch.profiler 的算子耗时（按模型调用调度，
+                       只记录第 TORCH_WAIT_STEPS + TORCH_WARMUP_STEPS 次之后的 TORCH_ACTIVE_STEPS 次调用）
+        """
+        if not self.enabled:
+            yield
+            return
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        torch_profile = None
+        stepper = None
+        if torch_ops:
+            try:
+                import torch
+                from torch.profiler import profile, schedule, ProfilerActivity
+                torch_profile = profile(
+                    activities=[ProfilerActivity.CPU],
+                    schedule=schedule(wait=TORCH_WAIT_STEPS, warmup=TORCH_WARMUP_STEPS,
+                                      active=TORCH_ACTIVE_STEPS, repeat=1))
+            except ImportError:
+                print("未安装 torch，跳过算子分析")
+
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        profiler = cProfile.Profile()
+        if torch_profile is not None:
+            torch_profile.__enter__()
+            stepper = ModelCallStepper(torch, torch_profile, threading.get_ident())
+        sampler.start()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            seconds = time.perf_counter() - start
+            sampler.stop()
+            if torch_profile is not None:
+                stepper.remove()
+                torch_profile.__exit__(None, None, None)
+            self._record(name, seconds, profiler, sampler, torch_profile, stepper)
+
+    def _record(self, name: str, seconds: float, profiler: cProfile.Profile,
+                sampler: StackSampler, torch_profile, stepper: Optional[ModelCallStepper]) -> None:
+        collapsed_path = self._path(f".{name}.collapsed")
+        with open(collapsed_path, 'w', encoding='utf-8') as f:
+            for stack, count in sampler.counts.most_common():
+                f.write(f"{stack} {count}\n")
+        prof_path = self._path(f".{name}.prof")
+        profiler.dump_stats(prof_path)
+
+        stage = {
+            "name": name,
+            "seconds": seconds,
+            "samples": sum(sampler.counts.values()),
+            "collapsed": collapsed_path,
+            "pstats": prof_path,
+            "top_functions": top_functions(profiler),
+        }
+        if torch_profile is not None:
+            stage["model_calls"] = stepper.steps
+            stage["torch_profiled_calls"] = stepper.recorded_steps
+            if not stepper.recorded_steps:
+                print(f"阶段 {name} 的模型调用不足 {TORCH_WAIT_STEPS + TORCH_WARMUP_STEPS + 1} 次，未记录算子")
+        if torch_profile is not None and stepper.recorded_steps:
+            averages = torch_profile.key_averages()
+            table_path = self._path(f".{name}.torch_ops.txt")
+            with open(table_path, 'w', encoding='utf-8') as f:
+                f.write(averages.table(sort_by="self_cpu_time_total", row_limit=TOP_TORCH_OPS))
+            ops = sorted(averages, key=lambda event: event.self_cpu_time_total, reverse=True)
+            stage["torch_ops_table"] = table_path
+            stage["torch_ops"] = [
+                {"op": event.key, "calls": event.count,
+                 "self_cpu_ms": event.self_cpu_time_total / 1000,
+                 "cpu_ms": event.cpu_time_total / 1000}
+                for event in ops[:TOP_TORCH_OPS]
+            ]
+        self.stages.append(stage)
+
+    def annotate(self, key: str, value: Any):
+        """在报告中附加额外信息（例如 ffmpeg 统计）"""
+        if self.enabled:
+            self.extra[key] = value
+
+    def write_report(self) -> Optional[str]:
+        """
+        写出汇总报告并打印各阶段耗时
+
+        Returns:
+            str: 报告路径；未启用或没有记录任何阶段时返回 None
+        """
+        if not self.enabled or not self.stages:
+            return None
+        total = sum(stage["seconds"] for stage in self.stages)
+        report_path = self._path(".json")
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump({"total_seconds": total, "stages": self.stages, **self.extra},
+                      f, ensure_ascii=False, indent=2)
+
+        print(f"\n⏱️  分阶段耗时（共 {total:.2f}s）:")
+        for stage in self.stages:
+            share = stage["seconds"] / total * 100 if total else 0.0
+            hottest = stage["top_functions"][0]["function"] if stage["top_functions"] else "-"
+            print(f"  {stage['name']:<16}{stage['seconds']:>8.2f}s {share:>5.1f}%  最耗时: {hottest}")
+        print(f"性能分析报告: {report_path}")
+        return report_path
@@ -6,23 +6,69 @@
 """
 
 import os
-import json
 import argparse
 import sys
+import asyncio
 from pathlib import Path
 import subprocess
+from typing import Any, List, Optional, Tuple
+from ffmpeg_runner import FFmpegRunner, FFmpegMetrics, DEFAULT_METRICS
+from reel_builder import HighlightReelBuilder
+from source_probe import probe_source, plan_clips, load_keyframe_index, DEFAULT_CACHE_PATH
+from boundary_index import BoundaryIndex, load_boundaries, DEFAULT_BOUNDARY_CACHE
+from io_scheduler import ByteIndex, ReadAheadScheduler, plan_reads, DEFAULT_PREFETCH_BYTES
+from renditions import (parse_renditions, output_paths, build_rendition_args,
+                        DEFAULT_RENDITIONS, PREVIEW_FORMATS, RENDITIONS)
+from stage_profiler import StageProfiler
+
+# 读取 video_to_text 生成的二进制转录格式
+TRANSCRIBER_DIR = Path(__file__).resolve().parent.parent / "video_to_text"
 
 class VideoClipper:
-    def __init__(self, source_video: str, output_dir: str = "output"):
+    def __init__(self, source_video: str, output_dir: str = "output",
+                 probe_cache: str = DEFAULT_CACHE_PATH,
+                 max_concurrent: int = 1, timeout: Optional[float] = None,
+                 profile: bool = False, snap_window: float = 0.0,
+                 boundary_cache: Optional[str] = DEFAULT_BOUNDARY_CACHE,
+                 io_schedule: bool = False, prefetch_bytes: int = DEFAULT_PREFETCH_BYTES,
+                 keyframe_index: bool = False, renditions: Optional[List[str]] = None,
+                 poster: bool = True, preview: Optional[str] = None, threads: Optional[int] = None):
         """
         初始化视频裁剪器
         
         Args:
             source_video: 原视频文件路径
             output_dir: 输出目录
+            probe_cache: 源视频探测结果的缓存文件，None 表示不缓存
+            max_concurrent: 同时运行的 ffmpeg 进程数
+            timeout: 单个片段的裁剪超时（秒），None 表示不限
+            profile: 是否分阶段采集性能分析数据（报告由调用方通过 self.profiler.write_report() 写出）
+            snap_window: 把片段起止时间吸附到该距离（秒）内的镜头切换或静音边界，0 表示不吸附
+            boundary_cache: 镜头切换和静音检测结果的缓存文件，None 表示不缓存
+            io_schedule: 是否按源文件字节偏移调度裁剪顺序并预读（适合网络存储上的大文件）
+            prefetch_bytes: 调度时的预读窗口（字节），0 表示只排序不预读
+            keyframe_index: 调度时使用精确的关键帧字节索引（首次需要完整读取一遍源文件，结果缓存）
+            renditions: 重新编码输出的规格（如 ["1080p", "720p", "360p"]），每个片段只解码一次；
+                        None 表示按原编码复制流裁剪
+            poster: 输出多规格时是否同时输出封面帧
+            preview: 输出多规格时附带的动图预览格式（gif/webp），None 表示不输出
+            threads: 编码总线程数（默认 CPU 核数），平均分给同时运行的片段
         """
         self.source_video = source_video
         self.output_dir = output_dir
+        # 每个裁剪器单独统计本次运行，同时汇总到进程内共享的指标（本地服务展示）
+        self.runner = FFmpegRunner(max_concurrent=max_concurrent, timeout=timeout,
+                                   metrics=FFmpegMetrics(parent=DEFAULT_METRICS))
+        self.profiler = StageProfiler(output_dir, "clip_profile", enabled=profile)
+        self.snap_window = snap_window
+        self.boundaries = None
+        self.io_schedule = io_schedule
+        self.prefetch_bytes = prefetch_bytes
+        self.byte_index = None
+        self.renditions = parse_renditions(renditions) if renditions else None
+        self.poster = poster
+        self.preview = preview
+        self.clip_threads = max(1, (threads or os.cpu_count() or 1) // self.runner.max_concurrent)
         
         # 检查源视频是否存在
         if not os.path.exists(source_video):
@@ -33,11 +79,66 @@ class VideoClipper:
         
         print(f"源视频: {self.source_video}")
         print(f"输出目录: {self.output_dir}")
+        
+        # 探测源视频（按文件指纹缓存），用于裁剪前校验时间范围
+        try:
+            with self.profiler.stage("probe"):
+                self.source_info = probe_source(source_video, probe_cache)
+            keyframe = self.source_info.get("keyframe_interval")
+            duration = self.source_info.get("duration")
+            print(f"视频时长: {f'{duration:.2f}s' if duration else '未知（不校验时间范围）'}，"
+                  f"码率: {(self.source_info.get('bit_rate') or 0) / 1000:.0f}kbps，"
+                  f"关键帧间隔: {f'{keyframe:.2f}s' if keyframe else '未知'}"
+                  f"{'（缓存）' if self.source_info['cached'] else ''}")
+        except (OSError, RuntimeError, ValueError) as e:
+            print(f"⚠️  无法探测源视频，跳过时间范围校验: {e}")
+            self.source_info = None
+        
+        # 吸附边界需要对源视频完整解码一次，结果按文件指纹缓存
+        if snap_window > 0 and self.source_info is not None:
+            try:
+                with self.profiler.stage("boundaries"):
+                    boundaries = load_boundaries(source_video, self.source_info, boundary_cache)
+                self.boundaries = BoundaryIndex.from_boundaries(boundaries)
+                source = "缓存" if boundaries["cached"] else f"分析用时 {boundaries['seconds']:.1f}s"
+                print(f"镜头切换: {len(self.boundaries.scenes)} 处，"
+                      f"静音区间: {len(self.boundaries.silences)} 段（{source}）")
+            except (OSError, RuntimeError) as e:
+                print(f"⚠️  无法分析镜头切换和静音，跳过边界吸附: {e}")
+        
+        if io_schedule and self.source_info is not None:
+            keyframes = None
+            if keyframe_index:
+                try:
+                    with self.profiler.stage("keyframes"):
+                        keyframes = load_keyframe_index(source_video, self.source_info, probe_cache)
+                    print(f"关键帧字节索引: {len(keyframes)} 个关键帧")
+                except (OSError, RuntimeError) as e:
+                    print(f"⚠️  无法读取关键帧字节索引，按平均码率估算偏移: {e}")
+            if keyframes or self.source_info.get("duration"):
+                self.byte_index = ByteIndex(self.source_info, keyframes)
+            else:
+                # 没有关键帧索引也不知道时长时无法估算字节偏移，所有片段会映射到同一位置
+                print("⚠️  源视频时长未知且没有关键帧字节索引，不按字节偏移调度读取")
     
     def clip_video(self, start_time: float, end_time: float, output_filename: str) -> bool:
         """
         裁剪视频片段
         
+        Args:
+            start_time: 开始时间（秒）
+            end_time: 结束时间（秒）
+            output_filename: 输出文件名
+            
+        Returns:
+            bool: 是否成功
+        """
+        return asyncio.run(self.clip_video_async(start_time, end_time, output_filename))
+    
+    async def clip_video_async(self, start_time: float, end_time: float, output_filename: str) -> bool:
+        """
+        异步裁剪视频片段（超时或失败时返回 False，被取消时终止 ffmpeg 并抛出 CancelledError）
+        
         Args:
             start_time: 开始时间（秒）
             end_time: 结束时间（秒）
@@ -50,11 +151,10 @@ class VideoClipper:
             duration = end_time - start_time
             output_path = os.path.join(self.output_dir, output_filename)
             
-            # 使用ffmpeg裁剪视频
-            cmd = [
-                'ffmpeg',
-                '-i', self.source_video,
+            # 使用ffmpeg裁剪视频（-ss 放在 -i 之前，从开始时间之前的关键帧读起，不必从文件开头解复用）
+            args = [
                 '-ss', str(start_time),
+                '-i', self.source_video,
                 '-t', str(duration),
                 '-c', 'copy',  # 快速复制，不重新编码
                 '-avoid_negative_ts', 'make_zero',
@@ -65,64 +165,164 @@ class VideoClipper:
             print(f"正在裁剪: {output_filename} ({start_time:.2f}s - {end_time:.2f}s)")
             
             # 执行命令
-            result = subprocess.run(cmd, capture_output=True, text=True)
+            result = await self.runner.run(args, name=output_filename, duration=duration)
             
-            if result.returncode == 0:
-                print(f"✅ 成功生成: {output_filename}")
+            if result["status"] == "ok":
+                speed = f"，{result['speed']:.1f}x" if result["speed"] else ""
+                print(f"✅ 成功生成: {output_filename}（{result['seconds']:.2f}s，"
+                      f"{result['bytes_per_second'] / 1024 / 1024:.1f}MB/s{speed}）")
                 return True
+            elif result["status"] == "timeout":
+                print(f"❌ 裁剪超时: {output_filename}（{result['seconds']:.1f}s）")
+                return False
             else:
                 print(f"❌ 裁剪失败: {output_filename}")
-                print(f"错误信息: {result.stderr}")
+                print(f"错误信息: {result['stderr']}")
                 return False
                 
-        except Exception as e:
+        except OSError as e:
             print(f"❌ 裁剪视频时发生错误: {e}")
             return False
     
+    async def render_clip_async(self, start_time: float, end_time: float, clip_name: str) -> bool:
+        """
+        一次解码输出片段的所有规格、封面帧和动图预览（重新编码，起止时间精确到帧）
+        
+        Args:
+            start_time: 开始时间（秒）
+            end_time: 结束时间（秒）
+            clip_name: 输出文件名（不含扩展名），各规格写入输出目录下的同名子目录
+            
+        Returns:
+            bool: 是否成功
+        """
+        try:
+            paths = output_paths(self.output_dir, clip_name, self.renditions, self.poster, self.preview)
+            for path in paths.values():
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            has_audio = self.source_info is None or any(
+                stream.get("type") == "audio" for stream in self.source_info.get("streams", []))
+            args = build_rendition_args(self.source_video, start_time, end_time, paths, self.renditions,
+                                        self.clip_threads, has_audio, self.preview)
+            
+            print(f"正在编码: {clip_name} ({start_time:.2f}s - {end_time:.2f}s) -> "
+                  f"{', '.join(paths)}")
+            result = await self.runner.run(args, name=clip_name, duration=end_time - start_time)
+            
+            if result["status"] == "ok":
+                speed = f"，{result['speed']:.1f}x" if result["speed"] else ""
+                print(f"✅ 成功生成: {clip_name}（{len(paths)} 个文件，{result['seconds']:.2f}s{speed}）")
+                return True
+            elif result["status"] == "timeout":
+                print(f"❌ 编码超时: {clip_name}（{result['seconds']:.1f}s）")
+                return False
+            else:
+                print(f"❌ 编码失败: {clip_name}")
+                print(f"错误信息: {result['stderr']}")
+                return False
+                
+        except OSError as e:
+            print(f"❌ 编码视频时发生错误: {e}")
+            return False
+    
+    async def clip_job(self, job: Tuple[Any, float, float]) -> bool:
+        """处理一个 (id, 开始时间, 结束时间)：指定了输出规格时一次解码输出所有规格，否则复制流裁剪"""
+        sentence_id, start_time, end_time = job
+        if self.renditions:
+            return await self.render_clip_async(start_time, end_time, str(sentence_id))
+        return await self.clip_video_async(start_time, end_time, f"{sentence_id}.mp4")
+    
+    async def clip_all(self, jobs: List[Tuple[Any, float, float]]) -> List[bool]:
+        """并发裁剪多个片段（并发数由执行器限制），jobs 为 (id, 开始时间, 结束时间)"""
+        return list(await asyncio.gather(*(self.clip_job(job) for job in jobs)))
+    
+    async def clip_scheduled(self, jobs: List[Tuple[Any, float, float]]) -> List[bool]:
+        """按源文件字节偏移分组裁剪并预读后续范围，返回值按 jobs 原顺序排列"""
+        groups = plan_reads(jobs, self.byte_index)
+        scheduler = ReadAheadScheduler(self.source_video, self.runner.max_concurrent, self.prefetch_bytes)
+        print(f"I/O 调度: {len(jobs)} 个片段合并为 {len(groups)} 个读取组，"
+              f"预计读取 {sum(end - begin for g in groups for begin, end in g['ranges']) / 1024 / 1024:.1f}MB")
+        results = await scheduler.run(groups, self.clip_job)
+        self.profiler.annotate("io_schedule", scheduler.stats)
+        return results
+    
     def process_result_json(self, result_file: str) -> bool:
         """
         处理观点筛选结果文件
         
         Args:
-            result_file: 结果JSON文件路径
+            result_file: 结果JSON文件路径（也可以是二进制转录文件）
             
         Returns:
             bool: 是否成功处理
         """
         try:
             print(f"读取结果文件: {result_file}")
-            with open(result_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            sentences = data.get("sentences", [])
+            if str(TRANSCRIBER_DIR) not in sys.path:
+                sys.path.append(str(TRANSCRIBER_DIR))
+            from transcript_binary import load_sentences
+            sentences = load_sentences(result_file)
             if not sentences:
                 print("结果文件中没有找到句子数据")
                 return False
             
             print(f"找到 {len(sentences)} 个观点片段，开始裁剪...")
             
-            success_count = 0
-            total_count = len(sentences)
+            # 已标注为其他视频观点近似重复的片段不再裁剪
+            duplicates = [s for s in sentences if s.get("duplicate_of")]
+            if duplicates:
+                print(f"跳过 {len(duplicates)} 个近似重复片段")
+                sentences = [s for s in sentences if not s.get("duplicate_of")]
+                if not sentences:
+                    print("去除重复后没有需要裁剪的片段")
+                    return False
             
-            for sentence in sentences:
-                sentence_id = sentence.get("id")
-                start_time = sentence.get("start_time")
-                end_time = sentence.get("end_time")
-                
-                if sentence_id is None or start_time is None or end_time is None:
-                    print(f"⚠️  跳过无效数据: {sentence}")
-                    continue
-                
-                output_filename = f"{sentence_id}.mp4"
-                
-                if self.clip_video(start_time, end_time, output_filename):
-                    success_count += 1
+            # 启动 ffmpeg 之前校验并修正所有片段的时间范围
+            if self.source_info is not None:
+                with self.profiler.stage("plan"):
+                    plan = plan_clips(sentences, self.source_info,
+                                      boundaries=self.boundaries, snap_window=self.snap_window)
+                for clip in plan["clips"]:
+                    if not clip["valid"]:
+                        print(f"⚠️  跳过无效片段 {clip['id']}: {clip['reason']}")
+                    elif clip["clamped"]:
+                        print(f"⚠️  片段 {clip['id']} 超出视频范围，已截断为 "
+                              f"{clip['start']:.2f}s - {clip['end']:.2f}s")
+                if self.boundaries is not None:
+                    print(f"边界吸附 {plan['snapped']} 个片段（最大移动 {self.snap_window:.1f}s）")
+                print(f"有效片段 {plan['valid']} 个（截断 {plan['clamped']} 个，无效 {plan['invalid']} 个），"
+                      f"预计输出 {plan['estimated_bytes'] / 1024 / 1024:.1f}MB，"
+                      f"预计耗时 {plan['estimated_seconds']:.1f}s")
+                jobs = [(c["id"], c["start"], c["end"]) for c in plan["clips"] if c["valid"]]
+            else:
+                jobs = []
+                for sentence in sentences:
+                    sentence_id = sentence.get("id")
+                    start_time = sentence.get("start_time")
+                    end_time = sentence.get("end_time")
+                    if sentence_id is None or start_time is None or end_time is None:
+                        print(f"⚠️  跳过无效数据: {sentence}")
+                        continue
+                    jobs.append((sentence_id, start_time, end_time))
+            
+            total_count = len(sentences)
+            # 统计只包含本次处理的片段（同一裁剪器可能处理多个结果文件）
+            self.runner.metrics = FFmpegMetrics(parent=DEFAULT_METRICS)
+            with self.profiler.stage("clip"):
+                if self.byte_index is not None:
+                    success_count = sum(asyncio.run(self.clip_scheduled(jobs)))
+                else:
+                    success_count = sum(asyncio.run(self.clip_all(jobs)))
             
             print(f"\n📊 裁剪统计:")
             print(f"  总片段数: {total_count}")
             print(f"  成功裁剪: {success_count}")
             print(f"  失败片段: {total_count - success_count}")
             print(f"  成功率: {success_count/total_count*100:.1f}%")
+            metrics = self.runner.metrics.summary()
+            print(f"  ffmpeg 吞吐量: {metrics['bytes_per_second'] / 1024 / 1024:.1f}MB/s，"
+                  f"平均倍速: {metrics['speed']:.1f}x，超时: {metrics['timeout']}")
+            self.profiler.annotate("ffmpeg", metrics)
             
             return success_count > 0
             
@@ -159,6 +359,33 @@ def main():
     parser.add_argument("-o", "--output", 
                        default="output",
                        help="输出目录（默认: output）")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                       help="同时运行的 ffmpeg 进程数（默认: 1）")
+    parser.add_argument("--timeout", type=float, default=None,
+                       help="单个片段的裁剪超时（秒），默认不限")
+    parser.add_argument("--reel",
+                       help="裁剪完成后把片段拼接成集锦视频，指定输出路径")
+    parser.add_argument("--reel-order", choices=["id", "time"], default="id",
+                       help="集锦中片段的顺序（默认: id）")
+    parser.add_argument("--profile", action="store_true",
+                       help="分阶段性能分析：在输出目录写出调用栈（collapsed 格式）和 cProfile 统计")
+    parser.add_argument("--snap", type=float, default=0.0, metavar="SECONDS",
+                       help="把片段起止时间吸附到该距离内的镜头切换或静音边界（默认: 0，不吸附）")
+    parser.add_argument("--io-schedule", action="store_true",
+                       help="按源文件字节偏移排序、合并片段并预读（适合网络存储上的大文件）")
+    parser.add_argument("--prefetch-mb", type=int, default=DEFAULT_PREFETCH_BYTES // 1024 // 1024,
+                       help="I/O 调度的预读窗口（MB，默认: %(default)s，0 表示不预读）")
+    parser.add_argument("--keyframe-index", action="store_true",
+                       help="I/O 调度使用精确的关键帧字节索引（首次完整读取一遍源文件，结果缓存）")
+    parser.add_argument("--renditions", nargs="+", choices=list(RENDITIONS), metavar="NAME",
+                       help=f"一次解码输出多个规格（可选: {', '.join(RENDITIONS)}；"
+                            f"例如 {' '.join(DEFAULT_RENDITIONS)}），默认按原编码复制流裁剪")
+    parser.add_argument("--no-poster", action="store_true",
+                       help="输出多规格时不输出封面帧")
+    parser.add_argument("--preview", choices=PREVIEW_FORMATS,
+                       help="输出多规格时附带动图预览（gif 或 webp）")
+    parser.add_argument("--threads", type=int, default=None,
+                       help="编码总线程数（默认: CPU 核数），平均分给同时运行的片段")
     
     args = parser.parse_args()
     
@@ -173,11 +400,28 @@ def main():
     
     try:
         # 创建视频裁剪器
-        clipper = VideoClipper(args.video, args.output)
+        clipper = VideoClipper(args.video, args.output,
+                               max_concurrent=args.jobs, timeout=args.timeout,
+                               profile=args.profile, snap_window=args.snap,
+                               io_schedule=args.io_schedule, prefetch_bytes=args.prefetch_mb * 1024 * 1024,
+                               keyframe_index=args.keyframe_index, renditions=args.renditions,
+                               poster=not args.no_poster, preview=args.preview, threads=args.threads)
         
         # 处理结果文件
         success = clipper.process_result_json(args.result_file)
         
+        if success and args.reel:
+            # 输出多规格时用最高的规格拼接集锦
+            clip_dir = os.path.join(args.output, clipper.renditions[0]) if clipper.renditions else args.output
+            builder = HighlightReelBuilder(clip_dir)
+            with clipper.profiler.stage("reel"):
+                report = builder.build(builder.collect_clips(args.result_file, args.reel_order), args.reel)
+            success = report["success"]
+            if success:
+                print(f"集锦已生成: {args.reel}（{report['mode']}，用时 {report['seconds']:.1f}s）")
+        
+        clipper.profiler.write_report()
+        
         if success:
             print("\n🎉 视频裁剪完成！")
         else:
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+音频指纹索引
+从音频的频谱峰值生成指纹（峰值两两组合的哈希），用于识别重复上传的视频：
+同一节目换了封装、码率或剪掉片头后，仍能匹配到已转录的源文件及其时间偏移，
+从而复用已有的转录结果，只对未匹配的区间做语音识别。
+"""
+
+import os
+import json
+import time
+import wave
+import sqlite3
+import argparse
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+
+# 指纹在 8kHz 下计算（语音和节目音乐的主要能量都在 4kHz 以内）
+FINGERPRINT_RATE = 8000
+FFT_SIZE = 1024
+HOP_SIZE = 256
+FRAME_SECONDS = HOP_SIZE / FINGERPRINT_RATE
+
+# 峰值提取：时间/频率邻域半径（帧、频点），以及每秒保留的峰值数上限
+PEAK_TIME_RADIUS = 8
+PEAK_FREQ_RADIUS = 12
+PEAKS_PER_SECOND = 30
+
+# 组合哈希：每个锚点与其后 FAN_OUT 个峰值配对，时间差不超过 MAX_DELTA 帧
+FAN_OUT = 5
+MAX_DELTA = 63
+FREQ_BINS = 512
+
+# 匹配：按窗口统计对齐的哈希，窗口内命中数达到阈值即视为该窗口与源文件一致
+WINDOW_SECONDS = 5.0
+MIN_WINDOW_HITS = 4
+MIN_VOTES = 20
+MIN_REGION_SECONDS = 10.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    duration REAL NOT NULL,
+    segments TEXT NOT NULL,
+    added_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS hashes (
+    hash INTEGER NOT NULL,
+    source_id INTEGER NOT NULL,
+    frame INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS hashes_hash ON hashes(hash);
+CREATE INDEX IF NOT EXISTS hashes_source ON hashes(source_id);
+"""
+
+# 保存到索引中的语句字段（不保存 tokens 等解码细节）
+SEGMENT_FIELDS = ("start", "end", "text", "words", "avg_logprob", "no_speech_prob", "compression_ratio")
+
+
+def load_wav(path: str) -> Tuple[np.ndarray, int]:
+    """
+    读取 16 位 PCM WAV（extract_audio_from_video 的输出）
+
+    Returns:
+        Tuple: (float32 单声道采样, 采样率)
+    """
+    with wave.open(path, 'rb') as f:
+        if f.getsampwidth() != 2:
+            raise ValueError(f"只支持 16 位 PCM WAV: {path}")
+        channels = f.getnchannels()
+        sample_rate = f.getframerate()
+        data = np.frombuffer(f.readframes(f.getnframes()), dtype="<i2")
+    samples = data.astype(np.float32) / 32768.0
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples, sample_rate
+
+
+def resample(samples: np.ndarray, sample_rate: int, target_rate: int = FINGERPRINT_RATE) -> np.ndarray:
+    """降采样到指纹采样率（整数倍时取均值，否则线性插值）"""
+    if sample_rate == target_rate:
+        return samples
+    if sample_rate % target_rate == 0:
+        factor = sample_rate // target_rate
+        usable = len(samples) // factor * factor
+        return samples[:usable].reshape(-1, factor).mean(axis=1)
+    count = int(len(samples) * target_rate / sample_rate)
+    positions = np.arange(count) * (sample_rate / target_rate)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def spectrogram(samples: np.ndarray) -> np.ndarray:
+    """对数幅度谱，形状为 (帧数, FREQ_BINS)"""
+    if len(samples) < FFT_SIZE:
+        return np.zeros((0, FREQ_BINS), dtype=np.float32)
+    frames = np.lib.stride_tricks.sliding_window_view(samples, FFT_SIZE)[::HOP_SIZE]
+    spectrum = np.abs(np.fft.rfft(frames * np.hanning(FFT_SIZE).astype(np.float32), axis=1))
+    return np.log(spectrum[:, :FREQ_BINS] + 1e-6).astype(np.float32)
+
+
+def _max_filter(values: np.ndarray, radius: int, axis: int) -> np.ndarray:
+    """沿一个轴的滑动最大值（边缘用 -inf 填充）"""
+    pad = [(0, 0), (0, 0)]
+    pad[axis] = (radius, radius)
+    padded = np.pad(values, pad, constant_values=-np.inf)
+    return np.lib.stride_tricks.sliding_window_view(padded, 2 * radius + 1, axis=axis).max(axis=-1)
+
+
+def spectral_peaks(samples: np.ndarray, sample_rate: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    提取频谱峰值
+
+    Returns:
+        Tuple: (帧号数组, 频点数组)，按帧号、频点排序
+    """
+    spec = spectrogram(resample(samples, sample_rate))
+    if not len(spec):
+        return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+    # 可分离的二维最大值滤波：局部最大且高于整体平均的点才算峰值
+    local_max = _max_filter(_max_filter(spec, PEAK_FREQ_RADIUS, axis=1), PEAK_TIME_RADIUS, axis=0)
+    frames, bins = np.nonzero((spec == local_max) & (spec > spec.mean()))
+    # 只保留最强的峰值，控制指纹密度
+    limit = max(1, int(len(spec) * FRAME_SECONDS * PEAKS_PER_SECOND))
+    if len(frames) > limit:
+        keep = np.argpartition(spec[frames, bins], -limit)[-limit:]
+        keep.sort()
+        frames, bins = frames[keep], bins[keep]
+    return frames.astype(np.int32), bins.astype(np.int32)
+
+
+def peak_hashes(frames: np.ndarray, bins: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    把峰值两两组合为哈希：(锚点频点, 目标频点, 时间差)
+
+    Returns:
+        Tuple: (哈希数组, 锚点帧号数组)
+    """
+    hashes = []
+    anchors = []
+    for k in range(1, FAN_OUT + 1):
+        if len(frames) <= k:
+            break
+        delta = frames[k:] - frames[:-k]
+        valid = (delta > 0) & (delta <= MAX_DELTA)
+        hashes.append((bins[:-k][valid].astype(np.int64) << 15)
+                      | (bins[k:][valid].astype(np.int64) << 6) | delta[valid])
+        anchors.append(frames[:-k][valid])
+    if not hashes:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int32)
+    return np.concatenate(hashes), np.concatenate(anchors).astype(np.int32)
+
+
+def fingerprint_audio(samples: np.ndarray, sample_rate: int) -> Dict[str, Any]:
+    """
+    计算音频指纹
+
+    Returns:
+        Dict: {"hashes", "frames", "duration", "seconds"}
+    """
+    start = time.perf_counter()
+    hashes, frames = peak_hashes(*spectral_peaks(samples, sample_rate))
+    return {
+        "hashes": hashes,
+        "frames": frames,
+        "duration": len(samples) / sample_rate,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def _covered_windows(hits: np.ndarray, totals: np.ndarray) -> np.ndarray:
+    """命中数达到阈值的窗口；夹在两个匹配窗口之间的无指纹窗口（静音）也算匹配"""
+    covered = hits >= MIN_WINDOW_HITS
+    silent = totals == 0
+    if covered.any():
+        first, last = np.flatnonzero(covered)[[0, -1]]
+        covered[first:last + 1] |= silent[first:last + 1]
+    return covered
+
+
+def _regions(covered: np.ndarray, window_frames: int, total_frames: int) -> List[Tuple[int, int]]:
+    """把连续的匹配窗口合并为 (开始帧, 结束帧) 区间"""
+    edges = np.diff(np.concatenate([[0], covered.astype(np.int8), [0]]))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    return [(int(s) * window_frames, min(int(e) * window_frames, total_frames))
+            for s, e in zip(starts, ends)]
+
+
+class FingerprintIndex:
+    """音频指纹索引（SQLite 存储哈希和已转录的语句）"""
+
+    def __init__(self, db_path: str):
+        """
+        打开（或创建）指纹索引
+
+        Args:
+            db_path: 索引数据库路径
+        """
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path)
+        self._conn.executescript(SCHEMA)
+
+    def add(self, path: str, fingerprint: Dict[str, Any], segments: List[Dict[str, Any]]) -> int:
+        """
+        登记一个已转录的文件（同一路径重复登记时替换旧记录）
+
+        Args:
+            path: 视频文件路径
+            fingerprint: fingerprint_audio 的结果
+            segments: 该文件的转录语句（时间以该文件为准）
+
+        Returns:
+            int: 源文件 id
+        """
+        stored = [{key: segment[key] for key in SEGMENT_FIELDS if key in segment}
+                  for segment in segments if segment.get("text", "").strip()]
+        path = os.path.abspath(path)
+        with self._conn:
+            row = self._conn.execute("SELECT id FROM sources WHERE path = ?", (path,)).fetchone()
+            if row:
+                self._conn.execute("DELETE FROM hashes WHERE source_id = ?", (row[0],))
+                self._conn.execute("DELETE FROM sources WHERE id = ?", (row[0],))
+            source_id = self._conn.execute(
+                "INSERT INTO sources (path, duration, segments, added_at) VALUES (?, ?, ?, ?)",
+                (path, fingerprint["duration"], json.dumps(stored, ensure_ascii=False), time.time())
+            ).lastrowid
+            self._conn.executemany(
+                "INSERT INTO hashes (hash, source_id, frame) VALUES (?, ?, ?)",
+                zip(fingerprint["hashes"].tolist(), [source_id] * len(fingerprint["hashes"]),
+                    fingerprint["frames"].tolist()))
+        return source_id
+
+    def _lookup(self, fingerprint: Dict[str, Any], exclude_path: Optional[str]):
+        """查询与指纹共有的哈希，返回 (查询帧号, 源文件 id, 源帧号) 数组"""
+        exclude = os.path.abspath(exclude_path) if exclude_path else ""
+        with self._conn:
+            self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS query (hash INTEGER, frame INTEGER)")
+            self._conn.execute("DELETE FROM query")
+            self._conn.executemany("INSERT INTO query (hash, frame) VALUES (?, ?)",
+                                   zip(fingerprint["hashes"].tolist(), fingerprint["frames"].tolist()))
+            rows = self._conn.execute(
+                "SELECT q.frame, h.source_id, h.frame FROM query q "
+                "JOIN hashes h ON h.hash = q.hash "
+                "JOIN sources s ON s.id = h.source_id WHERE s.path != ?", (exclude,)
+            ).fetchall()
+            self._conn.execute("DELETE FROM query")
+        if not rows:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, empty
+        matches = np.array(rows, dtype=np.int64)
+        return matches[:, 0], matches[:, 1], matches[:, 2]
+
+    def match(self, fingerprint: Dict[str, Any], exclude_path: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        把指纹与已登记的源文件匹配
+
+        Args:
+            fingerprint: 新文件的指纹
+            exclude_path: 不参与匹配的文件（通常是新文件自身，重新转录时不复用旧结果）
+
+        Returns:
+            List[Dict]: 按开始时间排序的匹配区间
+                        {"source_id", "path", "offset", "start", "end", "votes"}，
+                        新文件 t 秒处对应源文件 t + offset 秒处
+        """
+        query_frames, source_ids, source_frames = self._lookup(fingerprint, exclude_path)
+        if not len(query_frames):
+            return []
+
+        window_frames = max(1, int(round(WINDOW_SECONDS / FRAME_SECONDS)))
+        total_frames = max(1, int(np.ceil(fingerprint["duration"] / FRAME_SECONDS)))
+        num_windows = -(-total_frames // window_frames)
+        totals = np.bincount(fingerprint["frames"] // window_frames, minlength=num_windows)[:num_windows]
+
+        # 每个源文件按时间偏移投票（允许 ±1 帧的量化误差），票数多的源文件优先
+        candidates = []
+        for source_id in np.unique(source_ids):
+            mask = source_ids == source_id
+            offsets = source_frames[mask] - query_frames[mask]
+            values, counts = np.unique(offsets, return_counts=True)
+            smoothed = counts.copy()
+            smoothed[1:] += np.where(np.diff(values) == 1, counts[:-1], 0)
+            smoothed[:-1] += np.where(np.diff(values) == 1, counts[1:], 0)
+            best = int(np.argmax(smoothed))
+            if smoothed[best] >= MIN_VOTES:
+                candidates.append((int(smoothed[best]), int(source_id), int(values[best]), mask))
+        candidates.sort(reverse=True)
+
+        assigned = np.zeros(num_windows, dtype=bool)
+        results = []
+        for votes, source_id, offset, mask in candidates:
+            aligned = np.abs(source_frames[mask] - query_frames[mask] - offset) <= 1
+            hits = np.bincount(query_frames[mask][aligned] // window_frames,
+                               minlength=num_windows)[:num_windows]
+            covered = _covered_windows(hits, totals) & ~assigned
+            path, duration = self._conn.execute(
+                "SELECT path, duration FROM sources WHERE id = ?", (source_id,)).fetchone()
+            for start_frame, end_frame in _regions(covered, window_frames, total_frames):
+                start = start_frame * FRAME_SECONDS
+                end = min(end_frame * FRAME_SECONDS, fingerprint["duration"])
+                offset_seconds = offset * FRAME_SECONDS
+                # 区间不能超出源文件的时长
+                start = max(start, -offset_seconds)
+                end = min(end, duration - offset_seconds)
+                if end - start < MIN_REGION_SECONDS:
+                    continue
+                assigned[start_frame // window_frames:-(-end_frame // window_frames)] = True
+                results.append({"source_id": source_id, "path": path, "offset": offset_seconds,
+                                "start": start, "end": end, "votes": votes})
+        results.sort(key=lambda region: region["start"])
+        return results
+
+    def reuse_segments(self, region: Dict[str, Any], tolerance: float = 0.5) -> List[Dict[str, Any]]:
+        """
+        取出源文件中完全落在匹配区间内的语句，时间换算到新文件
+
+        Args:
+            region: match 返回的匹配区间
+            tolerance: 语句超出区间边界的容差（秒）
+
+        Returns:
+            List[Dict]: 时间已平移的语句（带 reused_from 字段）
+        """
+        row = self._conn.execute("SELECT segments FROM sources WHERE id = ?",
+                                 (region["source_id"],)).fetchone()
+        if not row:
+            return []
+        offset = region["offset"]
+        reused = []
+        for segment in json.loads(row[0]):
+            start = segment["start"] - offset
+            end = segment["end"] - offset
+            if start < region["start"] - tolerance or end > region["end"] + tolerance:
+                continue
+            start = max(start, 0.0)
+            segment = dict(segment, start=start, end=end, reused_from=region["path"])
+            if "words" in segment:
+                # 新文件开头之前的词时间截到 0，并且不超出语句范围
+                segment["words"] = [dict(word, start=min(max(word["start"] - offset, start), end),
+                                         end=min(max(word["end"] - offset, start), end))
+                                    for word in segment["words"]]
+            reused.append(segment)
+        return reused
+
+    def sources(self) -> List[Dict[str, Any]]:
+        """列出已登记的源文件"""
+        rows = self._conn.execute(
+            "SELECT s.id, s.path, s.duration, COUNT(h.hash) FROM sources s "
+            "LEFT JOIN hashes h ON h.source_id = s.id GROUP BY s.id ORDER BY s.id").fetchall()
+        return [{"id": r[0], "path": r[1], "duration": r[2], "hashes": r[3]} for r in rows]
+
+    def close(self):
+        self._conn.close()
+
+
+def uncovered_spans(duration: float, covered: List[Tuple[float, float]],
+                    min_length: float = 1.0) -> List[Tuple[float, float]]:
+    """
+    计算 [0, duration] 中未被覆盖的区间
+
+    Args:
+        duration: 音频时长（秒）
+        covered: 已覆盖的 (开始, 结束) 区间
+        min_length: 短于该值的空隙忽略
+
+    Returns:
+        List[Tuple]: 未覆盖的 (开始, 结束) 区间
+    """
+    gaps = []
+    cursor = 0.0
+    for start, end in sorted(covered):
+        if start - cursor >= min_length:
+            gaps.append((cursor, start))
+        cursor = max(cursor, end)
+    if duration - cursor >= min_length:
+        gaps.append((cursor, duration))
+    return gaps
+
+
+def main():
+    parser = argparse.ArgumentParser(description="音频指纹索引：查询WAV音频与已转录文件的匹配情况")
+    parser.add_argument("--db", default="fingerprints.db", help="指纹索引数据库路径（默认: fingerprints.db）")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    match_parser = subparsers.add_parser("match", help="匹配音频文件（16 位 PCM WAV）")
+    match_parser.add_argument("audio_path", help="音频文件路径")
+    subparsers.add_parser("list", help="列出已登记的源文件")
+    args = parser.parse_args()
+
+    index = FingerprintIndex(args.db)
+    try:
+        if args.command == "list":
+            for source in index.sources():
+                print(f"{source['id']:>4}  {source['duration']:8.1f}s  {source['hashes']:>8} 哈希  {source['path']}")
+            return
+        samples, sample_rate = load_wav(args.audio_path)
+        fingerprint = fingerprint_audio(samples, sample_rate)
+        print(f"指纹: {len(fingerprint['hashes'])} 个哈希，用时 {fingerprint['seconds']:.2f}s")
+        regions = index.match(fingerprint)
+        if not regions:
+            print("没有匹配的源文件")
+        for region in regions:
+            print(f"{region['start']:8.1f}s - {region['end']:8.1f}s  ->  {region['path']} "
+                  f"（偏移 {region['offset']:+.2f}s，{region['votes']} 票）")
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量转录吞吐量基准测试
+在CPU上比较逐个解码与不同批大小的 transcribe_batch
+
+基线逐个输入调用 transcribe_batch(..., batch_size=1)，与批量解码使用完全相同的解码方式
+（单次贪心解码、无温度回退），测得的加速只来自批量计算本身
+"""
+
+import json
+import time
+import argparse
+import numpy as np
+from video_to_text import VideoToTextConverter
+
+
+def make_synthetic_clips(num_clips: int, clip_seconds: float, seed: int = 0):
+    """生成合成音频（叠加若干正弦波和噪声），只用于测量吞吐量"""
+    rng = np.random.default_rng(seed)
+    sample_rate = 16000
+    t = np.arange(int(clip_seconds * sample_rate)) / sample_rate
+    clips = []
+    for _ in range(num_clips):
+        freqs = rng.uniform(100, 1000, size=3)
+        wave = sum(np.sin(2 * np.pi * f * t) for f in freqs) / 3
+        wave = 0.3 * wave + 0.05 * rng.standard_normal(len(t))
+        clips.append(wave.astype(np.float32))
+    return clips
+
+
+def run_benchmark(model_size: str, num_clips: int, clip_seconds: float,
+                  batch_sizes: list) -> dict:
+    """执行基准测试并返回结果"""
+    converter = VideoToTextConverter(model_size=model_size)
+    converter.model = converter.model.to("cpu")
+    clips = make_synthetic_clips(num_clips, clip_seconds)
+    audio_seconds = num_clips * clip_seconds
+
+    report = {
+        "model_size": model_size,
+        "num_clips": num_clips,
+        "clip_seconds": clip_seconds,
+        "results": []
+    }
+
+    # 基线：逐个输入、逐个窗口解码（transcribe 带温度回退，解码工作量不同，不作为基线）
+    start = time.perf_counter()
+    for clip in clips:
+        converter.transcribe_batch([clip], batch_size=1)
+    elapsed = time.perf_counter() - start
+    report["results"].append({
+        "mode": "sequential",
+        "batch_size": 1,
+        "seconds": elapsed,
+        "clips_per_second": num_clips / elapsed,
+        "realtime_factor": audio_seconds / elapsed
+    })
+    print(f"逐个转录: {elapsed:.2f}s ({num_clips / elapsed:.2f} 个/秒)")
+
+    for batch_size in batch_sizes:
+        start = time.perf_counter()
+        converter.transcribe_batch(clips, batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+        report["results"].append({
+            "mode": "batched",
+            "batch_size": batch_size,
+            "seconds": elapsed,
+            "clips_per_second": num_clips / elapsed,
+            "realtime_factor": audio_seconds / elapsed
+        })
+        print(f"批大小 {batch_size:>2}: {elapsed:.2f}s ({num_clips / elapsed:.2f} 个/秒)")
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量转录吞吐量基准测试（CPU）")
+    parser.add_argument("-m", "--model", choices=["tiny", "base", "small", "medium", "large"],
+                       default="tiny", help="Whisper模型大小（默认: tiny）")
+    parser.add_argument("-n", "--num-clips", type=int, default=32,
+                       help="合成音频数量（默认: 32）")
+    parser.add_argument("--clip-seconds", type=float, default=60.0,
+                       help="每段合成音频时长（秒），默认: 60.0")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32],
+                       help="要测试的批大小（默认: 1 2 4 8 16 32）")
+    parser.add_argument("-o", "--output", help="将结果保存为JSON文件")
+
+    args = parser.parse_args()
+
+    report = run_benchmark(args.model, args.num_clips, args.clip_seconds, args.batch_sizes)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+端到端流水线基准测试
+用 ffmpeg lavfi 生成指定时长、分辨率和 GOP 的合成视频，分别测量音频提取、
+片段裁剪和完整转写流程的耗时；结果保存为JSON，并可与基线比较，
+任一指标变慢超过阈值时以非零状态退出（用于 CI 中的性能回归检查）
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import statistics
+import contextlib
+from typing import Any, Callable, Dict, List
+from video_to_text import VideoToTextConverter, CLIPPER_DIR
+from audio_fingerprint import load_wav
+from ffmpeg_runner import FFmpegRunner
+
+if str(CLIPPER_DIR) not in sys.path:
+    sys.path.insert(0, str(CLIPPER_DIR))
+from video_clipper import VideoClipper
+
+# 比较基线时，耗时低于该值（秒）的指标只看绝对差，避免计时抖动造成误报
+MIN_COMPARE_SECONDS = 0.05
+
+
+class MockWhisperModel:
+    """模拟的 Whisper 模型：按固定间隔生成语句，只用于测量模型以外的流水线开销"""
+
+    def __init__(self, segment_seconds: float = 4.0):
+        self.segment_seconds = segment_seconds
+
+    def transcribe(self, audio, **kwargs) -> Dict[str, Any]:
+        if isinstance(audio, str):
+            samples, sample_rate = load_wav(audio)
+        else:
+            samples, sample_rate = audio, 16000
+        duration = len(samples) / sample_rate
+        segments = []
+        start = 0.0
+        while start < duration:
+            end = min(start + self.segment_seconds, duration)
+            segments.append({
+                "id": len(segments),
+                "start": start,
+                "end": end,
+                "text": f"第{len(segments) + 1}句合成语音。",
+                "avg_logprob": -0.2,
+                "no_speech_prob": 0.01,
+                "compression_ratio": 1.2,
+                "words": [{"word": "合成", "start": start, "end": end}],
+            })
+            start = end
+        return {"text": "".join(s["text"] for s in segments), "segments": segments, "language": "zh"}
+
+
+class MockConverter(VideoToTextConverter):
+    """使用模拟模型的转换器（不加载 Whisper 权重）"""
+
+    def load_model(self):
+        self.model = MockWhisperModel()
+
+
+def generate_video(path: str, duration: float, width: int, height: int,
+                   fps: int, gop: int) -> float:
+    """
+    用 lavfi 生成合成视频（testsrc2 画面 + 正弦波音频，H.264/AAC）
+
+    Returns:
+        float: 生成耗时（秒）
+    """
+    result = FFmpegRunner().run_sync([
+        '-f', 'lavfi', '-i', f'testsrc2=size={width}x{height}:rate={fps}:duration={duration}',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:beep_factor=4:sample_rate=44100:duration={duration}',
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p',
+        '-g', str(gop), '-keyint_min', str(gop), '-sc_threshold', '0',
+        '-c:a', 'aac', '-shortest', '-y', path
+    ], name=os.path.basename(path), duration=duration)
+    if result["status"] != "ok":
+        raise RuntimeError(f"生成合成视频失败: {result['stderr']}")
+    return result["seconds"]
+
+
+def measure(func: Callable[[], Any], repeat: int, verbose: bool) -> Dict[str, Any]:
+    """重复执行并返回耗时的中位数、最小值和每次的耗时"""
+    times = []
+    for _ in range(repeat):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(sys.stdout if verbose else output):
+            start = time.perf_counter()
+            ok = func()
+            elapsed = time.perf_counter() - start
+        if ok is False:
+            raise RuntimeError(f"执行失败:\n{output.getvalue()}")
+        times.append(elapsed)
+    return {"median": statistics.median(times), "min": min(times), "runs": times}
+
+
+def run_benchmark(args) -> Dict[str, Any]:
+    """执行全部基准测试并返回结果"""
+    report: Dict[str, Any] = {
+        "config": {
+            "duration": args.duration,
+            "resolution": f"{args.width}x{args.height}",
+            "fps": args.fps,
+            "gop": args.gop,
+            "model": args.model,
+            "clips": args.clips,
+            "clip_seconds": args.clip_seconds,
+            "jobs": args.jobs,
+            "repeat": args.repeat,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "metrics": {},
+    }
+    metrics = report["metrics"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, "synthetic.mp4")
+        print(f"生成合成视频: {args.duration:.0f}s, {args.width}x{args.height}, "
+              f"{args.fps}fps, GOP {args.gop}")
+        report["generate_seconds"] = generate_video(
+            video_path, args.duration, args.width, args.height, args.fps, args.gop)
+        report["video_bytes"] = os.path.getsize(video_path)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            if args.model == "mock":
+                converter = MockConverter()
+            else:
+                converter = VideoToTextConverter(model_size=args.model)
+
+        # 音频提取
+        audio_path = os.path.join(tmp, "audio.wav")
+        metrics["extract_audio"] = measure(
+            lambda: converter.extract_audio_from_video(video_path, audio_path), args.repeat, args.verbose)
+
+        # 单个片段裁剪，以及按结果文件批量裁剪
+        clip_dir = os.path.join(tmp, "clips")
+        with contextlib.redirect_stdout(io.StringIO()):
+            clipper = VideoClipper(video_path, clip_dir, probe_cache=None, max_concurrent=args.jobs)
+        middle = max(args.duration / 2 - args.clip_seconds / 2, 0.0)
+        metrics["clip_single"] = measure(
+            lambda: clipper.clip_video(middle, middle + args.clip_seconds, "single.mp4"),
+            args.repeat, args.verbose)
+
+        step = args.duration / args.clips
+        result_file = os.path.join(tmp, "result.json")
+        with open(result_file, 'w', encoding='utf-8') as f:
+            json.dump({"sentences": [
+                {"id": i + 1, "text": f"片段{i + 1}", "start_time": i * step,
+                 "end_time": min(i * step + args.clip_seconds, args.duration)}
+                for i in range(args.clips)
+            ]}, f, ensure_ascii=False)
+        metrics["clip_batch"] = measure(
+            lambda: clipper.process_result_json(result_file), args.repeat, args.verbose)
+
+        # 完整流程：提取音频、识别、合并、写出 JSON/TXT
+        output_dir = os.path.join(tmp, "transcript")
+        metrics["pipeline"] = measure(
+            lambda: converter.convert_video_to_text(video_path, output_dir, ["json", "txt"]),
+            args.repeat, args.verbose)
+
+    for name, metric in metrics.items():
+        metric["realtime_factor"] = args.duration / metric["median"] if metric["median"] else 0.0
+    return report
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    与基线比较各指标的耗时中位数
+
+    Returns:
+        List[str]: 变慢超过阈值的指标名
+    """
+    if baseline.get("config") != report["config"]:
+        print("⚠️  基线的测试配置与本次不同，比较结果仅供参考")
+
+    regressions = []
+    print(f"\n{'指标':<14}{'基线':>10}{'本次':>10}{'变化':>10}")
+    for name, metric in report["metrics"].items():
+        base = baseline.get("metrics", {}).get(name)
+        if not base:
+            print(f"{name:<14}{'-':>10}{metric['median']:>9.3f}s{'新增':>10}")
+            continue
+        old, new = base["median"], metric["median"]
+        change = (new - old) / old if old else 0.0
+        regressed = new > old * (1 + threshold) and new - old > MIN_COMPARE_SECONDS
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<14}{old:>9.3f}s{new:>9.3f}s{change * 100:>+9.1f}%{'  ❌' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端流水线基准测试（合成视频）")
+    parser.add_argument("--duration", type=float, default=120.0, help="合成视频时长（秒），默认: 120")
+    parser.add_argument("--width", type=int, default=1280, help="画面宽度（默认: 1280）")
+    parser.add_argument("--height", type=int, default=720, help="画面高度（默认: 720）")
+    parser.add_argument("--fps", type=int, default=25, help="帧率（默认: 25）")
+    parser.add_argument("--gop", type=int, default=50, help="关键帧间隔（帧），默认: 50")
+    parser.add_argument("-m", "--model", choices=["mock", "tiny", "base"], default="mock",
+                       help="识别模型，mock 表示不加载 Whisper、只测量流水线开销（默认: mock）")
+    parser.add_argument("--clips", type=int, default=10, help="批量裁剪的片段数（默认: 10）")
+    parser.add_argument("--clip-seconds", type=float, default=8.0, help="每个片段的时长（秒），默认: 8")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="裁剪时同时运行的 ffmpeg 进程数（默认: 1）")
+    parser.add_argument("--repeat", type=int, default=3, help="每项重复次数，取中位数（默认: 3）")
+    parser.add_argument("--baseline", help="基线结果JSON文件，给出时与之比较")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                       help="允许的变慢比例，超过即判定为回归（默认: 0.2）")
+    parser.add_argument("-o", "--output", help="将结果保存为JSON文件")
+    parser.add_argument("--verbose", action="store_true", help="显示各步骤的输出")
+
+    args = parser.parse_args()
+
+    try:
+        report = run_benchmark(args)
+    except (RuntimeError, OSError) as e:
+        print(f"基准测试失败: {e}")
+        sys.exit(2)
+
+    print(f"\n📊 结果（{args.duration:.0f}s 视频，中位数，共 {args.repeat} 次）:")
+    for name, metric in report["metrics"].items():
+        print(f"  {name:<14}{metric['median']:.3f}s（{metric['realtime_factor']:.1f}x 实时）")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ 性能回归（超过 {args.threshold * 100:.0f}%）: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\n✅ 没有性能回归")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+任务队列扩展性基准测试
+用多个本地 worker 进程执行模拟任务，测量吞吐量随 worker 数的变化，
+并可模拟 worker 崩溃，验证租约过期后任务会被重新执行
+"""
+
+import os
+import json
+import time
+import argparse
+import tempfile
+import multiprocessing
+from job_queue import JobQueue, QueueWorker
+
+
+def sleep_handler(params: dict) -> dict:
+    """模拟任务：等待指定时长（代表一次转写或裁剪）"""
+    time.sleep(params["seconds"])
+    return {"success": True}
+
+
+def worker_process(db_path: str, worker_id: str, lease: float, crash_after: int = 0):
+    """worker 进程入口；crash_after > 0 时在第 crash_after 个任务执行中途直接退出"""
+    queue = JobQueue(db_path)
+    handlers = {"sleep": sleep_handler}
+    if crash_after:
+        executed = [0]
+
+        def crashing_handler(params):
+            executed[0] += 1
+            if executed[0] == crash_after:
+                time.sleep(params["seconds"] / 2)
+                os._exit(1)
+            return sleep_handler(params)
+        handlers = {"sleep": crashing_handler}
+    worker = QueueWorker(queue, handlers, worker_id=worker_id, lease=lease, poll_interval=0.05,
+                         verbose=False)
+    worker.run(exit_when_empty=True)
+    queue.close()
+
+
+def run_level(num_workers: int, args, crash: bool = False) -> dict:
+    """在指定 worker 数下执行一轮"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "jobs.db")
+        queue = JobQueue(db_path)
+        for _ in range(args.jobs):
+            queue.submit("sleep", {"seconds": args.job_seconds})
+
+        start = time.perf_counter()
+        processes = [
+            multiprocessing.Process(
+                target=worker_process,
+                args=(db_path, f"w{i}", args.lease, 2 if crash and i == 0 else 0))
+            for i in range(num_workers)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        # 崩溃的 worker 留下的任务要等租约过期后才能被领取，由新的 worker 收尾
+        while queue.counts().get("completed", 0) + queue.counts().get("failed", 0) < args.jobs:
+            worker_process(db_path, "cleanup", args.lease)
+            time.sleep(0.05)
+        elapsed = time.perf_counter() - start
+
+        counts = queue.counts()
+        attempts = queue._conn.execute("SELECT SUM(attempts) FROM jobs").fetchone()[0]
+        queue.close()
+
+    ideal = args.jobs * args.job_seconds / num_workers
+    return {
+        "workers": num_workers,
+        "seconds": elapsed,
+        "jobs_per_second": args.jobs / elapsed,
+        "efficiency": ideal / elapsed,
+        "completed": counts.get("completed", 0),
+        "attempts": attempts,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="任务队列扩展性基准测试")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8],
+                       help="worker 进程数（默认: 1 2 4 8）")
+    parser.add_argument("--jobs", type=int, default=64, help="任务数（默认: 64）")
+    parser.add_argument("--job-seconds", type=float, default=0.2, help="每个模拟任务的时长（秒），默认: 0.2")
+    parser.add_argument("--lease", type=float, default=2.0, help="租约时长（秒），默认: 2")
+    parser.add_argument("--crash", action="store_true", help="额外运行一轮：一个 worker 在执行任务中途崩溃")
+    parser.add_argument("-o", "--output", help="把结果写入JSON文件")
+    args = parser.parse_args()
+
+    results = []
+    for num_workers in args.workers:
+        result = run_level(num_workers, args)
+        results.append(result)
+        print(f"worker {num_workers:>2}: {result['seconds']:.2f}s, {result['jobs_per_second']:.1f} 任务/秒, "
+              f"并行效率 {result['efficiency'] * 100:.0f}%")
+
+    if args.crash:
+        result = run_level(max(args.workers), args, crash=True)
+        result["crash"] = True
+        results.append(result)
+        print(f"崩溃测试（{result['workers']} worker）: 完成 {result['completed']}/{args.jobs}，"
+              f"总执行次数 {result['attempts']}，耗时 {result['seconds']:.2f}s")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+时间戳格式化与文档渲染基准测试
+对比逐条格式化、逐行写入的原实现与批量渲染，并校验输出逐字节一致
+"""
+
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+from transcript_render import format_timestamps, render_json, render_txt, render_srt, write_document
+
+
+def legacy_format_timestamp(seconds: float) -> str:
+    """原实现：逐个浮点运算加 f-string"""
+    hours = int(seconds // 3600)
+    minutes = int((seconds % 3600) // 60)
+    secs = seconds % 60
+    return f"{hours:02d}:{minutes:02d}:{secs:06.3f}"
+
+
+def legacy_process(segments):
+    """原实现的 process_transcription_result"""
+    sentences = []
+    for segment in segments:
+        sentence_data = {
+            "id": segment.get("id", 0),
+            "text": segment.get("text", "").strip(),
+            "start_time": segment.get("start", 0),
+            "end_time": segment.get("end", 0),
+            "start_timestamp": legacy_format_timestamp(segment.get("start", 0)),
+            "end_timestamp": legacy_format_timestamp(segment.get("end", 0)),
+            "duration": segment.get("end", 0) - segment.get("start", 0)
+        }
+        if sentence_data["text"]:
+            sentences.append(sentence_data)
+    return sentences
+
+
+def bulk_process(segments):
+    """批量格式化时间戳的 process_transcription_result"""
+    segments = [s for s in segments if s.get("text", "").strip()]
+    starts = [s.get("start", 0) for s in segments]
+    ends = [s.get("end", 0) for s in segments]
+    start_timestamps = format_timestamps(starts)
+    end_timestamps = format_timestamps(ends)
+    return [
+        {
+            "id": s.get("id", 0),
+            "text": s.get("text", "").strip(),
+            "start_time": starts[i],
+            "end_time": ends[i],
+            "start_timestamp": start_timestamps[i],
+            "end_timestamp": end_timestamps[i],
+            "duration": ends[i] - starts[i]
+        }
+        for i, s in enumerate(segments)
+    ]
+
+
+def legacy_write(sentences, output_dir):
+    """原实现的 save_as_json / save_as_txt / save_as_srt"""
+    with open(os.path.join(output_dir, "legacy.json"), 'w', encoding='utf-8') as f:
+        json.dump({"total_sentences": len(sentences), "sentences": sentences},
+                  f, ensure_ascii=False, indent=2)
+    with open(os.path.join(output_dir, "legacy.txt"), 'w', encoding='utf-8') as f:
+        f.write("视频语音转文字结果\n")
+        f.write("=" * 50 + "\n\n")
+        for sentence in sentences:
+            f.write(f"[{sentence['start_timestamp']} --> {sentence['end_timestamp']}]\n")
+            f.write(f"{sentence['text']}\n\n")
+    with open(os.path.join(output_dir, "legacy.srt"), 'w', encoding='utf-8') as f:
+        for i, sentence in enumerate(sentences, 1):
+            start_time = sentence['start_timestamp'].replace('.', ',')
+            end_time = sentence['end_timestamp'].replace('.', ',')
+            f.write(f"{i}\n")
+            f.write(f"{start_time} --> {end_time}\n")
+            f.write(f"{sentence['text']}\n\n")
+
+
+def bulk_write(sentences, output_dir):
+    """批量渲染，每个文件一次写入"""
+    write_document(os.path.join(output_dir, "bulk.json"), render_json(sentences))
+    write_document(os.path.join(output_dir, "bulk.txt"), render_txt(sentences))
+    write_document(os.path.join(output_dir, "bulk.srt"), render_srt(sentences))
+
+
+def make_segments(count: int, seed: int = 0):
+    """生成模拟 Whisper 输出的语句（时间为 0.02 秒的整数倍）"""
+    rng = random.Random(seed)
+    segments = []
+    t = 0.0
+    for i in range(count):
+        start = t + rng.randint(0, 50) * 0.02
+        end = start + rng.randint(25, 400) * 0.02
+        segments.append({"id": i, "start": start, "end": end,
+                         "text": " 消费板块整体的预计还是挺高的" * rng.randint(1, 4)})
+        t = end
+    return segments
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    value = func(*args)
+    return value, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="时间戳格式化与文档渲染基准测试")
+    parser.add_argument("-n", "--num-segments", type=int, default=1000000,
+                       help="模拟语句数量（默认: 1000000）")
+    parser.add_argument("-o", "--output", help="将结果保存为JSON文件")
+    args = parser.parse_args()
+
+    segments = make_segments(args.num_segments)
+    print(f"模拟语句数: {len(segments)}")
+
+    legacy_sentences, legacy_process_time = timed(legacy_process, segments)
+    bulk_sentences, bulk_process_time = timed(bulk_process, segments)
+    assert legacy_sentences == bulk_sentences, "批量格式化结果与原实现不一致"
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        _, legacy_write_time = timed(legacy_write, legacy_sentences, output_dir)
+        _, bulk_write_time = timed(bulk_write, bulk_sentences, output_dir)
+        for ext in ("json", "txt", "srt"):
+            with open(os.path.join(output_dir, f"legacy.{ext}"), 'rb') as f:
+                legacy_bytes = f.read()
+            with open(os.path.join(output_dir, f"bulk.{ext}"), 'rb') as f:
+                bulk_bytes = f.read()
+            assert legacy_bytes == bulk_bytes, f"{ext} 输出与原实现不一致"
+    print("✅ 输出与原实现逐字节一致")
+
+    report = {
+        "num_segments": len(segments),
+        "process_seconds": {"legacy": legacy_process_time, "bulk": bulk_process_time},
+        "write_seconds": {"legacy": legacy_write_time, "bulk": bulk_write_time},
+        "process_speedup": legacy_process_time / bulk_process_time,
+        "write_speedup": legacy_write_time / bulk_write_time,
+    }
+    print(f"时间戳格式化: {legacy_process_time:.2f}s -> {bulk_process_time:.2f}s "
+          f"({report['process_speedup']:.1f}x)")
+    print(f"文档渲染写入: {legacy_write_time:.2f}s -> {bulk_write_time:.2f}s "
+          f"({report['write_speedup']:.1f}x)")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
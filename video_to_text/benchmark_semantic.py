@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+段落语义检索基准测试
+用带聚类结构的合成向量构建 10^4 到 10^6 规模的索引，测量平铺扫描与 IVF 检索的
+单次查询延迟、批量吞吐量，以及 IVF 相对平铺扫描的 top-k 召回率
+"""
+
+import os
+import json
+import time
+import argparse
+import tempfile
+import numpy as np
+from semantic_index import SemanticIndex, HashedNgramEmbedder
+
+
+def synthetic_vectors(count: int, dim: int, topics: int, rng: np.random.Generator) -> np.ndarray:
+    """合成段落向量：围绕若干话题中心加噪声后归一化（模拟同一话题的段落彼此相近）"""
+    centers = rng.standard_normal((topics, dim)).astype(np.float32)
+    vectors = np.empty((count, dim), dtype=np.float32)
+    for begin in range(0, count, 65536):
+        size = min(65536, count - begin)
+        chunk = centers[rng.integers(0, topics, size)] + 0.6 * rng.standard_normal((size, dim)).astype(np.float32)
+        vectors[begin:begin + size] = chunk / np.linalg.norm(chunk, axis=1, keepdims=True)
+    return vectors
+
+
+def time_queries(index: SemanticIndex, queries: np.ndarray, k: int, nprobe: int, batch: int) -> dict:
+    """测量单次查询延迟和批量吞吐量"""
+    start = time.perf_counter()
+    for query in queries[:min(len(queries), 10)]:
+        index.search_vectors(query[None, :], k, nprobe)
+    single = (time.perf_counter() - start) / min(len(queries), 10)
+
+    start = time.perf_counter()
+    results = []
+    for begin in range(0, len(queries), batch):
+        results.extend(index.search_vectors(queries[begin:begin + batch], k, nprobe))
+    batched = (time.perf_counter() - start) / len(queries)
+    return {"single_ms": single * 1000, "batched_ms_per_query": batched * 1000, "results": results}
+
+
+def recall(results, reference) -> float:
+    """IVF 结果相对平铺扫描结果的 top-k 召回率"""
+    hits = total = 0
+    for got, expected in zip(results, reference):
+        expected_ids = {(r["video"], r["id"]) for r in expected}
+        hits += len(expected_ids & {(r["video"], r["id"]) for r in got})
+        total += len(expected_ids)
+    return hits / total if total else 1.0
+
+
+def run_size(size: int, args, rng: np.random.Generator) -> dict:
+    vectors = synthetic_vectors(size, args.dim, args.topics, rng)
+    # 查询取自库中的段落再加少量扰动（与库共用话题中心）
+    queries = vectors[rng.choice(size, args.queries, replace=False)] + 0.05 * rng.standard_normal(
+        (args.queries, args.dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    ivf_lists = args.ivf or max(16, int(np.sqrt(size)))
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        SemanticIndex.write(tmp, vectors, np.arange(size) // 1000, np.arange(size) % 1000,
+                            np.zeros((size, 2), dtype=np.int64), [],
+                            [{"video": f"v{i}", "transcript": ""} for i in range(size // 1000 + 1)],
+                            HashedNgramEmbedder(args.dim).config(), ivf_lists)
+        build = time.perf_counter() - start
+        del vectors
+        index = SemanticIndex(tmp)
+
+        flat = time_queries(index, queries, args.k, 0, args.batch)
+        result = {
+            "size": size,
+            "dim": args.dim,
+            "index_mb": os.path.getsize(os.path.join(tmp, "vectors.f16")) / 1024 / 1024,
+            "build_seconds": build,
+            "ivf_lists": ivf_lists,
+            "flat_single_ms": flat["single_ms"],
+            "flat_batched_ms": flat["batched_ms_per_query"],
+            "ivf": [],
+        }
+        print(f"{size:>8} 段落: 建索引 {build:.1f}s, 平铺扫描 单次 {flat['single_ms']:.1f}ms / "
+              f"批量 {flat['batched_ms_per_query']:.2f}ms 每查询")
+        for nprobe in args.nprobe:
+            ivf = time_queries(index, queries, args.k, nprobe, args.batch)
+            entry = {"nprobe": nprobe, "single_ms": ivf["single_ms"],
+                     "batched_ms": ivf["batched_ms_per_query"],
+                     "recall": recall(ivf["results"], flat["results"])}
+            result["ivf"].append(entry)
+            print(f"{'':>8}   IVF {ivf_lists} 分区 nprobe {nprobe:>3}: 单次 {entry['single_ms']:.2f}ms / "
+                  f"批量 {entry['batched_ms']:.2f}ms 每查询, 召回率 {entry['recall'] * 100:.1f}%")
+        del index
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="段落语义检索基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                       help="段落数（默认: 10000 100000 1000000）")
+    parser.add_argument("--dim", type=int, default=256, help="向量维度（默认: 256）")
+    parser.add_argument("--topics", type=int, default=2000, help="合成话题数（默认: 2000）")
+    parser.add_argument("--queries", type=int, default=256, help="查询数（默认: 256）")
+    parser.add_argument("--batch", type=int, default=64, help="批量检索的批大小（默认: 64）")
+    parser.add_argument("-k", type=int, default=10, help="每个查询返回的结果数（默认: 10）")
+    parser.add_argument("--ivf", type=int, default=0, help="IVF 分区数（默认: 段落数的平方根）")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[8, 32], help="IVF 检索的分区数（默认: 8 32）")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子（默认: 0）")
+    parser.add_argument("-o", "--output", help="把结果写入JSON文件")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    results = [run_size(size, args, rng) for size in args.sizes]
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
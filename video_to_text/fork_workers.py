@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+预加载后 fork 的转写 worker
+父进程只加载一次 Whisper 模型并把权重放入共享内存，再 fork 出多个 worker，
+各 worker 共享同一份模型权重，每个 worker 只额外占用自己的运行时内存。
+worker 从多机任务队列（job_queue.py）领取任务。仅支持 Linux（依赖 fork）。
+
+只支持 CPU 推理：共享内存只对 CPU 张量有效，且 CUDA 在 fork 出的子进程中无法重新初始化，
+因此模型总是加载到 CPU，父进程已初始化 CUDA 时拒绝 fork。
+"""
+
+import os
+import gc
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from queue import Empty
+from typing import Any, Dict, List
+
+import torch
+from video_to_text import VideoToTextConverter
+from job_queue import JobQueue, QueueWorker, default_handlers
+from service import MODEL_SIZES
+
+
+def memory_usage(pid: str = "self") -> Dict[str, float]:
+    """
+    读取进程内存（MB）
+
+    Returns:
+        Dict: {"rss", "pss", "shared", "private"}；private 为该进程独占的内存，
+              即多启动一个 worker 实际增加的内存
+    """
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", 'r') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                    fields[parts[0][:-1]] = int(parts[1]) / 1024
+    except OSError:
+        return {}
+    return {
+        "rss": fields.get("Rss", 0.0),
+        "pss": fields.get("Pss", 0.0),
+        "shared": fields.get("Shared_Clean", 0.0) + fields.get("Shared_Dirty", 0.0),
+        "private": fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0),
+    }
+
+
+def share_model(model: torch.nn.Module) -> float:
+    """
+    把模型参数和缓冲区移入共享内存，并冻结推理所需的状态
+
+    Returns:
+        float: 共享的权重大小（MB）
+    """
+    model.eval()
+    size = 0
+    for tensor in list(model.parameters()) + list(model.buffers()):
+        tensor.requires_grad_(False)
+        tensor.share_memory_()
+        size += tensor.numel() * tensor.element_size()
+    return size / 1024 / 1024
+
+
+def worker_main(index: int, converter: VideoToTextConverter, forked_at: float,
+                args, reports: multiprocessing.Queue):
+    """子进程入口：复用父进程加载的模型，从任务队列领取任务"""
+    ready = time.perf_counter()
+    torch.set_num_threads(args.threads)
+    report: Dict[str, Any] = {
+        "worker": index,
+        "pid": os.getpid(),
+        "startup_ms": (ready - forked_at) * 1000,
+        "memory_start": memory_usage(),
+    }
+
+    if not args.dry_run:
+        queue = JobQueue(args.db, journal_mode=args.journal)
+
+        def converter_factory(model_size: str):
+            # 与预加载模型相同大小的任务直接复用共享权重，其他大小在本进程内单独加载
+            if model_size == converter.model_size:
+                return converter
+            return VideoToTextConverter(model_size=model_size, device="cpu")
+
+        handlers = default_handlers(converter.model_size, converter_factory)
+        worker = QueueWorker(queue, handlers, worker_id=f"{os.uname().nodename}:{os.getpid()}",
+                             lease=args.lease, poll_interval=args.poll)
+        try:
+            worker.run(exit_when_empty=args.exit_when_empty)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            queue.close()
+        report["stats"] = worker.stats
+
+    report["memory_end"] = memory_usage()
+    reports.put(report)
+
+
+def launch(args) -> List[Dict[str, Any]]:
+    """加载模型、fork worker 并等待全部退出，返回各 worker 的报告"""
+    baseline = memory_usage()
+    start = time.perf_counter()
+    converter = VideoToTextConverter(model_size=args.model, device="cpu")
+    load_seconds = time.perf_counter() - start
+    shared_mb = share_model(converter.model)
+    loaded = memory_usage()
+    print(f"模型加载用时 {load_seconds:.1f}s，共享权重 {shared_mb:.0f}MB，"
+          f"父进程内存 {loaded.get('rss', 0):.0f}MB（加载前 {baseline.get('rss', 0):.0f}MB）")
+
+    if torch.cuda.is_initialized():
+        raise RuntimeError("父进程已初始化 CUDA，fork 出的 worker 无法使用 CUDA，只能以 CPU 模式运行")
+
+    # 把现有对象移出垃圾回收的追踪范围，避免子进程中 GC 改写对象头触发写时复制
+    gc.freeze()
+    context = multiprocessing.get_context("fork")
+    reports = context.Queue()
+    processes = []
+    for index in range(args.workers):
+        forked_at = time.perf_counter()
+        process = context.Process(target=worker_main, args=(index, converter, forked_at, args, reports))
+        process.start()
+        processes.append(process)
+
+    results = []
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        print("\n收到中断信号，等待 worker 退出（执行中的任务将在租约过期后重新排队）")
+        for process in processes:
+            process.join()
+    for _ in processes:
+        try:
+            results.append(reports.get(timeout=1))
+        except Empty:
+            break  # 异常退出的 worker 没有报告
+    results.sort(key=lambda r: r["worker"])
+
+    print(f"\n📊 worker 内存与启动耗时（对比: 单独加载模型 {load_seconds * 1000:.0f}ms）:")
+    for report in results:
+        memory = report.get("memory_end") or report.get("memory_start") or {}
+        line = (f"  worker {report['worker']} (pid {report['pid']}): 启动 {report['startup_ms']:.0f}ms, "
+                f"RSS {memory.get('rss', 0):.0f}MB, 共享 {memory.get('shared', 0):.0f}MB, "
+                f"独占 {memory.get('private', 0):.0f}MB, PSS {memory.get('pss', 0):.0f}MB")
+        if "stats" in report:
+            line += f", 完成 {report['stats']['completed']} 失败 {report['stats']['failed']}"
+        print(line)
+    if results:
+        private = sum((r.get("memory_end") or {}).get("private", 0) for r in results) / len(results)
+        print(f"  平均每个 worker 额外占用 {private:.0f}MB（各自加载模型时约为 {loaded.get('rss', 0):.0f}MB）")
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump({"model": args.model, "load_seconds": load_seconds, "shared_mb": shared_mb,
+                       "parent_memory": loaded, "workers": results}, f, ensure_ascii=False, indent=2)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="预加载模型后 fork 多个转写 worker（共享模型权重）")
+    parser.add_argument("-n", "--workers", type=int, default=2, help="worker 数（默认: 2）")
+    parser.add_argument("-m", "--model", choices=MODEL_SIZES, default="base",
+                       help="预加载的 Whisper 模型（默认: base）")
+    parser.add_argument("--threads", type=int, default=max(1, (os.cpu_count() or 1) // 2),
+                       help="每个 worker 的 PyTorch 线程数（默认: CPU 核数的一半）")
+    parser.add_argument("--db", default="jobs.db", help="任务队列数据库路径（默认: jobs.db）")
+    parser.add_argument("--journal", choices=["wal", "delete"], default="wal",
+                       help="SQLite 日志模式（默认: wal）")
+    parser.add_argument("--lease", type=float, default=120.0, help="租约时长（秒），默认: 120")
+    parser.add_argument("--poll", type=float, default=2.0, help="空闲时的轮询间隔（秒），默认: 2")
+    parser.add_argument("--exit-when-empty", action="store_true", help="队列为空时退出")
+    parser.add_argument("--dry-run", action="store_true",
+                       help="不领取任务，只报告每个 worker 的内存和启动耗时")
+    parser.add_argument("--report", help="把内存和启动耗时报告写入JSON文件")
+
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        print("当前平台不支持 fork")
+        sys.exit(1)
+    try:
+        launch(args)
+    except RuntimeError as e:
+        print(f"启动失败: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
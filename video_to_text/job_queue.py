@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多机任务队列
+基于共享 SQLite 数据库的租约式任务队列，不需要额外的消息中间件。
+各台机器上的 worker 领取转写/裁剪任务并持有租约，执行期间定时续约；
+租约过期（worker 崩溃或断网）的任务会重新回到队列，由其他 worker 接手。
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import argparse
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from service import JOB_TYPES, MODEL_SIZES, TranscriptionService
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    params TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    worker TEXT,
+    lease_expires REAL,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_pending ON jobs(status, priority, created);
+CREATE INDEX IF NOT EXISTS jobs_lease ON jobs(status, lease_expires);
+"""
+
+JOB_COLUMNS = ("id", "type", "params", "priority", "status", "attempts", "max_attempts",
+               "worker", "lease_expires", "created", "started", "finished", "result", "error")
+
+
+class JobQueue:
+    """共享 SQLite 任务队列"""
+
+    def __init__(self, db_path: str, journal_mode: Optional[str] = "wal", busy_timeout: float = 30.0):
+        """
+        打开（必要时创建）队列数据库
+
+        Args:
+            db_path: 数据库文件路径，所有 worker 使用同一个文件
+            journal_mode: SQLite 日志模式；wal 只适用于同一台机器或支持共享内存的文件系统，
+                          通过网络文件系统共享时使用 delete。日志模式保存在数据库文件中，
+                          None 表示沿用数据库现有的设置（用于辅助连接）
+            busy_timeout: 等待其他进程释放写锁的最长时间（秒）
+        """
+        self.db_path = db_path
+        self.journal_mode = journal_mode
+        self.busy_timeout = busy_timeout
+        self._conn = sqlite3.connect(db_path, timeout=busy_timeout, isolation_level=None)
+        if journal_mode is not None:
+            self._conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        self._conn.executescript(SCHEMA)
+
+    def secondary(self) -> "JobQueue":
+        """打开同一数据库的另一个连接（供其他线程使用），不修改日志模式"""
+        return JobQueue(self.db_path, journal_mode=None, busy_timeout=self.busy_timeout)
+
+    def _row(self, row) -> Dict[str, Any]:
+        job = dict(zip(JOB_COLUMNS, row))
+        job["params"] = json.loads(job["params"])
+        if job["result"] is not None:
+            job["result"] = json.loads(job["result"])
+        return job
+
+    def submit(self, job_type: str, params: Dict[str, Any], priority: int = 0,
+               max_attempts: int = 3) -> str:
+        """
+        提交任务
+
+        Args:
+            job_type: 任务类型
+            params: 任务参数（与本地服务的任务参数相同）
+            priority: 优先级，数值越小越优先
+            max_attempts: 最多执行次数（租约过期或执行失败都计为一次）
+
+        Returns:
+            str: 任务 id
+        """
+        job_id = uuid.uuid4().hex
+        self._conn.execute(
+            "INSERT INTO jobs (id, type, params, priority, max_attempts, created) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, job_type, json.dumps(params, ensure_ascii=False), priority, max_attempts, time.time()))
+        return job_id
+
+    def claim(self, worker: str, lease: float, job_types: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """
+        领取一个任务并持有租约
+
+        排队中的任务和租约已过期的运行中任务都可以被领取，按优先级和提交时间排序
+
+        Args:
+            worker: worker 标识
+            lease: 租约时长（秒）
+            job_types: 只领取这些类型的任务，None 表示全部
+
+        Returns:
+            Dict: 任务信息，没有可领取的任务时返回 None
+        """
+        now = time.time()
+        type_filter = ""
+        params: List[Any] = [now]
+        if job_types:
+            type_filter = f" AND type IN ({','.join('?' * len(job_types))})"
+            params += list(job_types)
+
+        # BEGIN IMMEDIATE 立即获取写锁，多个 worker 同时领取时不会拿到同一个任务
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._expire(now)
+            row = self._conn.execute(
+                f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs "
+                f"WHERE (status = 'queued' OR (status = 'running' AND lease_expires < ?)){type_filter} "
+                f"ORDER BY priority, created LIMIT 1", params).fetchone()
+            if row is None:
+                self._conn.execute("COMMIT")
+                return None
+            job = self._row(row)
+            self._conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, lease_expires = ?, "
+                "attempts = attempts + 1, started = ? WHERE id = ?",
+                (worker, now + lease, now, job["id"]))
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        job.update(status="running", worker=worker, lease_expires=now + lease,
+                   attempts=job["attempts"] + 1, started=now)
+        return job
+
+    def _expire(self, now: float):
+        """租约过期且已用完执行次数的任务标记为失败"""
+        self._conn.execute(
+            "UPDATE jobs SET status = 'failed', finished = ?, error = '租约过期次数超过上限' "
+            "WHERE status = 'running' AND lease_expires < ? AND attempts >= max_attempts",
+            (now, now))
+
+    def heartbeat(self, job_id: str, worker: str, lease: float) -> bool:
+        """
+        续约
+
+        Returns:
+            bool: 是否仍持有租约（租约已过期并被其他 worker 领取时返回 False）
+        """
+        cursor = self._conn.execute(
+            "UPDATE jobs SET lease_expires = ? WHERE id = ? AND worker = ? AND status = 'running'",
+            (time.time() + lease, job_id, worker))
+        return cursor.rowcount == 1
+
+    def complete(self, job_id: str, worker: str, result: Dict[str, Any]) -> bool:
+        """
+        标记任务完成；只有当前持有租约的 worker 才能提交结果
+
+        Returns:
+            bool: 是否提交成功
+        """
+        cursor = self._conn.execute(
+            "UPDATE jobs SET status = 'completed', finished = ?, result = ?, lease_expires = NULL "
+            "WHERE id = ? AND worker = ? AND status = 'running'",
+            (time.time(), json.dumps(result, ensure_ascii=False), job_id, worker))
+        return cursor.rowcount == 1
+
+    def fail(self, job_id: str, worker: str, error: str) -> bool:
+        """
+        标记任务执行失败：未用完执行次数时重新排队，否则标记为失败
+
+        Returns:
+            bool: 是否提交成功
+        """
+        cursor = self._conn.execute(
+            "UPDATE jobs SET status = CASE WHEN attempts < max_attempts THEN 'queued' ELSE 'failed' END, "
+            "finished = ?, error = ?, worker = NULL, lease_expires = NULL "
+            "WHERE id = ? AND worker = ? AND status = 'running'",
+            (time.time(), error, job_id, worker))
+        return cursor.rowcount == 1
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """查询单个任务"""
+        row = self._conn.execute(
+            f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row(row) if row else None
+
+    def counts(self) -> Dict[str, int]:
+        """各状态的任务数（租约已过期的运行中任务单独计为 expired）"""
+        counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        expired = self._conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = 'running' AND lease_expires < ?",
+            (time.time(),)).fetchone()[0]
+        if expired:
+            counts["expired"] = expired
+        return counts
+
+    def close(self):
+        self._conn.close()
+
+
+class QueueWorker:
+    """从队列领取并执行任务的 worker"""
+
+    def __init__(self, queue: JobQueue, handlers: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]],
+                 worker_id: Optional[str] = None, lease: float = 120.0,
+                 heartbeat_interval: Optional[float] = None, poll_interval: float = 2.0,
+                 verbose: bool = True):
+        """
+        初始化 worker
+
+        Args:
+            queue: 任务队列
+            handlers: 任务类型到执行函数的映射，执行函数接收任务参数、返回含 success 的结果
+            worker_id: worker 标识，默认为 主机名:进程号
+            lease: 租约时长（秒）
+            heartbeat_interval: 续约间隔（秒），默认为租约的三分之一
+            poll_interval: 队列为空时的轮询间隔（秒）
+            verbose: 是否打印每个任务的日志
+        """
+        self.queue = queue
+        self.handlers = handlers
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.lease = lease
+        self.heartbeat_interval = heartbeat_interval or lease / 3
+        self.poll_interval = poll_interval
+        self.verbose = verbose
+        self.stats = {"completed": 0, "failed": 0, "lost": 0}
+
+    def _heartbeat(self, job_id: str, done: threading.Event, lost: threading.Event):
+        # 续约使用独立连接，SQLite 连接不能跨线程共享
+        queue = self.queue.secondary()
+        try:
+            while not done.wait(self.heartbeat_interval):
+                if not queue.heartbeat(job_id, self.worker_id, self.lease):
+                    lost.set()
+                    return
+        finally:
+            queue.close()
+
+    def _log(self, message: str):
+        if self.verbose:
+            print(f"[{self.worker_id}] {message}")
+
+    def run_one(self) -> bool:
+        """
+        领取并执行一个任务
+
+        Returns:
+            bool: 是否领取到任务
+        """
+        job = self.queue.claim(self.worker_id, self.lease, list(self.handlers))
+        if job is None:
+            return False
+
+        self._log(f"开始任务 {job['id']}（{job['type']}，第 {job['attempts']} 次）")
+        done, lost = threading.Event(), threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job["id"], done, lost), daemon=True)
+        heartbeat.start()
+        try:
+            result = self.handlers[job["type"]](job["params"])
+            error = None if result.get("success") else "任务执行失败"
+        except Exception as e:
+            result, error = None, str(e)
+        finally:
+            done.set()
+            heartbeat.join()
+
+        if lost.is_set():
+            self.stats["lost"] += 1
+            self._log(f"任务 {job['id']} 的租约已失效，结果被丢弃")
+        elif error is None and self.queue.complete(job["id"], self.worker_id, result):
+            self.stats["completed"] += 1
+            self._log(f"完成任务 {job['id']}")
+        else:
+            self.queue.fail(job["id"], self.worker_id, error or "提交结果失败")
+            self.stats["failed"] += 1
+            self._log(f"任务 {job['id']} 失败: {error}")
+        return True
+
+    def run(self, max_jobs: Optional[int] = None, exit_when_empty: bool = False):
+        """
+        循环执行任务
+
+        Args:
+            max_jobs: 最多执行的任务数，None 表示不限
+            exit_when_empty: 队列中没有可领取的任务时退出
+        """
+        executed = 0
+        while max_jobs is None or executed < max_jobs:
+            if self.run_one():
+                executed += 1
+            elif exit_when_empty:
+                break
+            else:
+                time.sleep(self.poll_interval)
+
+
+def default_handlers(default_model: str = "base",
+                     converter_factory: Optional[Callable[[str], Any]] = None
+                     ) -> Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]]:
+    """
+    转写和裁剪任务的执行函数，与本地服务共用同一套执行逻辑和模型池
+
+    Args:
+        default_model: 任务未指定模型时使用的模型
+        converter_factory: 创建 VideoToTextConverter 的函数，默认按需加载模型
+    """
+    service = TranscriptionService(default_model=default_model, converter_factory=converter_factory)
+    return {"transcribe": service.run_transcribe, "clip": service.run_clip}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="基于共享 SQLite 的多机任务队列")
+    parser.add_argument("--db", default="jobs.db", help="队列数据库路径（默认: jobs.db）")
+    parser.add_argument("--journal", choices=["wal", "delete"], default="wal",
+                       help="SQLite 日志模式，通过网络文件系统共享时使用 delete（默认: wal）")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    transcribe_parser = subparsers.add_parser("transcribe", help="提交转写任务")
+    transcribe_parser.add_argument("video_paths", nargs="+", help="视频文件路径")
+    transcribe_parser.add_argument("-m", "--model", choices=MODEL_SIZES, default="base",
+                                   help="Whisper模型大小（默认: base）")
+    transcribe_parser.add_argument("-o", "--output", help="输出目录（默认为视频文件所在目录）")
+    transcribe_parser.add_argument("-f", "--formats", nargs="+", default=["json", "txt"],
+                                   help="输出格式（默认: json txt）")
+
+    clip_parser = subparsers.add_parser("clip", help="提交裁剪任务")
+    clip_parser.add_argument("result_file", help="观点筛选结果JSON文件路径")
+    clip_parser.add_argument("-v", "--video", required=True, help="源视频文件路径")
+    clip_parser.add_argument("-o", "--output", default="output", help="输出目录（默认: output）")
+
+    for sub in (transcribe_parser, clip_parser):
+        sub.add_argument("--priority", type=int, default=0, help="优先级，数值越小越优先（默认: 0）")
+        sub.add_argument("--max-attempts", type=int, default=3, help="最多执行次数（默认: 3）")
+
+    worker_parser = subparsers.add_parser("worker", help="启动 worker")
+    worker_parser.add_argument("--id", help="worker 标识（默认: 主机名:进程号）")
+    worker_parser.add_argument("--types", nargs="+", choices=JOB_TYPES, default=list(JOB_TYPES),
+                               help="只领取这些类型的任务（默认: 全部）")
+    worker_parser.add_argument("--lease", type=float, default=120.0, help="租约时长（秒），默认: 120")
+    worker_parser.add_argument("--poll", type=float, default=2.0, help="空闲时的轮询间隔（秒），默认: 2")
+    worker_parser.add_argument("--max-jobs", type=int, default=None, help="最多执行的任务数（默认不限）")
+    worker_parser.add_argument("--exit-when-empty", action="store_true", help="队列为空时退出")
+    worker_parser.add_argument("--default-model", choices=MODEL_SIZES, default="base",
+                               help="任务未指定模型时使用的模型（默认: base）")
+
+    status_parser = subparsers.add_parser("status", help="查看队列或任务状态")
+    status_parser.add_argument("job_id", nargs="?", help="任务 id（不指定时显示各状态的任务数）")
+
+    args = parser.parse_args()
+    queue = JobQueue(args.db, journal_mode=args.journal)
+
+    try:
+        if args.command == "transcribe":
+            for video_path in args.video_paths:
+                params = {"video_path": os.path.abspath(video_path), "model_size": args.model,
+                          "output_formats": args.formats}
+                if args.output:
+                    params["output_dir"] = os.path.abspath(args.output)
+                print(queue.submit("transcribe", params, args.priority, args.max_attempts))
+        elif args.command == "clip":
+            params = {"result_file": os.path.abspath(args.result_file),
+                      "video": os.path.abspath(args.video),
+                      "output_dir": os.path.abspath(args.output)}
+            print(queue.submit("clip", params, args.priority, args.max_attempts))
+        elif args.command == "worker":
+            handlers = default_handlers(args.default_model)
+            worker = QueueWorker(queue, {t: handlers[t] for t in args.types}, worker_id=args.id,
+                                 lease=args.lease, poll_interval=args.poll)
+            print(f"worker {worker.worker_id} 已启动，租约 {args.lease:.0f}s")
+            try:
+                worker.run(max_jobs=args.max_jobs, exit_when_empty=args.exit_when_empty)
+            except KeyboardInterrupt:
+                print("\n收到中断信号，退出（执行中的任务将在租约过期后重新排队）")
+            print(f"完成 {worker.stats['completed']}，失败 {worker.stats['failed']}，"
+                  f"租约失效 {worker.stats['lost']}")
+        elif args.job_id:
+            job = queue.get(args.job_id)
+            if job is None:
+                print(f"任务不存在: {args.job_id}")
+                sys.exit(1)
+            print(json.dumps(job, ensure_ascii=False, indent=2))
+        else:
+            print(json.dumps(queue.counts(), ensure_ascii=False, indent=2))
+    finally:
+        queue.close()
+
+
+if __name__ == "__main__":
+    main()
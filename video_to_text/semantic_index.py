@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+段落语义检索
+离线把所有转录段落编码为向量（默认使用确定性的字符 n-gram 哈希编码，也可使用本地的
+sentence-transformers 模型），以 float16 内存映射矩阵保存；检索时分块批量计算内积取 top-k，
+可选 IVF 分区（先找最近的若干个聚类中心，只计算这些分区内的段落）。
+检索结果包含视频名、段落 id 和起止时间，可直接交给 VideoClipper.clip_video 裁剪。
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from transcript_binary import load_sentences
+
+DEFAULT_DIM = 256
+NGRAM_RANGE = (1, 3)
+
+# 平铺检索时每次从内存映射矩阵读入的行数
+SCAN_CHUNK_ROWS = 65536
+
+# 构建时每批编码的段落数
+EMBED_BATCH = 4096
+
+_NON_WORD = re.compile(r"[\W_]+", re.UNICODE)
+_MIX1 = np.uint64(0xbf58476d1ce4e5b9)
+_MIX2 = np.uint64(0x94d049bb133111eb)
+
+
+class HashedNgramEmbedder:
+    """字符 n-gram 哈希编码器：确定性、无需模型，向量经 L2 归一化"""
+
+    name = "hash"
+
+    def __init__(self, dim: int = DEFAULT_DIM, ngram_range: Tuple[int, int] = NGRAM_RANGE):
+        """
+        Args:
+            dim: 向量维度
+            ngram_range: 使用的 n-gram 长度范围（含两端）
+        """
+        self.dim = dim
+        self.ngram_range = tuple(ngram_range)
+
+    def config(self) -> Dict[str, Any]:
+        return {"name": self.name, "dim": self.dim, "ngram_range": list(self.ngram_range)}
+
+    def _embed_one(self, text: str) -> np.ndarray:
+        codes = np.frombuffer(_NON_WORD.sub("", text).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        vector = np.zeros(self.dim, dtype=np.float64)
+        for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+            if len(codes) < n:
+                break
+            # 多项式哈希后再做一次 splitmix 混合，低位用作桶号、最高位用作符号
+            powers = np.uint64(1000003) ** np.arange(n - 1, -1, -1, dtype=np.uint64)
+            hashes = (sliding_window_view(codes, n) * powers).sum(axis=1) + np.uint64(n)
+            hashes = (hashes ^ (hashes >> np.uint64(30))) * _MIX1
+            hashes = (hashes ^ (hashes >> np.uint64(27))) * _MIX2
+            hashes ^= hashes >> np.uint64(31)
+            signs = 1.0 - 2.0 * (hashes >> np.uint64(63)).astype(np.float64)
+            vector += np.bincount((hashes % np.uint64(self.dim)).astype(np.int64),
+                                  weights=signs, minlength=self.dim)
+        return vector
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        编码一批文本
+
+        Returns:
+            np.ndarray: float32 矩阵 (len(texts), dim)，每行 L2 归一化
+        """
+        vectors = np.array([self._embed_one(text) for text in texts], dtype=np.float64).reshape(-1, self.dim)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return (vectors / np.maximum(norms, 1e-12)).astype(np.float32)
+
+
+class SentenceTransformerEmbedder:
+    """本地 sentence-transformers 模型编码器（需要额外安装 sentence-transformers）"""
+
+    name = "st"
+
+    def __init__(self, model_name: str):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise ImportError("使用本地模型编码需要安装 sentence-transformers: pip install sentence-transformers")
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name)
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def config(self) -> Dict[str, Any]:
+        return {"name": self.name, "model": self.model_name, "dim": self.dim}
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self.model.encode(texts, batch_size=64, normalize_embeddings=True),
+                          dtype=np.float32).reshape(-1, self.dim)
+
+
+def create_embedder(config: Dict[str, Any]):
+    """根据配置创建编码器（与索引中保存的配置一致）"""
+    if config.get("name") == "st":
+        return SentenceTransformerEmbedder(config["model"])
+    return HashedNgramEmbedder(config.get("dim", DEFAULT_DIM), tuple(config.get("ngram_range", NGRAM_RANGE)))
+
+
+def kmeans(vectors: np.ndarray, num_lists: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """
+    球面 k-means（按内积分配），用于 IVF 分区
+
+    Returns:
+        np.ndarray: float32 聚类中心 (num_lists, dim)，L2 归一化
+    """
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), num_lists, replace=False)].astype(np.float32)
+    for _ in range(iterations):
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        empty = np.bincount(assign, minlength=num_lists) == 0
+        # 空分区重新取一个随机样本作为中心
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+        centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+    return centroids.astype(np.float32)
+
+
+def assign_lists(vectors: np.ndarray, centroids: np.ndarray, chunk_rows: int = SCAN_CHUNK_ROWS) -> np.ndarray:
+    """把每个向量分配到最近的聚类中心"""
+    assign = np.empty(len(vectors), dtype=np.int32)
+    for begin in range(0, len(vectors), chunk_rows):
+        chunk = np.asarray(vectors[begin:begin + chunk_rows], dtype=np.float32)
+        assign[begin:begin + chunk_rows] = np.argmax(chunk @ centroids.T, axis=1)
+    return assign
+
+
+def find_transcripts(path: str) -> List[Path]:
+    """
+    目录下递归查找转录文件（*_transcript.json 和 *_transcript.bin）
+
+    同一视频同时有 JSON 和二进制转录时只取修改时间较新的一个（相同时取读取更快的二进制），避免重复编码
+    """
+    if not os.path.isdir(path):
+        return [Path(path)]
+    latest: Dict[Path, Path] = {}
+    for file in list(Path(path).rglob("*_transcript.json")) + list(Path(path).rglob("*_transcript.bin")):
+        key = file.with_suffix("")
+        if key not in latest or file.stat().st_mtime_ns >= latest[key].stat().st_mtime_ns:
+            latest[key] = file
+    return sorted(latest.values())
+
+
+def _merge_topk(scores: np.ndarray, rows: np.ndarray, best_scores: np.ndarray, best_rows: np.ndarray,
+                k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """把一块候选（每列一个查询）与已有的 top-k 合并"""
+    scores = np.concatenate([best_scores, scores], axis=0)
+    rows = np.concatenate([best_rows, rows], axis=0)
+    if len(scores) > k:
+        top = np.argpartition(-scores, k - 1, axis=0)[:k]
+        scores = np.take_along_axis(scores, top, axis=0)
+        rows = np.take_along_axis(rows, top, axis=0)
+    return scores, rows
+
+
+class SemanticIndex:
+    """段落向量索引（目录存储：float16 内存映射矩阵 + 元数据列）"""
+
+    def __init__(self, index_dir: str, embedder=None):
+        """
+        打开已构建的索引
+
+        Args:
+            index_dir: 索引目录
+            embedder: 查询编码器，默认按索引中保存的配置创建
+        """
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, "meta.json"), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        count, dim = self.meta["count"], self.meta["dim"]
+        self.vectors = np.memmap(os.path.join(index_dir, "vectors.f16"), dtype=np.float16,
+                                 mode='r', shape=(count, dim))
+        self.video_ids = np.load(os.path.join(index_dir, "video_ids.npy"), mmap_mode='r')
+        self.ids = np.load(os.path.join(index_dir, "ids.npy"), mmap_mode='r')
+        self.times_ms = np.load(os.path.join(index_dir, "times_ms.npy"), mmap_mode='r')
+        self.text_offsets = np.load(os.path.join(index_dir, "text_offsets.npy"), mmap_mode='r')
+        self._texts = np.memmap(os.path.join(index_dir, "texts.bin"), dtype=np.uint8, mode='r') \
+            if self.text_offsets[-1] else None
+        self.videos = self.meta["videos"]
+        self.centroids = None
+        if self.meta.get("ivf_lists"):
+            self.centroids = np.load(os.path.join(index_dir, "centroids.npy"))
+            self.list_offsets = np.load(os.path.join(index_dir, "list_offsets.npy"))
+        self.embedder = embedder or create_embedder(self.meta["embedder"])
+
+    def __len__(self) -> int:
+        return self.meta["count"]
+
+    @staticmethod
+    def write(index_dir: str, vectors: np.ndarray, video_ids: np.ndarray, ids: np.ndarray,
+              times_ms: np.ndarray, texts: List[str], videos: List[Dict[str, str]],
+              embedder_config: Dict[str, Any], ivf_lists: int = 0, seed: int = 0) -> Dict[str, Any]:
+        """
+        写出索引文件；启用 IVF 时先聚类，再按分区重新排列所有行，使每个分区在矩阵中连续
+
+        Args:
+            vectors: 已归一化的向量 (n, dim)，可以是内存映射数组
+            video_ids / ids / times_ms: 每行的视频序号、段落 id、[开始, 结束] 毫秒
+            texts: 每行的文本（可为空列表，表示不保存文本）
+            videos: 视频列表 [{"video", "transcript"}]
+            embedder_config: 编码器配置
+            ivf_lists: IVF 分区数，0 表示不分区
+
+        Returns:
+            Dict: 索引元数据
+        """
+        os.makedirs(index_dir, exist_ok=True)
+        count, dim = vectors.shape
+        order = np.arange(count)
+        meta: Dict[str, Any] = {"count": count, "dim": dim, "videos": videos,
+                                "embedder": embedder_config, "ivf_lists": 0, "built_at": time.time()}
+        if ivf_lists and count >= ivf_lists:
+            rng = np.random.default_rng(seed)
+            sample = np.asarray(vectors[np.sort(rng.choice(count, min(count, ivf_lists * 64), replace=False))],
+                                dtype=np.float32)
+            centroids = kmeans(sample, ivf_lists, seed=seed)
+            assign = assign_lists(vectors, centroids)
+            order = np.argsort(assign, kind="stable")
+            list_offsets = np.zeros(ivf_lists + 1, dtype=np.int64)
+            np.cumsum(np.bincount(assign, minlength=ivf_lists), out=list_offsets[1:])
+            np.save(os.path.join(index_dir, "centroids.npy"), centroids)
+            np.save(os.path.join(index_dir, "list_offsets.npy"), list_offsets)
+            meta["ivf_lists"] = ivf_lists
+
+        matrix = np.memmap(os.path.join(index_dir, "vectors.f16"), dtype=np.float16,
+                           mode='w+', shape=(count, dim))
+        for begin in range(0, count, SCAN_CHUNK_ROWS):
+            matrix[begin:begin + SCAN_CHUNK_ROWS] = vectors[order[begin:begin + SCAN_CHUNK_ROWS]]
+        matrix.flush()
+        del matrix
+
+        np.save(os.path.join(index_dir, "video_ids.npy"), np.asarray(video_ids, dtype=np.int32)[order])
+        np.save(os.path.join(index_dir, "ids.npy"), np.asarray(ids, dtype=np.int32)[order])
+        np.save(os.path.join(index_dir, "times_ms.npy"), np.asarray(times_ms, dtype=np.int64).reshape(-1, 2)[order])
+        encoded = [texts[i].encode("utf-8") for i in order] if texts else []
+        offsets = np.zeros(count + 1, dtype=np.int64)
+        if encoded:
+            np.cumsum([len(item) for item in encoded], out=offsets[1:])
+        np.save(os.path.join(index_dir, "text_offsets.npy"), offsets)
+        with open(os.path.join(index_dir, "texts.bin"), 'wb') as f:
+            f.write(b"".join(encoded))
+        with open(os.path.join(index_dir, "meta.json"), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        return meta
+
+    @classmethod
+    def build(cls, paths: Iterable[str], index_dir: str, embedder=None, ivf_lists: int = 0,
+              batch_size: int = EMBED_BATCH) -> Dict[str, Any]:
+        """
+        读取转录文件（JSON 或二进制，目录下递归查找，见 find_transcripts），编码全部段落并写出索引
+
+        向量按批编码后直接写入索引目录中的 float32 临时内存映射文件，内存中只保留一批
+
+        Returns:
+            Dict: {"videos", "paragraphs", "seconds", "ivf_lists"}
+        """
+        embedder = embedder or HashedNgramEmbedder()
+        start = time.perf_counter()
+        videos, video_ids, ids, times_ms, texts = [], [], [], [], []
+        for path in paths:
+            for file in find_transcripts(path):
+                name = file.stem[:-len("_transcript")] if file.stem.endswith("_transcript") else file.stem
+                sentences = [s for s in load_sentences(str(file)) if s.get("text", "").strip()]
+                if not sentences:
+                    continue
+                video_index = len(videos)
+                videos.append({"video": name, "transcript": str(file.resolve())})
+                for position, sentence in enumerate(sentences):
+                    video_ids.append(video_index)
+                    ids.append(sentence.get("id", position))
+                    times_ms.append((round(sentence["start_time"] * 1000), round(sentence["end_time"] * 1000)))
+                    texts.append(sentence["text"].strip())
+
+        os.makedirs(index_dir, exist_ok=True)
+        scratch_path = os.path.join(index_dir, "vectors.f32.tmp")
+        vectors = np.memmap(scratch_path, dtype=np.float32, mode='w+', shape=(len(texts), embedder.dim))
+        try:
+            for begin in range(0, len(texts), batch_size):
+                vectors[begin:begin + batch_size] = embedder.embed(texts[begin:begin + batch_size])
+            cls.write(index_dir, vectors, np.array(video_ids), np.array(ids),
+                      np.array(times_ms, dtype=np.int64).reshape(-1, 2), texts, videos,
+                      embedder.config(), ivf_lists)
+        finally:
+            del vectors
+            os.remove(scratch_path)
+        return {"videos": len(videos), "paragraphs": len(texts),
+                "seconds": time.perf_counter() - start, "ivf_lists": ivf_lists if len(texts) >= ivf_lists else 0}
+
+    def text(self, row: int) -> str:
+        if self._texts is None:
+            return ""
+        return bytes(self._texts[int(self.text_offsets[row]):int(self.text_offsets[row + 1])]).decode("utf-8")
+
+    def _flat_topk(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """分块扫描整个矩阵，批量计算所有查询的 top-k"""
+        num = len(queries)
+        best_scores = np.empty((0, num), dtype=np.float32)
+        best_rows = np.empty((0, num), dtype=np.int64)
+        for begin in range(0, len(self), SCAN_CHUNK_ROWS):
+            chunk = np.asarray(self.vectors[begin:begin + SCAN_CHUNK_ROWS], dtype=np.float32)
+            scores = chunk @ queries.T
+            rows = np.broadcast_to(np.arange(begin, begin + len(chunk))[:, None], scores.shape)
+            if len(scores) > k:
+                top = np.argpartition(-scores, k - 1, axis=0)[:k]
+                scores = np.take_along_axis(scores, top, axis=0)
+                rows = np.take_along_axis(rows, top, axis=0)
+            best_scores, best_rows = _merge_topk(scores, rows, best_scores, best_rows, k)
+        return best_scores, best_rows
+
+    def _ivf_topk(self, queries: np.ndarray, k: int, nprobe: int) -> Tuple[np.ndarray, np.ndarray]:
+        """只扫描每个查询最近的 nprobe 个分区（分区在矩阵中连续）"""
+        nprobe = min(nprobe, len(self.centroids))
+        probes = np.argpartition(-(queries @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+        best_scores = np.full((k, len(queries)), -np.inf, dtype=np.float32)
+        best_rows = np.full((k, len(queries)), -1, dtype=np.int64)
+        for q, lists in enumerate(probes):
+            spans = [(self.list_offsets[l], self.list_offsets[l + 1]) for l in lists]
+            rows = np.concatenate([np.arange(a, b) for a, b in spans])
+            if not len(rows):
+                continue
+            chunk = np.concatenate([np.asarray(self.vectors[a:b], dtype=np.float32) for a, b in spans])
+            scores = chunk @ queries[q]
+            top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k]
+            best_scores[:len(top), q] = scores[top]
+            best_rows[:len(top), q] = rows[top]
+        return best_scores, best_rows
+
+    def search_vectors(self, queries: np.ndarray, k: int = 10, nprobe: Optional[int] = None) -> List[List[Dict[str, Any]]]:
+        """
+        用已编码的查询向量检索
+
+        Args:
+            queries: float32 查询矩阵 (b, dim)，已归一化
+            k: 每个查询返回的结果数
+            nprobe: IVF 检索的分区数，None 表示默认值（分区数的 1/16，至少 1）；0 表示不用 IVF
+
+        Returns:
+            List[List[Dict]]: 每个查询按相似度降序排列的结果
+                              {"video", "id", "start_time", "end_time", "score", "text", "transcript"}
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.meta["dim"])
+        if not len(self) or not len(queries):
+            return [[] for _ in range(len(queries))]
+        if nprobe is None:
+            nprobe = max(1, self.meta.get("ivf_lists", 0) // 16)
+        if self.centroids is not None and nprobe:
+            scores, rows = self._ivf_topk(queries, k, nprobe)
+        else:
+            scores, rows = self._flat_topk(queries, k)
+
+        results = []
+        for q in range(len(queries)):
+            order = np.argsort(-scores[:, q])
+            hits = []
+            for position in order:
+                row = int(rows[position, q])
+                if row < 0:
+                    continue
+                video = self.videos[int(self.video_ids[row])]
+                start_ms, end_ms = self.times_ms[row]
+                hits.append({
+                    "video": video["video"],
+                    "id": int(self.ids[row]),
+                    "start_time": int(start_ms) / 1000,
+                    "end_time": int(end_ms) / 1000,
+                    "score": float(scores[position, q]),
+                    "text": self.text(row),
+                    "transcript": video["transcript"],
+                })
+            results.append(hits)
+        return results
+
+    def search(self, texts: List[str], k: int = 10, nprobe: Optional[int] = None) -> List[List[Dict[str, Any]]]:
+        """用文本批量检索相似段落（参数同 search_vectors）"""
+        return self.search_vectors(self.embedder.embed(texts), k, nprobe)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="段落语义检索：查找与给定观点相似的段落")
+    parser.add_argument("--index", default="semantic_index", help="索引目录（默认: semantic_index）")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="编码转录段落并构建索引（整体重建）")
+    build_parser.add_argument("paths", nargs="+", help="转录文件（JSON/二进制）或目录")
+    build_parser.add_argument("--dim", type=int, default=DEFAULT_DIM, help=f"哈希编码维度（默认: {DEFAULT_DIM}）")
+    build_parser.add_argument("--model", help="使用本地 sentence-transformers 模型编码（默认使用哈希编码）")
+    build_parser.add_argument("--ivf", type=int, default=0, help="IVF 分区数，0 表示不分区（默认: 0）")
+
+    search_parser = subparsers.add_parser("search", help="检索相似段落")
+    search_parser.add_argument("queries", nargs="+", help="查询文本（可多个，批量检索）")
+    search_parser.add_argument("-k", type=int, default=10, help="每个查询返回的结果数（默认: 10）")
+    search_parser.add_argument("--nprobe", type=int, default=None,
+                               help="IVF 检索的分区数，0 表示全量扫描（默认: 分区数的 1/16）")
+    search_parser.add_argument("--json", action="store_true", help="以JSON格式输出")
+
+    args = parser.parse_args()
+
+    try:
+        if args.command == "build":
+            embedder = SentenceTransformerEmbedder(args.model) if args.model else HashedNgramEmbedder(args.dim)
+            stats = SemanticIndex.build(args.paths, args.index, embedder, args.ivf)
+            print(f"已编码 {stats['videos']} 个视频的 {stats['paragraphs']} 个段落，"
+                  f"用时 {stats['seconds']:.1f}s，IVF 分区 {stats['ivf_lists']}")
+            return
+
+        index = SemanticIndex(args.index)
+        start = time.perf_counter()
+        results = index.search(args.queries, args.k, args.nprobe)
+        elapsed = time.perf_counter() - start
+        if args.json:
+            print(json.dumps(results, ensure_ascii=False, indent=2))
+            return
+        for query, hits in zip(args.queries, results):
+            print(f"\n查询: {query}")
+            for hit in hits:
+                print(f"  [{hit['video']} #{hit['id']} {hit['start_time']:.2f}s-{hit['end_time']:.2f}s "
+                      f"相似度 {hit['score']:.3f}] {hit['text'][:60]}")
+        print(f"\n共 {len(index)} 个段落，检索用时 {elapsed * 1000:.1f}ms")
+    except (OSError, ValueError, ImportError) as e:
+        print(f"处理失败: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,544 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地转写服务
+常驻进程，保持 Whisper 模型常驻内存，通过本地 HTTP 接口接收转写和裁剪任务
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+# 视频裁剪工具位于同级目录
+CLIPPER_DIR = Path(__file__).resolve().parent.parent / "video_clipper"
+
+JOB_TYPES = ("transcribe", "clip")
+MODEL_SIZES = ("tiny", "base", "small", "medium", "large")
+
+HTTP_REASONS = {
+    200: "OK",
+    202: "Accepted",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    409: "Conflict",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+MAX_BODY_SIZE = 1024 * 1024
+
+# 已结束的任务保留的时长（秒）和最大数量，超过后从任务表中移除
+FINISHED_JOB_TTL = 3600.0
+MAX_FINISHED_JOBS = 1000
+
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+
+
+def default_converter_factory(model_size: str):
+    """默认的转换器构造函数（延迟导入，避免未使用时加载 whisper）"""
+    from video_to_text import VideoToTextConverter
+    return VideoToTextConverter(model_size=model_size)
+
+
+def default_clipper_factory(source_video: str, output_dir: str):
+    """默认的裁剪器构造函数"""
+    if str(CLIPPER_DIR) not in sys.path:
+        sys.path.insert(0, str(CLIPPER_DIR))
+    from video_clipper import VideoClipper
+    return VideoClipper(source_video, output_dir)
+
+
+class ModelPool:
+    """按模型大小缓存的转换器池，每个模型同一时刻只服务一个任务"""
+
+    def __init__(self, converter_factory: Callable[[str], Any] = None):
+        """
+        初始化模型池
+
+        Args:
+            converter_factory: 根据模型大小创建 VideoToTextConverter 的函数
+        """
+        self.converter_factory = converter_factory or default_converter_factory
+        self._converters: Dict[str, Any] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._pool_lock = threading.Lock()
+
+    def get(self, model_size: str):
+        """
+        获取（必要时加载）指定大小的转换器
+
+        加载在 _pool_lock 之外进行，只由该模型大小的加载锁串行化：
+        加载一个模型（可能需要下载，耗时数分钟）时，其他大小的模型和服务状态查询不受影响
+
+        Args:
+            model_size: Whisper模型大小
+
+        Returns:
+            tuple: (转换器, 该模型的互斥锁)
+        """
+        converter = self._converters.get(model_size)
+        if converter is not None:
+            return converter, self._locks[model_size]
+        with self._pool_lock:
+            load_lock = self._load_locks.setdefault(model_size, threading.Lock())
+        with load_lock:
+            # 等待加载锁期间其他线程可能已完成加载
+            if model_size not in self._converters:
+                try:
+                    converter = self.converter_factory(model_size)
+                except SystemExit as e:
+                    # 不能让加载失败退出整个服务，只让当前任务失败
+                    raise RuntimeError(f"模型 {model_size} 加载失败（退出码 {e.code}）") from None
+                with self._pool_lock:
+                    self._locks[model_size] = threading.Lock()
+                    self._converters[model_size] = converter
+        return self._converters[model_size], self._locks[model_size]
+
+    def warm_models(self) -> List[str]:
+        """返回已加载的模型列表（不加锁的快照，可在事件循环线程中调用）"""
+        return sorted(list(self._converters))
+
+
+class Job:
+    """服务中的单个任务"""
+
+    def __init__(self, job_type: str, params: Dict[str, Any], priority: int = 0):
+        self.id = uuid.uuid4().hex
+        self.type = job_type
+        self.params = params
+        self.priority = priority
+        self.status = "queued"
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def to_dict(self, include_result: bool = False) -> Dict[str, Any]:
+        """转换为可序列化的字典"""
+        data = {
+            "job_id": self.id,
+            "type": self.type,
+            "priority": self.priority,
+            "status": self.status,
+            "params": self.params,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if include_result:
+            data["result"] = self.result
+        return data
+
+
+class TranscriptionService:
+    """基于 asyncio 的本地 HTTP 任务服务"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765,
+                 max_concurrent: int = 2, queue_size: int = 64,
+                 default_model: str = "base",
+                 converter_factory: Callable[[str], Any] = None,
+                 clipper_factory: Callable[[str, str], Any] = None,
+                 finished_ttl: float = FINISHED_JOB_TTL,
+                 max_finished: int = MAX_FINISHED_JOBS):
+        """
+        初始化服务
+
+        Args:
+            host: 监听地址（默认只监听本机）
+            port: 监听端口，0 表示由系统分配
+            max_concurrent: 同时执行的最大任务数
+            queue_size: 等待队列的最大长度，队列满时拒绝新任务
+            default_model: 任务未指定模型时使用的模型大小
+            converter_factory: 创建 VideoToTextConverter 的函数
+            clipper_factory: 创建 VideoClipper 的函数
+            finished_ttl: 已结束的任务保留的时长（秒），之后查询返回 404
+            max_finished: 最多保留的已结束任务数，超过时先移除最早结束的
+        """
+        self.host = host
+        self.port = port
+        self.max_concurrent = max_concurrent
+        self.queue_size = queue_size
+        self.default_model = default_model
+        self.models = ModelPool(converter_factory)
+        self.clipper_factory = clipper_factory or default_clipper_factory
+        self.finished_ttl = finished_ttl
+        self.max_finished = max_finished
+
+        self.jobs: Dict[str, Job] = {}
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._seq = 0
+        self._queued = 0
+        self._tombstones = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._workers: List[asyncio.Task] = []
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent)
+        self._running = 0
+
+    # ------------------------------------------------------------------
+    # 任务执行
+    # ------------------------------------------------------------------
+
+    def preload(self, model_sizes: List[str]):
+        """预先加载模型，使首个任务无需等待模型加载"""
+        for model_size in model_sizes:
+            self.models.get(model_size)
+
+    def submit(self, job_type: str, params: Dict[str, Any], priority: int = 0) -> Job:
+        """
+        提交任务到优先队列（数值越小优先级越高）
+
+        Args:
+            job_type: 任务类型 ("transcribe", "clip")
+            params: 任务参数
+            priority: 优先级
+
+        Returns:
+            Job: 新建的任务
+
+        Raises:
+            ValueError: 任务类型或参数无效
+            asyncio.QueueFull: 排队中的任务数已达上限
+        """
+        if job_type not in JOB_TYPES:
+            raise ValueError(f"不支持的任务类型: {job_type}")
+        if job_type == "transcribe":
+            if not params.get("video_path"):
+                raise ValueError("转写任务缺少 video_path")
+            model_size = params.get("model_size", self.default_model)
+            if model_size not in MODEL_SIZES:
+                raise ValueError(f"不支持的模型大小: {model_size}")
+        elif not params.get("result_file") or not params.get("video"):
+            raise ValueError("裁剪任务缺少 result_file 或 video")
+
+        self.prune_jobs()
+        # 按排队中的任务计数，已取消但仍留在优先队列中的条目不占用容量
+        if self._queued >= self.queue_size:
+            raise asyncio.QueueFull()
+        job = Job(job_type, params, priority)
+        self._seq += 1
+        self._queue.put_nowait((priority, self._seq, job.id))
+        self._queued += 1
+        self.jobs[job.id] = job
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        """取消仍在排队的任务，并立即释放它占用的队列容量"""
+        job = self.jobs.get(job_id)
+        if job is None or job.status != "queued":
+            return False
+        job.status = "cancelled"
+        job.finished_at = time.time()
+        self._queued -= 1
+        self._tombstones += 1
+        if self._tombstones > self.queue_size:
+            self._compact_queue()
+        return True
+
+    def _compact_queue(self):
+        """从优先队列中移除已取消任务留下的条目"""
+        entries = []
+        while not self._queue.empty():
+            entries.append(self._queue.get_nowait())
+            self._queue.task_done()
+        for entry in entries:
+            job = self.jobs.get(entry[2])
+            if job is not None and job.status == "queued":
+                self._queue.put_nowait(entry)
+        self._tombstones = 0
+
+    def prune_jobs(self, now: Optional[float] = None) -> int:
+        """
+        移除超过保留时长或超出保留数量的已结束任务
+
+        Returns:
+            int: 移除的任务数
+        """
+        now = time.time() if now is None else now
+        finished = [job for job in self.jobs.values() if job.status in FINISHED_STATUSES]
+        finished.sort(key=lambda job: job.finished_at or 0.0)
+        excess = len(finished) - self.max_finished
+        removed = 0
+        for position, job in enumerate(finished):
+            if position < excess or now - (job.finished_at or now) > self.finished_ttl:
+                del self.jobs[job.id]
+                removed += 1
+        return removed
+
+    def run_transcribe(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """在工作线程中执行转写任务"""
+        model_size = params.get("model_size", self.default_model)
+        converter, lock = self.models.get(model_size)
+        video_path = params["video_path"]
+        output_dir = params.get("output_dir") or os.path.dirname(video_path) or "."
+        output_formats = params.get("output_formats") or ["json", "txt"]
+
+        with lock:
+            success = converter.convert_video_to_text(
+                video_path=video_path,
+                output_dir=output_dir,
+                output_formats=output_formats,
+                min_duration=params.get("min_duration", 8.0),
+                max_gap=params.get("max_gap", 2.0),
+                merge_sentences=params.get("merge_sentences", True),
+                checkpoint=params.get("checkpoint", False),
+                chunk_duration=params.get("chunk_duration", 600.0),
+                index_db=params.get("index_db"),
+                cascade_model=params.get("cascade_model"),
+                logprob_threshold=params.get("logprob_threshold", -0.8),
+                fingerprint_db=params.get("fingerprint_db"),
+                profile=params.get("profile", False)
+            )
+
+        video_name = Path(video_path).stem
+        outputs = []
+        for format_type in output_formats:
+            output_path = os.path.join(output_dir, f"{video_name}_transcript.{format_type.lower()}")
+            if os.path.exists(output_path):
+                outputs.append(output_path)
+        return {"success": bool(success), "model_size": model_size, "outputs": outputs}
+
+    def run_clip(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """在工作线程中执行裁剪任务"""
+        output_dir = params.get("output_dir") or "output"
+        clipper = self.clipper_factory(params["video"], output_dir)
+        success = clipper.process_result_json(params["result_file"])
+        outputs = sorted(
+            os.path.join(output_dir, name) for name in os.listdir(output_dir)
+            if name.endswith(".mp4")
+        ) if os.path.isdir(output_dir) else []
+        return {"success": bool(success), "outputs": outputs}
+
+    async def _worker(self):
+        """从优先队列中取出任务并在线程池中执行"""
+        loop = asyncio.get_running_loop()
+        while True:
+            _, _, job_id = await self._queue.get()
+            job = self.jobs.get(job_id)
+            try:
+                if job is None or job.status != "queued":
+                    self._tombstones = max(self._tombstones - 1, 0)
+                    continue
+                self._queued -= 1
+                job.status = "running"
+                job.started_at = time.time()
+                self._running += 1
+                runner = self.run_transcribe if job.type == "transcribe" else self.run_clip
+                try:
+                    job.result = await loop.run_in_executor(self._executor, runner, job.params)
+                    job.status = "completed" if job.result.get("success") else "failed"
+                except (Exception, SystemExit) as e:
+                    # 任务中的 sys.exit 也只让该任务失败，不结束工作协程
+                    job.status = "failed"
+                    job.error = str(e) or type(e).__name__
+                finally:
+                    self._running -= 1
+                    job.finished_at = time.time()
+                    self.prune_jobs()
+            finally:
+                self._queue.task_done()
+
+    # ------------------------------------------------------------------
+    # HTTP 接口
+    # ------------------------------------------------------------------
+
+    def stats(self) -> Dict[str, Any]:
+        """服务状态"""
+        counts: Dict[str, int] = {}
+        for job in self.jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        stats = {
+            "status": "ok",
+            "queued": self._queued,
+            "running": self._running,
+            "max_concurrent": self.max_concurrent,
+            "queue_size": self.queue_size,
+            "warm_models": self.models.warm_models(),
+            "jobs": counts,
+        }
+        # 已加载 ffmpeg 执行器时（执行过转写或裁剪任务）附带 ffmpeg 统计
+        runner = sys.modules.get("ffmpeg_runner")
+        if runner is not None:
+            summary = runner.DEFAULT_METRICS.summary()
+            summary.pop("recent")
+            stats["ffmpeg"] = summary
+        return stats
+
+    def route(self, method: str, path: str, body: bytes):
+        """
+        处理单个 HTTP 请求
+
+        Returns:
+            tuple: (状态码, 响应数据)
+        """
+        parts = [p for p in path.split("?", 1)[0].split("/") if p]
+
+        if parts == ["health"]:
+            self.prune_jobs()
+            return 200, self.stats()
+
+        if parts == ["jobs"]:
+            if method == "GET":
+                self.prune_jobs()
+                return 200, {"jobs": [job.to_dict() for job in self.jobs.values()]}
+            if method != "POST":
+                return 405, {"error": "method not allowed"}
+            try:
+                payload = json.loads(body.decode("utf-8") or "{}")
+                job = self.submit(payload.get("type", ""),
+                                  payload.get("params") or {},
+                                  int(payload.get("priority", 0)))
+            except asyncio.QueueFull:
+                return 503, {"error": "queue full"}
+            except (ValueError, TypeError, AttributeError) as e:
+                return 400, {"error": str(e)}
+            return 202, job.to_dict()
+
+        if len(parts) in (2, 3) and parts[0] == "jobs":
+            job = self.jobs.get(parts[1])
+            if job is None:
+                return 404, {"error": "job not found"}
+            if len(parts) == 3:
+                if parts[2] != "result" or method != "GET":
+                    return 404, {"error": "not found"}
+                if job.status in ("queued", "running"):
+                    return 409, {"error": "job not finished", "status": job.status}
+                return 200, job.to_dict(include_result=True)
+            if method == "GET":
+                return 200, job.to_dict()
+            if method == "DELETE":
+                if not self.cancel(job.id):
+                    return 409, {"error": "job cannot be cancelled", "status": job.status}
+                return 200, job.to_dict()
+            return 405, {"error": "method not allowed"}
+
+        return 404, {"error": "not found"}
+
+    async def _handle_connection(self, reader: asyncio.StreamReader,
+                                 writer: asyncio.StreamWriter):
+        """解析 HTTP/1.1 请求（每个连接一个请求）"""
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                return
+            try:
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+            except ValueError:
+                await self._respond(writer, 400, {"error": "bad request line"})
+                return
+
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            length = int(headers.get("content-length", 0) or 0)
+            if length > MAX_BODY_SIZE:
+                await self._respond(writer, 413, {"error": "body too large"})
+                return
+            body = await reader.readexactly(length) if length else b""
+
+            try:
+                status, data = self.route(method.upper(), path, body)
+            except Exception as e:
+                status, data = 500, {"error": str(e)}
+            await self._respond(writer, status, data)
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, data: Dict[str, Any]):
+        payload = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            "Connection: close\r\n\r\n"
+        ).encode("latin-1")
+        writer.write(head + payload)
+        await writer.drain()
+
+    # ------------------------------------------------------------------
+    # 生命周期
+    # ------------------------------------------------------------------
+
+    async def start(self):
+        """启动 HTTP 服务和工作协程"""
+        # 容量由 submit 按排队中的任务数限制，取消的任务不再占用队列
+        self._queue = asyncio.PriorityQueue()
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.max_concurrent)]
+        print(f"转写服务已启动: http://{self.host}:{self.port}")
+
+    async def stop(self):
+        """停止服务"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._executor.shutdown(wait=False)
+        print("转写服务已停止")
+
+    async def serve_forever(self):
+        """启动服务并一直运行"""
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地转写服务（模型常驻内存）")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址（默认: 127.0.0.1）")
+    parser.add_argument("--port", type=int, default=8765, help="监听端口（默认: 8765）")
+    parser.add_argument("-m", "--models", nargs="+", choices=MODEL_SIZES, default=["base"],
+                       help="启动时预加载的模型（默认: base），第一个为默认模型")
+    parser.add_argument("--max-concurrent", type=int, default=2,
+                       help="同时执行的最大任务数（默认: 2）")
+    parser.add_argument("--queue-size", type=int, default=64,
+                       help="等待队列最大长度（默认: 64）")
+    parser.add_argument("--job-ttl", type=float, default=FINISHED_JOB_TTL,
+                       help=f"已结束任务的保留时长（秒，默认: {FINISHED_JOB_TTL:.0f}），"
+                            f"最多保留 {MAX_FINISHED_JOBS} 个")
+
+    args = parser.parse_args()
+
+    service = TranscriptionService(
+        host=args.host,
+        port=args.port,
+        max_concurrent=args.max_concurrent,
+        queue_size=args.queue_size,
+        default_model=args.models[0],
+        finished_ttl=args.job_ttl
+    )
+    service.preload(args.models)
+
+    try:
+        asyncio.run(service.serve_forever())
+    except KeyboardInterrupt:
+        print("\n收到中断信号，退出")
+
+
+if __name__ == "__main__":
+    main()
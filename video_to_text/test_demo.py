@@ -85,7 +85,6 @@ def run_comprehensive_test():
     print("\n1. 环境检查...")
     try:
         import whisper
-        from moviepy.editor import VideoFileClip
         import torch
         print("✅ 所有依赖模块可正常导入")
     except ImportError as e:
@@ -45,7 +45,6 @@ def check_python_dependencies():
     
     dependencies = [
         ('whisper', 'OpenAI Whisper'),
-        ('moviepy', 'MoviePy'),
         ('torch', 'PyTorch'),
         ('torchaudio', 'TorchAudio'),
         ('pydub', 'PyDub'),
@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+"""测试直接导入 video_to_text 目录下的模块（与各脚本的同级导入方式一致）"""
+
+import sys
+from pathlib import Path
+
+TRANSCRIBER_DIR = Path(__file__).resolve().parent.parent
+if str(TRANSCRIBER_DIR) not in sys.path:
+    sys.path.insert(0, str(TRANSCRIBER_DIR))
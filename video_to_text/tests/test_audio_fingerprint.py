@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+"""音频指纹索引：复用语句的时间换算"""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from audio_fingerprint import FingerprintIndex
+
+
+def test_reused_words_stay_inside_segment(tmp_path):
+    index = FingerprintIndex(str(tmp_path / "fingerprints.db"))
+    try:
+        empty = np.zeros(0, dtype=np.int64)
+        segments = [{"start": 9.8, "end": 12.0, "text": "开头",
+                     "words": [{"word": "开", "start": 9.7, "end": 10.5},
+                               {"word": "头", "start": 10.5, "end": 12.3}]}]
+        source_id = index.add("a.mp4", {"duration": 60.0, "hashes": empty, "frames": empty}, segments)
+        # 新文件比源文件少了前 10 秒
+        region = {"source_id": source_id, "path": "a.mp4", "offset": 10.0, "start": 0.0, "end": 50.0}
+
+        reused, = index.reuse_segments(region)
+        assert reused["start"] == 0.0 and reused["end"] == pytest.approx(2.0)
+        words = [(word["start"], word["end"]) for word in reused["words"]]
+        assert words == [(0.0, pytest.approx(0.5)), (pytest.approx(0.5), pytest.approx(2.0))]
+    finally:
+        index.close()
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""分块检查点：中断后恢复的结果与不中断运行一致，源文件变化时不复用检查点"""
+
+import json
+
+import pytest
+
+np = pytest.importorskip("numpy")
+whisper = pytest.importorskip("whisper")
+pytest.importorskip("torch")
+
+import video_to_text
+from video_to_text import VideoToTextConverter
+
+SAMPLE_RATE = 16000
+# 静音区间（秒），切点应落在这些区间内
+SILENCES = [(17.5, 18.5), (39.0, 40.0)]
+
+
+class StubModel:
+    """确定性的模型桩：输出取决于音频内容和提示，fail_at 指定第几次调用时抛出异常"""
+
+    def __init__(self, fail_at: int = None):
+        self.fail_at = fail_at
+        self.calls = []
+
+    def transcribe(self, audio, initial_prompt=None, **kwargs):
+        self.calls.append({"samples": len(audio), "prompt": initial_prompt})
+        if self.fail_at is not None and len(self.calls) == self.fail_at:
+            raise RuntimeError("中断")
+        duration = len(audio) / SAMPLE_RATE
+        text = f"{float(np.abs(audio).sum()):.1f}|{len(initial_prompt or '')}"
+        return {"text": text, "segments": [{
+            "start": 0.0, "end": duration, "text": text, "tokens": [1, 2],
+            "words": [{"word": text, "start": 0.0, "end": duration}]}]}
+
+
+@pytest.fixture
+def audio(monkeypatch):
+    rng = np.random.default_rng(0)
+    samples = rng.uniform(-0.5, 0.5, 50 * SAMPLE_RATE).astype(np.float32)
+    for start, end in SILENCES:
+        samples[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)] = 0.0
+    monkeypatch.setattr(whisper, "load_audio", lambda path: samples)
+    return samples
+
+
+def converter_with(monkeypatch, model):
+    monkeypatch.setattr(whisper, "load_model", lambda size, device=None: model)
+    monkeypatch.setattr(video_to_text.whisper.audio, "SAMPLE_RATE", SAMPLE_RATE)
+    return VideoToTextConverter(model_size="base")
+
+
+def test_chunks_are_cut_in_silence(monkeypatch, audio):
+    converter = converter_with(monkeypatch, StubModel())
+    boundaries = converter.plan_chunk_boundaries(audio, SAMPLE_RATE, 20.0)
+    assert boundaries[0] == 0 and boundaries[-1] == len(audio)
+    assert len(boundaries) == len(SILENCES) + 2
+    for cut, (start, end) in zip(boundaries[1:-1], SILENCES):
+        assert start * SAMPLE_RATE <= cut <= end * SAMPLE_RATE
+
+
+def test_resume_matches_uninterrupted_run(monkeypatch, audio, tmp_path):
+    full_model = StubModel()
+    expected = converter_with(monkeypatch, full_model).transcribe_audio_checkpointed(
+        "audio.wav", str(tmp_path / "full.json"), 20.0, source="v1")
+    assert len(full_model.calls) == 3
+    # 每块以上一块的文字作为提示
+    assert full_model.calls[0]["prompt"] is None
+    assert all(call["prompt"] for call in full_model.calls[1:])
+
+    checkpoint_path = str(tmp_path / "resumed.json")
+    interrupted = StubModel(fail_at=2)
+    assert converter_with(monkeypatch, interrupted).transcribe_audio_checkpointed(
+        "audio.wav", checkpoint_path, 20.0, source="v1") == {}
+    with open(checkpoint_path, 'r', encoding='utf-8') as f:
+        assert len(json.load(f)["chunks"]) == 1
+
+    resumed_model = StubModel()
+    resumed = converter_with(monkeypatch, resumed_model).transcribe_audio_checkpointed(
+        "audio.wav", checkpoint_path, 20.0, source="v1")
+    assert resumed_model.calls == full_model.calls[1:]
+    assert resumed == expected
+    # 各块时间戳按切点偏移，首尾相接
+    segments = resumed["segments"]
+    assert segments[0]["start"] == 0.0 and segments[-1]["end"] == len(audio) / SAMPLE_RATE
+    assert all(a["end"] == b["start"] for a, b in zip(segments, segments[1:]))
+
+
+def test_checkpoint_of_other_source_is_discarded(monkeypatch, audio, tmp_path):
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+    converter_with(monkeypatch, StubModel(fail_at=2)).transcribe_audio_checkpointed(
+        "audio.wav", checkpoint_path, 20.0, source="v1")
+
+    model = StubModel()
+    converter_with(monkeypatch, model).transcribe_audio_checkpointed(
+        "audio.wav", checkpoint_path, 20.0, source="v2")
+    assert len(model.calls) == 3
+    with open(checkpoint_path, 'r', encoding='utf-8') as f:
+        assert json.load(f)["source"] == "v2"
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""裁剪读取调度：片段到字节范围的映射、读取组的合并和预读"""
+
+import os
+import sys
+from pathlib import Path
+
+CLIPPER_DIR = Path(__file__).resolve().parent.parent.parent / "video_clipper"
+if str(CLIPPER_DIR) not in sys.path:
+    sys.path.insert(0, str(CLIPPER_DIR))
+
+from io_scheduler import ByteIndex, ReadAheadScheduler, plan_reads
+
+MB = 1024 * 1024
+
+
+def test_range_uses_surrounding_keyframes():
+    index = ByteIndex({"size": 100 * MB, "duration": 100.0},
+                      [[20.0, 20 * MB], [0.0, 0], [10.0, 10 * MB]])
+    assert index.range(12.0, 15.0) == (10 * MB, 20 * MB)
+    assert index.range(10.0, 20.0) == (10 * MB, 20 * MB)
+    # 最后一个关键帧之后读到文件末尾
+    assert index.range(25.0, 30.0) == (20 * MB, 100 * MB)
+
+
+def test_range_estimated_from_bitrate():
+    index = ByteIndex({"size": 100 * MB, "duration": 100.0, "keyframe_interval": 2.0})
+    assert index.range(10.0, 20.0) == (8 * MB, 22 * MB)
+    assert index.range(-5.0, 200.0) == (0, 100 * MB)
+    # 时长未知时无法估算，得到空范围
+    assert ByteIndex({"size": 100 * MB}).range(10.0, 20.0) == (0, 0)
+
+
+def test_plan_reads_groups_nearby_ranges():
+    index = ByteIndex({"size": 1000 * MB, "duration": 1000.0})
+    jobs = [("c", 500.0, 510.0), ("a", 0.0, 10.0), ("b", 15.0, 20.0), ("d", 5.0, 12.0)]
+    groups = plan_reads(jobs, index, gap=8 * MB)
+    assert [(group["begin"], group["end"]) for group in groups] == [(0, 20 * MB), (500 * MB, 510 * MB)]
+    # 重叠的范围合并，组内有空隙的范围分开预读
+    assert groups[0]["ranges"] == [[0, 12 * MB], [15 * MB, 20 * MB]]
+    assert [position for position, _ in groups[0]["jobs"]] == [1, 3, 2]
+    assert groups[1]["jobs"] == [(0, ("c", 500.0, 510.0))]
+
+
+def test_advise_skips_empty_range(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(os, "posix_fadvise", lambda *args: calls.append(args), raising=False)
+    monkeypatch.setattr(os, "POSIX_FADV_WILLNEED", 3, raising=False)
+    scheduler = ReadAheadScheduler(str(tmp_path / "source.mp4"))
+    scheduler.advise(0, 0, 0)
+    scheduler.advise(0, 10, 5)
+    assert calls == []
+    scheduler.advise(0, 5, 10)
+    assert calls == [(0, 5, 5, 3)]
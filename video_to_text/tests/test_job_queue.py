@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""共享 SQLite 任务队列：领取、租约、重试和日志模式"""
+
+import time
+import sqlite3
+
+import pytest
+
+from job_queue import JobQueue, QueueWorker
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    yield queue
+    queue.close()
+
+
+def journal_mode(db_path: str) -> str:
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("PRAGMA journal_mode").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_claim_order_and_complete(queue):
+    low = queue.submit("transcribe", {"video_path": "low.mp4"}, priority=5)
+    high = queue.submit("transcribe", {"video_path": "high.mp4"}, priority=0)
+    clip = queue.submit("clip", {"result_file": "r.json"}, priority=-1)
+
+    job = queue.claim("w1", lease=60, job_types=["transcribe"])
+    assert job["id"] == high and job["status"] == "running" and job["attempts"] == 1
+    assert job["params"] == {"video_path": "high.mp4"}
+    assert queue.claim("w2", lease=60, job_types=["transcribe"])["id"] == low
+    assert queue.claim("w2", lease=60, job_types=["transcribe"]) is None
+
+    # 只有持有租约的 worker 能提交结果
+    assert not queue.complete(high, "w2", {"success": True})
+    assert queue.complete(high, "w1", {"success": True, "outputs": ["a.json"]})
+    assert queue.get(high)["result"] == {"success": True, "outputs": ["a.json"]}
+    assert queue.counts() == {"completed": 1, "running": 1, "queued": 1}
+    assert queue.get(clip)["status"] == "queued"
+
+
+def test_expired_lease_is_reclaimed(queue):
+    job_id = queue.submit("transcribe", {}, max_attempts=2)
+    assert queue.claim("w1", lease=-1)["id"] == job_id
+    assert queue.counts() == {"running": 1, "expired": 1}
+
+    job = queue.claim("w2", lease=60)
+    assert job["id"] == job_id and job["attempts"] == 2
+    # 原 worker 已失去租约
+    assert not queue.heartbeat(job_id, "w1", 60)
+    assert not queue.complete(job_id, "w1", {"success": True})
+    assert queue.heartbeat(job_id, "w2", 60)
+
+
+def test_expired_lease_after_last_attempt_fails(queue):
+    job_id = queue.submit("transcribe", {}, max_attempts=1)
+    queue.claim("w1", lease=-1)
+    assert queue.claim("w2", lease=60) is None
+    job = queue.get(job_id)
+    assert job["status"] == "failed" and job["error"]
+
+
+def test_fail_requeues_until_max_attempts(queue):
+    job_id = queue.submit("transcribe", {}, max_attempts=2)
+    queue.claim("w1", lease=60)
+    assert queue.fail(job_id, "w1", "出错")
+    assert queue.get(job_id)["status"] == "queued"
+    queue.claim("w1", lease=60)
+    assert queue.fail(job_id, "w1", "又出错")
+    job = queue.get(job_id)
+    assert job["status"] == "failed" and job["error"] == "又出错" and job["attempts"] == 2
+
+
+def test_worker_runs_handlers(queue):
+    ok = queue.submit("transcribe", {"n": 1})
+    bad = queue.submit("clip", {"n": 2}, max_attempts=1)
+    handlers = {"transcribe": lambda params: {"success": True, "n": params["n"]},
+                "clip": lambda params: {"success": False}}
+    worker = QueueWorker(queue, handlers, worker_id="w", verbose=False)
+    worker.run(exit_when_empty=True)
+    assert worker.stats == {"completed": 1, "failed": 1, "lost": 0}
+    assert queue.get(ok)["result"] == {"success": True, "n": 1}
+    assert queue.get(bad)["status"] == "failed"
+
+
+def test_lost_lease_discards_result(queue):
+    job_id = queue.submit("transcribe", {})
+
+    def handler(params):
+        # 执行期间租约被另一个 worker 接手
+        conn = sqlite3.connect(queue.db_path)
+        conn.execute("UPDATE jobs SET worker = 'other' WHERE id = ?", (job_id,))
+        conn.commit()
+        conn.close()
+        time.sleep(0.2)
+        return {"success": True}
+
+    worker = QueueWorker(queue, {"transcribe": handler}, worker_id="w", heartbeat_interval=0.05,
+                         verbose=False)
+    assert worker.run_one()
+    assert worker.stats["lost"] == 1
+    assert queue.get(job_id)["status"] == "running" and queue.get(job_id)["worker"] == "other"
+
+
+def test_heartbeat_connection_keeps_journal_mode(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+    queue = JobQueue(db_path, journal_mode="delete")
+    try:
+        job_id = queue.submit("transcribe", {})
+
+        def handler(params):
+            # 执行期间续约线程打开辅助连接并续约若干次
+            time.sleep(0.1)
+            return {"success": True}
+
+        worker = QueueWorker(queue, {"transcribe": handler}, worker_id="w", heartbeat_interval=0.02,
+                             verbose=False)
+        assert worker.run_one()
+        assert queue.get(job_id)["status"] == "completed"
+        assert journal_mode(db_path) == "delete"
+    finally:
+        queue.close()
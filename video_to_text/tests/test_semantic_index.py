@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""段落语义检索：从 JSON 和二进制转录构建索引并检索"""
+
+import os
+import json
+
+from transcript_binary import json_to_binary
+from semantic_index import SemanticIndex, HashedNgramEmbedder, find_transcripts
+
+TEXTS = {
+    "a": ["白酒估值到了底部，长期值得布局", "今天先聊聊天气"],
+    "b": ["新能源车销量继续增长", "半导体设备国产化提速"],
+    "c": ["银行股分红率很高", "债券收益率下行"],
+}
+
+
+def write_transcript(path, texts):
+    sentences = [{"id": i, "text": text, "start_time": i * 10.0, "end_time": i * 10.0 + 8.0}
+                 for i, text in enumerate(texts)]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"total_sentences": len(sentences), "sentences": sentences}, f, ensure_ascii=False)
+
+
+def test_build_from_json_and_binary(tmp_path):
+    videos = tmp_path / "videos"
+    (videos / "sub").mkdir(parents=True)
+    write_transcript(videos / "a_transcript.json", TEXTS["a"])
+    write_transcript(tmp_path / "b.json", TEXTS["b"])
+    json_to_binary(str(tmp_path / "b.json"), str(videos / "sub" / "b_transcript.bin"))
+    # c 同时有 JSON 和二进制转录，只编码一次
+    write_transcript(videos / "c_transcript.json", TEXTS["c"])
+    json_to_binary(str(videos / "c_transcript.json"), str(videos / "c_transcript.bin"))
+
+    assert [path.name for path in find_transcripts(str(videos))] == \
+        ["a_transcript.json", "c_transcript.bin", "b_transcript.bin"]
+
+    index_dir = str(tmp_path / "index")
+    stats = SemanticIndex.build([str(videos)], index_dir, HashedNgramEmbedder(64), batch_size=2)
+    assert stats["videos"] == 3 and stats["paragraphs"] == 6
+    assert sorted(os.listdir(index_dir)) == ["ids.npy", "meta.json", "text_offsets.npy", "texts.bin",
+                                             "times_ms.npy", "vectors.f16", "video_ids.npy"]
+
+    index = SemanticIndex(index_dir)
+    results = index.search(["新能源车销量继续增长", "银行股分红率很高"], k=2)
+    assert (results[0][0]["video"], results[0][0]["id"], results[0][0]["start_time"]) == ("b", 0, 0.0)
+    assert results[0][0]["text"] == "新能源车销量继续增长"
+    assert results[0][0]["score"] > 0.99
+    assert (results[1][0]["video"], results[1][0]["id"]) == ("c", 0)
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""本地转写服务：通过 127.0.0.1 上的 HTTP 接口测试，转换器为桩实现，不加载 Whisper"""
+
+import os
+import json
+import time
+import asyncio
+import threading
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from service import TranscriptionService
+
+
+class StubConverter:
+    """记录调用并写出转录文件的转换器桩；gate 未放行时阻塞，用于让任务停留在队列中"""
+
+    def __init__(self, model_size: str, gate: threading.Event = None):
+        self.model_size = model_size
+        self.gate = gate
+        self.calls = []
+
+    def convert_video_to_text(self, video_path, output_dir, output_formats, **kwargs):
+        if self.gate is not None:
+            self.gate.wait(10)
+        self.calls.append(video_path)
+        for format_type in output_formats:
+            path = os.path.join(output_dir, f"{Path(video_path).stem}_transcript.{format_type}")
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write("{}")
+        return True
+
+
+def request(port: int, method: str, path: str, payload=None):
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    req = urllib.request.Request(f"http://127.0.0.1:{port}{path}", data=data, method=method)
+    try:
+        with urllib.request.urlopen(req, timeout=10) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+async def call(service, method, path, payload=None):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, request, service.port, method, path, payload)
+
+
+async def wait_finished(service, job_id, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status, job = await call(service, "GET", f"/jobs/{job_id}")
+        if status == 200 and job["status"] not in ("queued", "running"):
+            return job
+        await asyncio.sleep(0.02)
+    raise AssertionError(f"任务 {job_id} 未在 {timeout}s 内结束")
+
+
+def run_service(test, **kwargs):
+    async def main():
+        service = TranscriptionService(port=0, **kwargs)
+        await service.start()
+        try:
+            await test(service)
+        finally:
+            await service.stop()
+    asyncio.run(main())
+
+
+def transcribe_job(tmp_path, name="a"):
+    return {"type": "transcribe",
+            "params": {"video_path": str(tmp_path / f"{name}.mp4"), "output_dir": str(tmp_path),
+                       "output_formats": ["json"]}}
+
+
+def test_submit_and_fetch_result(tmp_path):
+    converters = {}
+
+    def factory(model_size):
+        converters[model_size] = StubConverter(model_size)
+        return converters[model_size]
+
+    async def scenario(service):
+        status, job = await call(service, "POST", "/jobs", transcribe_job(tmp_path))
+        assert status == 202 and job["status"] == "queued"
+
+        finished = await wait_finished(service, job["job_id"])
+        assert finished["status"] == "completed"
+        status, data = await call(service, "GET", f"/jobs/{job['job_id']}/result")
+        assert status == 200
+        assert data["result"]["outputs"] == [str(tmp_path / "a_transcript.json")]
+        assert converters["base"].calls == [str(tmp_path / "a.mp4")]
+
+        status, health = await call(service, "GET", "/health")
+        assert status == 200 and health["jobs"] == {"completed": 1}
+        assert health["warm_models"] == ["base"]
+
+    run_service(scenario, converter_factory=factory)
+
+
+def test_invalid_requests(tmp_path):
+    async def scenario(service):
+        status, _ = await call(service, "POST", "/jobs", {"type": "unknown"})
+        assert status == 400
+        status, _ = await call(service, "POST", "/jobs", {"type": "transcribe", "params": {}})
+        assert status == 400
+        status, _ = await call(service, "GET", "/jobs/missing")
+        assert status == 404
+
+    run_service(scenario, converter_factory=StubConverter)
+
+
+def test_queue_full_and_cancel_releases_capacity(tmp_path):
+    gate = threading.Event()
+
+    async def scenario(service):
+        try:
+            # 第一个任务占住唯一的工作协程，之后的任务停留在队列中
+            status, running = await call(service, "POST", "/jobs", transcribe_job(tmp_path, "running"))
+            assert status == 202
+            while service.jobs[running["job_id"]].status != "running":
+                await asyncio.sleep(0.01)
+
+            queued = []
+            for name in ("q1", "q2"):
+                status, job = await call(service, "POST", "/jobs", transcribe_job(tmp_path, name))
+                assert status == 202
+                queued.append(job["job_id"])
+            status, data = await call(service, "POST", "/jobs", transcribe_job(tmp_path, "rejected"))
+            assert status == 503 and data["error"] == "queue full"
+
+            status, job = await call(service, "DELETE", f"/jobs/{queued[0]}")
+            assert status == 200 and job["status"] == "cancelled"
+            status, _ = await call(service, "DELETE", f"/jobs/{running['job_id']}")
+            assert status == 409
+
+            # 取消的任务不再占用队列容量
+            status, job = await call(service, "POST", "/jobs", transcribe_job(tmp_path, "q3"))
+            assert status == 202
+            queued.append(job["job_id"])
+        finally:
+            gate.set()
+
+        for job_id in [running["job_id"], queued[1], queued[2]]:
+            assert (await wait_finished(service, job_id))["status"] == "completed"
+        status, job = await call(service, "GET", f"/jobs/{queued[0]}")
+        assert job["status"] == "cancelled"
+
+    run_service(scenario, max_concurrent=1, queue_size=2,
+                converter_factory=lambda model_size: StubConverter(model_size, gate))
+
+
+def test_model_load_exit_fails_only_the_job(tmp_path):
+    def factory(model_size):
+        if model_size == "large":
+            raise SystemExit(1)
+        return StubConverter(model_size)
+
+    async def scenario(service):
+        bad = transcribe_job(tmp_path, "bad")
+        bad["params"]["model_size"] = "large"
+        _, job = await call(service, "POST", "/jobs", bad)
+        failed = await wait_finished(service, job["job_id"])
+        assert failed["status"] == "failed" and "large" in failed["error"]
+
+        # 服务和工作协程仍然可用
+        _, job = await call(service, "POST", "/jobs", transcribe_job(tmp_path, "good"))
+        assert (await wait_finished(service, job["job_id"]))["status"] == "completed"
+
+    run_service(scenario, max_concurrent=1, converter_factory=factory)
+
+
+def test_finished_jobs_are_pruned(tmp_path):
+    async def scenario(service):
+        ids = []
+        for name in ("a", "b", "c"):
+            _, job = await call(service, "POST", "/jobs", transcribe_job(tmp_path, name))
+            await wait_finished(service, job["job_id"])
+            ids.append(job["job_id"])
+
+        # 超出数量上限时先移除最早结束的任务
+        status, data = await call(service, "GET", "/jobs")
+        assert [job["job_id"] for job in data["jobs"]] == ids[1:]
+        status, _ = await call(service, "GET", f"/jobs/{ids[0]}")
+        assert status == 404
+
+        # 超过保留时长后全部移除
+        assert service.prune_jobs(now=time.time() + service.finished_ttl + 1) == 2
+        assert service.jobs == {}
+
+    run_service(scenario, max_concurrent=1, max_finished=2, converter_factory=StubConverter)
+
+
+def test_health_answers_while_model_loads(tmp_path):
+    loading = threading.Event()
+    release = threading.Event()
+
+    def factory(model_size):
+        if model_size == "large":
+            loading.set()
+            release.wait(10)
+        return StubConverter(model_size)
+
+    async def scenario(service):
+        try:
+            # base 已预热，large 的冷加载在工作线程中阻塞
+            service.models.get("base")
+            slow = transcribe_job(tmp_path, "slow")
+            slow["params"]["model_size"] = "large"
+            _, slow_job = await call(service, "POST", "/jobs", slow)
+            loop = asyncio.get_running_loop()
+            assert await loop.run_in_executor(None, loading.wait, 10)
+
+            started = time.monotonic()
+            status, health = await call(service, "GET", "/health")
+            assert status == 200 and health["warm_models"] == ["base"]
+            assert time.monotonic() - started < 1.0
+
+            # 已加载的模型不等待其他模型的冷加载
+            _, job = await call(service, "POST", "/jobs", transcribe_job(tmp_path, "warm"))
+            assert (await wait_finished(service, job["job_id"]))["status"] == "completed"
+        finally:
+            release.set()
+        assert (await wait_finished(service, slow_job["job_id"]))["status"] == "completed"
+
+    run_service(scenario, max_concurrent=2, converter_factory=factory)
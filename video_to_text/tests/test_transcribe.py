@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""转录结果的后处理：时间戳 token 切句、级联复核和指纹复用结果的拼接"""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("whisper")
+pytest.importorskip("torch")
+
+import video_to_text
+from video_to_text import VideoToTextConverter
+
+
+class StubTokenizer:
+    eot = 100
+    timestamp_begin = 200
+
+
+def ts(seconds: float) -> int:
+    return StubTokenizer.timestamp_begin + int(round(seconds / 0.02))
+
+
+class OverrunModel:
+    """复核模型桩：输出的语句和词都超出所给音频的末尾"""
+
+    def transcribe(self, audio, **kwargs):
+        duration = len(audio) / video_to_text.whisper.audio.SAMPLE_RATE
+        return {"segments": [{"start": 0.5, "end": duration + 2.0, "text": "复核",
+                              "words": [{"word": "复", "start": 0.5, "end": 1.0},
+                                        {"word": "核", "start": duration + 1.0, "end": duration + 2.0}]}]}
+
+
+@pytest.fixture
+def converter(monkeypatch):
+    monkeypatch.setattr(video_to_text.whisper, "load_model", lambda size, device=None: OverrunModel())
+    return VideoToTextConverter(model_size="base")
+
+
+def test_split_timestamped_tokens(converter):
+    tokens = [ts(0.0), 1, 2, ts(1.0), ts(1.0), 3, ts(2.5), StubTokenizer.eot]
+    assert converter.split_timestamped_tokens(tokens, StubTokenizer, 0.02, 30.0) == [
+        (0.0, 1.0, [1, 2]), (1.0, 2.5, [3])]
+
+
+def test_text_after_closed_segment_starts_at_last_timestamp(converter):
+    # 第二句缺少开始时间戳：应从上一句的结束时间开始，而不是把下一个时间戳当作开始
+    tokens = [ts(0.0), 1, ts(1.0), 2, 3, ts(2.0), 4, ts(3.0)]
+    assert converter.split_timestamped_tokens(tokens, StubTokenizer, 0.02, 30.0) == [
+        (0.0, 1.0, [1]), (1.0, 2.0, [2, 3]), (2.0, 3.0, [4])]
+
+
+def test_trailing_text_runs_to_window_end(converter):
+    tokens = [ts(0.0), 1, ts(1.0), 2]
+    assert converter.split_timestamped_tokens(tokens, StubTokenizer, 0.02, 30.0) == [
+        (0.0, 1.0, [1]), (1.0, 30.0, [2])]
+
+
+def test_refined_words_are_clamped_to_span(converter, monkeypatch):
+    sample_rate = video_to_text.whisper.audio.SAMPLE_RATE
+    monkeypatch.setattr(video_to_text.whisper, "load_audio",
+                        lambda path: np.zeros(10 * sample_rate, dtype=np.float32))
+    segments = [
+        {"start": 0.0, "end": 2.0, "text": "好", "avg_logprob": -0.1},
+        {"start": 2.0, "end": 4.0, "text": "差", "avg_logprob": -1.5},
+        {"start": 4.0, "end": 6.0, "text": "好", "avg_logprob": -0.1},
+    ]
+    result = converter.refine_low_confidence("audio.wav", {"segments": segments}, "base")
+    refined = result["segments"][1]
+    assert refined["escalated"] and refined["end"] == 4.0
+    assert [(word["start"], word["end"]) for word in refined["words"]] == [(2.5, 3.0), (4.0, 4.0)]
+    assert result["segments"][2]["start"] == 4.0
+
+
+class StubFingerprintIndex:
+    """指纹索引桩：前 5 秒匹配到源文件，其余部分需要识别"""
+
+    def __init__(self, db_path):
+        pass
+
+    def match(self, fingerprint, exclude_path=None):
+        return [{"path": "src.mp4", "offset": 0.0, "start": 0.0, "end": 5.0}]
+
+    def reuse_segments(self, region):
+        return [{"start": 0.0, "end": 5.0, "text": "复用", "reused_from": "src.mp4"}]
+
+    def close(self):
+        pass
+
+
+def test_gap_words_are_clamped_to_segment(converter, monkeypatch):
+    sample_rate = video_to_text.whisper.audio.SAMPLE_RATE
+    monkeypatch.setattr(video_to_text, "load_wav",
+                        lambda path: (np.zeros(10 * sample_rate, dtype=np.float32), sample_rate))
+    monkeypatch.setattr(video_to_text, "fingerprint_audio",
+                        lambda samples, rate: {"hashes": [], "seconds": 0.0, "duration": 10.0})
+    monkeypatch.setattr(video_to_text, "FingerprintIndex", StubFingerprintIndex)
+
+    result, _ = converter.transcribe_with_fingerprints("b.mp4", "audio.wav", "fingerprints.db")
+    gap = result["segments"][1]
+    assert (gap["start"], gap["end"]) == (5.5, 10.0)
+    assert [(word["start"], word["end"]) for word in gap["words"]] == [(5.5, 6.0), (10.0, 10.0)]
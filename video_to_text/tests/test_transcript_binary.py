@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""二进制转录格式：与 JSON 的往返转换、按 id 和时间范围读取、损坏文件的处理"""
+
+import os
+import json
+
+import pytest
+
+from transcript_render import format_timestamps
+from transcript_binary import (BinaryTranscript, encode_transcript, json_to_binary, binary_to_json,
+                               load_sentences, is_binary_transcript)
+
+
+def make_sentences(times, ids=None, **extra_fields):
+    starts = [start for start, _ in times]
+    ends = [end for _, end in times]
+    start_stamps, end_stamps = format_timestamps(starts), format_timestamps(ends)
+    sentences = []
+    for i, (start, end) in enumerate(times):
+        sentence = {
+            "id": ids[i] if ids else i,
+            "text": f"第{i}句，包含中文。",
+            "start_time": start,
+            "end_time": end,
+            "start_timestamp": start_stamps[i],
+            "end_timestamp": end_stamps[i],
+            "duration": round(end - start, 3),
+        }
+        sentence.update({key: values[i] for key, values in extra_fields.items()})
+        sentences.append(sentence)
+    return sentences
+
+
+def write_binary(tmp_path, sentences, metadata=None, name="t.bin"):
+    path = str(tmp_path / name)
+    with open(path, 'wb') as f:
+        f.write(encode_transcript(sentences, metadata))
+    return path
+
+
+def test_json_round_trip(tmp_path):
+    sentences = make_sentences([(0.0, 1.5), (1.5, 3.25), (3.25, 7.001)],
+                               score=[0.5, None, 2], tags=[["a"], [], {"k": "v"}])
+    data = {"total_sentences": len(sentences), "sentences": sentences,
+            "source": "video.mp4", "model": "base"}
+    json_path = str(tmp_path / "t.json")
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+
+    bin_path = str(tmp_path / "t.bin")
+    assert json_to_binary(json_path, bin_path) == os.path.getsize(bin_path)
+    assert is_binary_transcript(bin_path) and not is_binary_transcript(json_path)
+    assert load_sentences(bin_path) == sentences
+
+    back_path = str(tmp_path / "back.json")
+    binary_to_json(bin_path, back_path)
+    with open(back_path, 'r', encoding='utf-8') as f:
+        assert json.load(f) == data
+
+
+def test_lookup_by_id_and_range(tmp_path):
+    times = [(0.0, 2.0), (2.0, 4.0), (5.0, 6.0), (6.5, 9.0)]
+    path = write_binary(tmp_path, make_sentences(times, ids=[10, 3, 7, 42]))
+    with BinaryTranscript(path) as transcript:
+        assert len(transcript) == 4
+        assert transcript.get(7)["start_time"] == 5.0
+        assert transcript.get(8) is None
+        assert transcript.sentence(-1)["id"] == 42
+        assert [s["id"] for s in transcript.range(3.0, 5.5)] == [3, 7]
+        assert transcript.range(4.2, 4.8) == []
+        assert [s["id"] for s in transcript] == [10, 3, 7, 42]
+
+    with BinaryTranscript(write_binary(tmp_path, make_sentences(times), name="seq.bin")) as transcript:
+        assert transcript.find(3) == 3 and transcript.find(4) is None
+
+
+def test_empty_transcript(tmp_path):
+    with BinaryTranscript(write_binary(tmp_path, [], {"source": "x"})) as transcript:
+        assert len(transcript) == 0
+        assert transcript.to_sentences() == [] and transcript.get(0) is None
+        assert transcript.metadata == {"source": "x"}
+
+
+def test_close_while_arrays_are_held(tmp_path):
+    transcript = BinaryTranscript(write_binary(tmp_path, make_sentences([(0.0, 1.0), (1.0, 2.0)])))
+    starts = transcript.starts_ms
+    transcript.close()
+    # 调用方持有的数组仍然可用，映射在数组释放后才释放
+    assert starts.tolist() == [0, 1000]
+    del starts
+
+
+def open_fds(path: str) -> int:
+    fd_dir = "/proc/self/fd"
+    return sum(1 for fd in os.listdir(fd_dir)
+               if os.path.realpath(os.path.join(fd_dir, fd)) == os.path.realpath(path))
+
+
+@pytest.mark.parametrize("keep", [4, 40, -1])
+def test_truncated_file_is_rejected(tmp_path, keep):
+    content = encode_transcript(make_sentences([(0.0, 1.0), (1.0, 2.0)]), {"source": "x"})
+    path = str(tmp_path / "truncated.bin")
+    with open(path, 'wb') as f:
+        f.write(content[:keep])
+    with pytest.raises(ValueError):
+        BinaryTranscript(path)
+    if os.path.isdir("/proc/self/fd"):
+        assert open_fds(path) == 0
+
+
+@pytest.mark.parametrize("bad_id", [2 ** 31, -2 ** 31 - 1, 1.5, "3", True])
+def test_invalid_ids_are_rejected(bad_id):
+    sentences = make_sentences([(0.0, 1.0), (1.0, 2.0)], ids=[0, bad_id])
+    with pytest.raises(ValueError):
+        encode_transcript(sentences)
+
+
+def test_int32_id_bounds_round_trip(tmp_path):
+    ids = [-2 ** 31, 2 ** 31 - 1]
+    path = write_binary(tmp_path, make_sentences([(0.0, 1.0), (1.0, 2.0)], ids=ids))
+    with BinaryTranscript(path) as transcript:
+        assert [s["id"] for s in transcript] == ids
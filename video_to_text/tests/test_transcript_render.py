@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""文档写出：同一进程内多个线程并发写同一个文件"""
+
+import os
+import threading
+
+from transcript_render import write_document
+
+
+def test_concurrent_writes_to_same_path(tmp_path):
+    path = str(tmp_path / "video_transcript.txt")
+    contents = [f"{i}\n".encode() * 200000 for i in range(8)]
+    barrier = threading.Barrier(len(contents))
+    errors = []
+
+    def write(content):
+        barrier.wait()
+        try:
+            write_document(path, content)
+        except OSError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(content,)) for content in contents]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    # 最后完成的写入完整生效，没有交错的内容，也没有残留的临时文件
+    with open(path, 'rb') as f:
+        assert f.read() in contents
+    assert os.listdir(tmp_path) == ["video_transcript.txt"]
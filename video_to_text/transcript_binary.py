@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+紧凑二进制转录格式
+按列存储整数毫秒时间，句子文本集中为一个带偏移索引的 UTF-8 区块，
+读取时用 mmap 映射文件，按 id 或时间范围取单个句子时无需解析整个文件。
+
+文件布局（小端）:
+    头部      magic "VTTB", 版本, 标志, 句子数, 文本/附加字段/元数据区块的字节数
+    ids       int32[n]    句子 id
+    starts    uint32[n]   开始时间（毫秒）
+    ends      uint32[n]   结束时间（毫秒）
+    text_idx  uint32[n+1] 文本区块中每个句子的起止偏移
+    text      UTF-8 文本区块（补齐到 4 字节）
+    extra_idx uint32[n+1] 附加字段区块的偏移（仅当句子含标准字段以外的字段时存在）
+    extra     每个句子附加字段的 JSON（补齐到 4 字节）
+    meta      文档级字段的 JSON（total_sentences、sentences 以外的字段）
+"""
+
+import os
+import sys
+import mmap
+import json
+import struct
+import argparse
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from transcript_render import seconds_to_ms, format_timestamps_ms, write_document
+
+MAGIC = b"VTTB"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIIII")
+
+FLAG_SORTED = 1       # 开始时间单调不减，可二分查找
+FLAG_SEQUENTIAL_IDS = 2  # id 为从 ids[0] 开始的连续整数，可直接定位
+FLAG_EXTRAS = 4       # 存在附加字段区块
+
+# video_to_text 输出的标准字段，其余字段存入附加字段区块
+STANDARD_KEYS = ("id", "text", "start_time", "end_time", "start_timestamp", "end_timestamp", "duration")
+
+MAX_UINT32 = 2 ** 32 - 1
+INT32_RANGE = (-2 ** 31, 2 ** 31 - 1)
+
+
+def is_binary_transcript(path: str) -> bool:
+    """根据文件头判断是否为二进制转录文件"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def _pad(data: bytes) -> bytes:
+    return data + b"\0" * (-len(data) % 4)
+
+
+def _blob(items: List[bytes]) -> Tuple[np.ndarray, bytes]:
+    """把若干字节串拼接为一个区块，返回 (偏移数组, 区块)"""
+    offsets = np.zeros(len(items) + 1, dtype=np.int64)
+    np.cumsum([len(item) for item in items], out=offsets[1:])
+    if offsets[-1] > MAX_UINT32:
+        raise ValueError("文本超过 4GB，无法写入二进制转录格式")
+    return offsets.astype("<u4"), b"".join(items)
+
+
+def encode_transcript(sentences: List[Dict[str, Any]], metadata: Optional[Dict[str, Any]] = None) -> bytes:
+    """
+    把句子列表编码为二进制转录
+
+    Args:
+        sentences: 句子列表（至少包含 text、start_time、end_time）
+        metadata: 文档级字段
+
+    Returns:
+        bytes: 二进制转录内容
+    """
+    count = len(sentences)
+    raw_ids = [sentence.get("id", i) for i, sentence in enumerate(sentences)]
+    if any(isinstance(value, bool) or not isinstance(value, (int, np.integer)) for value in raw_ids):
+        raise ValueError("句子 id 必须是整数")
+    if raw_ids and (min(raw_ids) < INT32_RANGE[0] or max(raw_ids) > INT32_RANGE[1]):
+        raise ValueError("句子 id 超出二进制转录格式的范围（32 位有符号整数）")
+    ids = np.array(raw_ids, dtype=np.int64)
+    starts = seconds_to_ms([sentence["start_time"] for sentence in sentences])
+    ends = seconds_to_ms([sentence["end_time"] for sentence in sentences])
+    if count and (starts.min() < 0 or ends.min() < 0 or max(starts.max(), ends.max()) > MAX_UINT32):
+        raise ValueError("时间超出二进制转录格式的范围（0 到约 49 天）")
+
+    text_offsets, text = _blob([sentence.get("text", "").encode("utf-8") for sentence in sentences])
+    extras = [{key: value for key, value in sentence.items() if key not in STANDARD_KEYS}
+              for sentence in sentences]
+
+    flags = 0
+    if count < 2 or bool(np.all(np.diff(starts) >= 0)):
+        flags |= FLAG_SORTED
+    if count and bool(np.array_equal(ids, np.arange(ids[0], ids[0] + count))):
+        flags |= FLAG_SEQUENTIAL_IDS
+    sections = [ids.astype("<i4").tobytes(), starts.astype("<u4").tobytes(), ends.astype("<u4").tobytes(),
+                text_offsets.tobytes(), _pad(text)]
+    extra = b""
+    if any(extras):
+        flags |= FLAG_EXTRAS
+        extra_offsets, extra = _blob([json.dumps(item, ensure_ascii=False).encode("utf-8") if item else b""
+                                      for item in extras])
+        sections += [extra_offsets.tobytes(), _pad(extra)]
+    meta = json.dumps(metadata, ensure_ascii=False).encode("utf-8") if metadata else b""
+    sections.append(meta)
+
+    header = HEADER.pack(MAGIC, VERSION, flags, count, len(text), len(extra), len(meta))
+    return b"".join([header] + sections)
+
+
+class BinaryTranscript:
+    """二进制转录的只读视图（mmap，按需解码单个句子）"""
+
+    def __init__(self, path: str):
+        """
+        打开二进制转录文件
+
+        Args:
+            path: 文件路径
+        """
+        self.path = path
+        self._mmap = None
+        self.ids = self.starts_ms = self.ends_ms = self._text_offsets = self._extra_offsets = None
+        self._file = open(path, 'rb')
+        try:
+            self._map(os.fstat(self._file.fileno()).st_size)
+        except BaseException:
+            # 文件损坏或被截断时不留下打开的文件和映射
+            self.close()
+            raise
+
+    def _map(self, size: int):
+        path = self.path
+        if size < HEADER.size:
+            raise ValueError(f"不是二进制转录文件: {path}")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.flags, count, text_bytes, extra_bytes, meta_bytes = \
+            HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"不是二进制转录文件: {path}")
+        if version != VERSION:
+            raise ValueError(f"不支持的二进制转录版本 {version}: {path}")
+        expected = HEADER.size + 4 * (4 * count + 1) + text_bytes + (-text_bytes % 4) + meta_bytes
+        if self.flags & FLAG_EXTRAS:
+            expected += 4 * (count + 1) + extra_bytes + (-extra_bytes % 4)
+        if size < expected:
+            raise ValueError(f"二进制转录文件不完整（{size}/{expected} 字节）: {path}")
+
+        offset = HEADER.size
+        self.ids = np.frombuffer(self._mmap, dtype="<i4", count=count, offset=offset)
+        offset += 4 * count
+        self.starts_ms = np.frombuffer(self._mmap, dtype="<u4", count=count, offset=offset)
+        offset += 4 * count
+        self.ends_ms = np.frombuffer(self._mmap, dtype="<u4", count=count, offset=offset)
+        offset += 4 * count
+        self._text_offsets = np.frombuffer(self._mmap, dtype="<u4", count=count + 1, offset=offset)
+        offset += 4 * (count + 1)
+        self._text_start = offset
+        offset += text_bytes + (-text_bytes % 4)
+        if self.flags & FLAG_EXTRAS:
+            self._extra_offsets = np.frombuffer(self._mmap, dtype="<u4", count=count + 1, offset=offset)
+            offset += 4 * (count + 1)
+            self._extra_start = offset
+            offset += extra_bytes + (-extra_bytes % 4)
+        self._meta = (offset, meta_bytes)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """文档级字段"""
+        offset, length = self._meta
+        if not length:
+            return {}
+        return json.loads(self._mmap[offset:offset + length].decode("utf-8"))
+
+    def text(self, index: int) -> str:
+        """第 index 个句子的文本"""
+        begin = self._text_start + int(self._text_offsets[index])
+        end = self._text_start + int(self._text_offsets[index + 1])
+        return self._mmap[begin:end].decode("utf-8")
+
+    def sentence(self, index: int) -> Dict[str, Any]:
+        """按位置解码一个句子，字段与 video_to_text 的 JSON 输出相同"""
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        start_ms = int(self.starts_ms[index])
+        end_ms = int(self.ends_ms[index])
+        start_stamp, end_stamp = format_timestamps_ms([start_ms, end_ms])
+        sentence = {
+            "id": int(self.ids[index]),
+            "text": self.text(index),
+            "start_time": start_ms / 1000,
+            "end_time": end_ms / 1000,
+            "start_timestamp": start_stamp,
+            "end_timestamp": end_stamp,
+            "duration": (end_ms - start_ms) / 1000,
+        }
+        if self._extra_offsets is not None:
+            begin = self._extra_start + int(self._extra_offsets[index])
+            end = self._extra_start + int(self._extra_offsets[index + 1])
+            if end > begin:
+                sentence.update(json.loads(self._mmap[begin:end].decode("utf-8")))
+        return sentence
+
+    def find(self, sentence_id: int) -> Optional[int]:
+        """句子 id 对应的位置，不存在时返回 None"""
+        if not len(self):
+            return None
+        if self.flags & FLAG_SEQUENTIAL_IDS:
+            index = sentence_id - int(self.ids[0])
+            return index if 0 <= index < len(self) else None
+        matches = np.flatnonzero(self.ids == sentence_id)
+        return int(matches[0]) if len(matches) else None
+
+    def get(self, sentence_id: int) -> Optional[Dict[str, Any]]:
+        """按 id 取一个句子，不存在时返回 None"""
+        index = self.find(sentence_id)
+        return None if index is None else self.sentence(index)
+
+    def range_indices(self, start: float, end: float) -> np.ndarray:
+        """与 [start, end]（秒）有重叠的句子位置"""
+        start_ms, end_ms = int(round(start * 1000)), int(round(end * 1000))
+        if self.flags & FLAG_SORTED:
+            # 开始时间晚于 end 的句子都不重叠，只需检查之前的部分
+            stop = int(np.searchsorted(self.starts_ms, end_ms, side="right"))
+            return np.flatnonzero(self.ends_ms[:stop] >= start_ms)
+        return np.flatnonzero((self.starts_ms <= end_ms) & (self.ends_ms >= start_ms))
+
+    def range(self, start: float, end: float) -> List[Dict[str, Any]]:
+        """取与 [start, end]（秒）有重叠的句子"""
+        return [self.sentence(int(index)) for index in self.range_indices(start, end)]
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for index in range(len(self)):
+            yield self.sentence(index)
+
+    def to_sentences(self) -> List[Dict[str, Any]]:
+        """解码全部句子（时间戳批量格式化）"""
+        count = len(self)
+        stamps = format_timestamps_ms(np.concatenate([self.starts_ms, self.ends_ms]).astype(np.int64))
+        text = self._mmap[self._text_start:self._text_start + int(self._text_offsets[-1])]
+        offsets = self._text_offsets.tolist()
+        starts = self.starts_ms.tolist()
+        ends = self.ends_ms.tolist()
+        sentences = [
+            {
+                "id": sentence_id,
+                "text": text[offsets[i]:offsets[i + 1]].decode("utf-8"),
+                "start_time": starts[i] / 1000,
+                "end_time": ends[i] / 1000,
+                "start_timestamp": stamps[i],
+                "end_timestamp": stamps[count + i],
+                "duration": (ends[i] - starts[i]) / 1000,
+            }
+            for i, sentence_id in enumerate(self.ids.tolist())
+        ]
+        if self._extra_offsets is not None:
+            extra_offsets = self._extra_offsets.tolist()
+            for i, sentence in enumerate(sentences):
+                begin = self._extra_start + extra_offsets[i]
+                end = self._extra_start + extra_offsets[i + 1]
+                if end > begin:
+                    sentence.update(json.loads(self._mmap[begin:end].decode("utf-8")))
+        return sentences
+
+    def close(self):
+        # 先释放指向映射内存的数组，否则 mmap 无法关闭
+        self.ids = self.starts_ms = self.ends_ms = self._text_offsets = self._extra_offsets = None
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # 调用方仍持有 ids、starts_ms 等数组：只丢弃引用，映射在这些数组释放后随之释放
+                pass
+            self._mmap = None
+        self._file.close()
+
+
+def load_sentences(path: str) -> List[Dict[str, Any]]:
+    """读取转录文件（JSON 或二进制格式），返回 sentences 列表"""
+    if is_binary_transcript(path):
+        with BinaryTranscript(path) as transcript:
+            return transcript.to_sentences()
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f).get("sentences", [])
+
+
+def json_to_binary(json_path: str, output_path: str) -> int:
+    """
+    把转录 JSON 转换为二进制格式
+
+    Returns:
+        int: 写入的字节数
+    """
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    metadata = {key: value for key, value in data.items() if key not in ("total_sentences", "sentences")}
+    return write_document(output_path, encode_transcript(data.get("sentences", []), metadata))
+
+
+def binary_to_json(binary_path: str, output_path: str) -> int:
+    """
+    把二进制转录转换为 JSON（与 save_as_json 的格式相同，时间精确到毫秒）
+
+    Returns:
+        int: 写入的字节数
+    """
+    with BinaryTranscript(binary_path) as transcript:
+        data = {"total_sentences": len(transcript), "sentences": transcript.to_sentences()}
+        data.update(transcript.metadata)
+    return write_document(output_path, json.dumps(data, ensure_ascii=False, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="二进制转录格式：与JSON互相转换，按 id 或时间范围读取")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    to_bin = subparsers.add_parser("to-bin", help="JSON 转换为二进制格式")
+    to_bin.add_argument("input", help="转录JSON文件")
+    to_bin.add_argument("-o", "--output", help="输出路径（默认: 同名 .bin）")
+    to_json = subparsers.add_parser("to-json", help="二进制格式转换为 JSON")
+    to_json.add_argument("input", help="二进制转录文件")
+    to_json.add_argument("-o", "--output", help="输出路径（默认: 同名 .json）")
+    get_parser = subparsers.add_parser("get", help="按 id 或时间范围读取句子")
+    get_parser.add_argument("input", help="二进制转录文件")
+    get_parser.add_argument("--id", type=int, help="句子 id")
+    get_parser.add_argument("--start", type=float, help="开始时间（秒）")
+    get_parser.add_argument("--end", type=float, help="结束时间（秒）")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "to-bin":
+            output = args.output or os.path.splitext(args.input)[0] + ".bin"
+            size = json_to_binary(args.input, output)
+            print(f"已转换: {output}（{size} 字节，原文件 {os.path.getsize(args.input)} 字节）")
+        elif args.command == "to-json":
+            output = args.output or os.path.splitext(args.input)[0] + ".json"
+            size = binary_to_json(args.input, output)
+            print(f"已转换: {output}（{size} 字节）")
+        else:
+            with BinaryTranscript(args.input) as transcript:
+                if args.id is not None:
+                    sentences = [s for s in [transcript.get(args.id)] if s is not None]
+                else:
+                    start = args.start if args.start is not None else 0.0
+                    end = args.end if args.end is not None else float(MAX_UINT32) / 1000
+                    sentences = transcript.range(start, end)
+            print(json.dumps(sentences, ensure_ascii=False, indent=2))
+    except (OSError, ValueError) as e:
+        print(f"处理失败: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+转录结果全文索引
+将各视频的 <name>_transcript.json 增量导入本地 SQLite FTS5 索引，支持中文全文检索和时间范围查询
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import argparse
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+from transcript_binary import load_sentences
+
+# 连续的中日韩文字，或连续的字母数字
+TOKEN_PATTERN = re.compile(r"[㐀-䶿一-鿿]+|[0-9A-Za-z]+")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    ingested REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS paragraphs (
+    rowid INTEGER PRIMARY KEY,
+    video_id INTEGER NOT NULL REFERENCES videos(id),
+    sentence_id INTEGER NOT NULL,
+    start_ms INTEGER NOT NULL,
+    end_ms INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS paragraphs_time ON paragraphs(video_id, start_ms, end_ms);
+CREATE VIRTUAL TABLE IF NOT EXISTS paragraphs_fts USING fts5(bigrams, unigrams);
+"""
+
+
+def cjk_bigrams(text: str) -> List[str]:
+    """
+    中文按相邻两字切分（单字片段保留单字），字母数字按单词小写
+
+    Args:
+        text: 文本
+
+    Returns:
+        List[str]: 词元列表
+    """
+    tokens = []
+    for run in TOKEN_PATTERN.findall(text):
+        if run.isascii():
+            tokens.append(run.lower())
+        elif len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def cjk_unigrams(text: str) -> List[str]:
+    """单字词元，用于单字查询"""
+    tokens = []
+    for run in TOKEN_PATTERN.findall(text):
+        tokens.extend([run.lower()] if run.isascii() else list(run))
+    return tokens
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """
+    把用户查询转换为 FTS5 MATCH 表达式
+
+    空格分隔的多个词之间为 AND 关系；每个词按相同规则切分后作为短语匹配
+    """
+    clauses = []
+    for term in query.split():
+        if TOKEN_PATTERN.fullmatch(term) and not term.isascii() and len(term) == 1:
+            clauses.append(f'unigrams : "{term}"')
+            continue
+        tokens = cjk_bigrams(term)
+        if tokens:
+            phrase = " ".join(tokens).replace('"', '""')
+            clauses.append(f'bigrams : "{phrase}"')
+    return " AND ".join(clauses) if clauses else None
+
+
+def parse_date(value: Optional[str]) -> Optional[float]:
+    """把 YYYY-MM-DD 转换为时间戳"""
+    if not value:
+        return None
+    return datetime.strptime(value, "%Y-%m-%d").timestamp()
+
+
+class TranscriptIndex:
+    """转录结果索引"""
+
+    def __init__(self, db_path: str):
+        """
+        打开（必要时创建）索引数据库
+
+        Args:
+            db_path: SQLite 数据库文件路径
+        """
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path)
+        self._conn.executescript(SCHEMA)
+
+    def ingest_file(self, transcript_path: str, force: bool = False) -> int:
+        """
+        导入单个转录 JSON 文件；文件未变化（大小和修改时间相同）时跳过
+
+        Args:
+            transcript_path: 转录 JSON 文件路径
+            force: 是否强制重新导入
+
+        Returns:
+            int: 导入的段落数，跳过时为 0
+        """
+        path = os.path.abspath(transcript_path)
+        stat = os.stat(path)
+        row = self._conn.execute(
+            "SELECT id, mtime, size FROM videos WHERE path = ?", (path,)).fetchone()
+        if row is not None and not force and row[1] == stat.st_mtime and row[2] == stat.st_size:
+            return 0
+
+        sentences = load_sentences(path)
+
+        name = Path(path).stem
+        if name.endswith("_transcript"):
+            name = name[:-len("_transcript")]
+
+        with self._conn:
+            if row is not None:
+                self._delete_video(row[0])
+            cursor = self._conn.execute(
+                "INSERT INTO videos (path, name, mtime, size, ingested) VALUES (?, ?, ?, ?, ?)",
+                (path, name, stat.st_mtime, stat.st_size, time.time()))
+            video_id = cursor.lastrowid
+            for sentence in sentences:
+                text = sentence.get("text", "")
+                cursor = self._conn.execute(
+                    "INSERT INTO paragraphs (video_id, sentence_id, start_ms, end_ms, text) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (video_id, sentence.get("id", 0),
+                     int(round(sentence.get("start_time", 0) * 1000)),
+                     int(round(sentence.get("end_time", 0) * 1000)),
+                     text))
+                self._conn.execute(
+                    "INSERT INTO paragraphs_fts (rowid, bigrams, unigrams) VALUES (?, ?, ?)",
+                    (cursor.lastrowid, " ".join(cjk_bigrams(text)), " ".join(cjk_unigrams(text))))
+        return len(sentences)
+
+    def _delete_video(self, video_id: int):
+        self._conn.execute(
+            "DELETE FROM paragraphs_fts WHERE rowid IN (SELECT rowid FROM paragraphs WHERE video_id = ?)",
+            (video_id,))
+        self._conn.execute("DELETE FROM paragraphs WHERE video_id = ?", (video_id,))
+        self._conn.execute("DELETE FROM videos WHERE id = ?", (video_id,))
+
+    def ingest(self, paths: Iterable[str], force: bool = False) -> Dict[str, int]:
+        """
+        导入多个文件或目录（目录下递归查找 *_transcript.json）
+
+        Returns:
+            Dict: {"files", "skipped", "paragraphs"}
+        """
+        stats = {"files": 0, "skipped": 0, "paragraphs": 0}
+        for path in paths:
+            files = sorted(Path(path).rglob("*_transcript.json")) if os.path.isdir(path) else [path]
+            for file in files:
+                count = self.ingest_file(str(file), force)
+                if count:
+                    stats["files"] += 1
+                    stats["paragraphs"] += count
+                else:
+                    stats["skipped"] += 1
+        return stats
+
+    def remove_missing(self) -> int:
+        """删除源文件已不存在的视频"""
+        removed = 0
+        with self._conn:
+            for video_id, path in self._conn.execute("SELECT id, path FROM videos").fetchall():
+                if not os.path.exists(path):
+                    self._delete_video(video_id)
+                    removed += 1
+        return removed
+
+    def search(self, query: Optional[str] = None, video: Optional[str] = None,
+               start_ms: Optional[int] = None, end_ms: Optional[int] = None,
+               since: Optional[float] = None, until: Optional[float] = None,
+               limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        检索段落
+
+        Args:
+            query: 全文检索词，空格分隔表示同时包含
+            video: 只在指定视频名中查找
+            start_ms: 段落与该时间（毫秒）之后有重叠
+            end_ms: 段落与该时间（毫秒）之前有重叠
+            since: 只查找在该时间戳之后生成的转录
+            until: 只查找在该时间戳之前生成的转录
+            limit: 最多返回条数
+
+        Returns:
+            List[Dict]: {"video", "id", "start_ms", "end_ms", "text", "path"}
+        """
+        conditions, params = [], []
+        source = "paragraphs p JOIN videos v ON v.id = p.video_id"
+        order = "v.name, p.start_ms"
+
+        match = build_match_query(query) if query else None
+        if query and match is None:
+            return []
+        if match is not None:
+            source += " JOIN paragraphs_fts f ON f.rowid = p.rowid"
+            conditions.append("paragraphs_fts MATCH ?")
+            params.append(match)
+            order = "f.rank"
+        if video is not None:
+            conditions.append("v.name = ?")
+            params.append(video)
+        if start_ms is not None:
+            conditions.append("p.end_ms > ?")
+            params.append(start_ms)
+        if end_ms is not None:
+            conditions.append("p.start_ms < ?")
+            params.append(end_ms)
+        if since is not None:
+            conditions.append("v.mtime >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("v.mtime < ?")
+            params.append(until)
+
+        sql = (f"SELECT v.name, p.sentence_id, p.start_ms, p.end_ms, p.text, v.path FROM {source}"
+               + (f" WHERE {' AND '.join(conditions)}" if conditions else "")
+               + f" ORDER BY {order} LIMIT ?")
+        params.append(limit)
+        return [
+            {"video": name, "id": sid, "start_ms": start, "end_ms": end, "text": text, "path": path}
+            for name, sid, start, end, text, path in self._conn.execute(sql, params)
+        ]
+
+    def close(self):
+        self._conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="转录结果全文索引")
+    parser.add_argument("--db", default="transcripts.db", help="索引数据库路径（默认: transcripts.db）")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = subparsers.add_parser("ingest", help="导入转录JSON文件或目录")
+    ingest_parser.add_argument("paths", nargs="+", help="转录JSON文件或包含它们的目录")
+    ingest_parser.add_argument("--force", action="store_true", help="强制重新导入未变化的文件")
+    ingest_parser.add_argument("--prune", action="store_true", help="删除源文件已不存在的视频")
+
+    search_parser = subparsers.add_parser("search", help="检索段落")
+    search_parser.add_argument("query", nargs="?", help="检索词，空格分隔表示同时包含")
+    search_parser.add_argument("--video", help="只在指定视频中查找")
+    search_parser.add_argument("--start", type=float, help="时间范围起点（秒）")
+    search_parser.add_argument("--end", type=float, help="时间范围终点（秒）")
+    search_parser.add_argument("--since", help="只查找该日期之后的转录（YYYY-MM-DD）")
+    search_parser.add_argument("--until", help="只查找该日期之前的转录（YYYY-MM-DD）")
+    search_parser.add_argument("-n", "--limit", type=int, default=50, help="最多返回条数（默认: 50）")
+    search_parser.add_argument("--json", action="store_true", help="以JSON格式输出")
+
+    args = parser.parse_args()
+    index = TranscriptIndex(args.db)
+
+    try:
+        if args.command == "ingest":
+            stats = index.ingest(args.paths, force=args.force)
+            print(f"导入 {stats['files']} 个文件，{stats['paragraphs']} 个段落；跳过未变化文件 {stats['skipped']} 个")
+            if args.prune:
+                print(f"删除已不存在的视频 {index.remove_missing()} 个")
+        else:
+            results = index.search(
+                args.query, video=args.video,
+                start_ms=int(args.start * 1000) if args.start is not None else None,
+                end_ms=int(args.end * 1000) if args.end is not None else None,
+                since=parse_date(args.since), until=parse_date(args.until),
+                limit=args.limit)
+            if args.json:
+                print(json.dumps(results, ensure_ascii=False, indent=2))
+            else:
+                for item in results:
+                    print(f"[{item['video']} #{item['id']} {item['start_ms']}ms-{item['end_ms']}ms] "
+                          f"{item['text'][:60]}")
+                print(f"共 {len(results)} 条结果")
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"操作失败: {e}")
+        sys.exit(1)
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+转录结果批量渲染
+以整数毫秒批量格式化时间戳，并一次性生成完整的 JSON/TXT/SRT/VTT/JSONL 文档
+"""
+
+import os
+import json
+import math
+import time
+import threading
+from json.encoder import encode_basestring
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Iterable, Union
+import numpy as np
+
+# 预先生成的数字查找表，避免逐个调用 f-string 格式化
+_TWO_DIGITS = [f"{i:02d}" for i in range(100)]
+_THREE_DIGITS = [f"{i:03d}" for i in range(1000)]
+
+TXT_HEADER = "视频语音转文字结果\n" + "=" * 50 + "\n\n"
+
+
+def seconds_to_ms(seconds: Iterable[float]) -> np.ndarray:
+    """
+    将秒数批量转换为整数毫秒
+
+    Args:
+        seconds: 秒数序列
+
+    Returns:
+        np.ndarray: int64 毫秒数组
+    """
+    return np.rint(np.asarray(seconds, dtype=np.float64) * 1000).astype(np.int64)
+
+
+def _join_timestamps(hours: np.ndarray, minutes: np.ndarray, second_ms: np.ndarray,
+                     separator: str) -> List[str]:
+    """把时、分、秒内毫秒数组拼接为时间戳字符串"""
+    secs, millis = np.divmod(second_ms.astype(np.int64), 1000)
+    two = _TWO_DIGITS
+    three = _THREE_DIGITS
+    return [
+        (two[h] if h < 100 else str(h)) + ":" + two[m] + ":" + two[s] + separator + three[f]
+        for h, m, s, f in zip(hours.astype(np.int64).tolist(), minutes.astype(np.int64).tolist(),
+                              secs.tolist(), millis.tolist())
+    ]
+
+
+def format_timestamps_ms(ms: Iterable[int], separator: str = ".") -> List[str]:
+    """
+    批量将整数毫秒格式化为时间戳 (HH:MM:SS.mmm)
+
+    Args:
+        ms: 整数毫秒序列
+        separator: 秒与毫秒之间的分隔符，SRT 使用 ","
+
+    Returns:
+        List[str]: 格式化后的时间戳列表
+    """
+    ms = np.asarray(ms, dtype=np.int64)
+    hours, rest = np.divmod(ms, 3600000)
+    minutes, second_ms = np.divmod(rest, 60000)
+    return _join_timestamps(hours, minutes, second_ms, separator)
+
+
+def format_timestamps(seconds: Iterable[float], separator: str = ".") -> List[str]:
+    """
+    批量将秒数格式化为时间戳，结果与 VideoToTextConverter.format_timestamp 逐字节一致
+
+    时、分按浮点秒数取整，秒字段四舍五入到毫秒后作为整数处理，
+    因此保留了原实现在 59.9995 秒附近输出 "60.000" 的行为
+
+    Args:
+        seconds: 秒数序列
+        separator: 秒与毫秒之间的分隔符，SRT 使用 ","
+
+    Returns:
+        List[str]: 格式化后的时间戳列表
+    """
+    seconds = np.asarray(seconds, dtype=np.float64)
+    hours = np.floor_divide(seconds, 3600)
+    minutes = np.floor_divide(np.mod(seconds, 3600), 60)
+    secs = np.mod(seconds, 60)
+    scaled = secs * 1000
+    second_ms = np.rint(scaled)
+
+    # 乘以1000会引入舍入误差，接近半毫秒的值按 f-string 的十进制舍入结果逐个修正
+    near_half = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+    for i in near_half.tolist():
+        second_ms[i] = round(float(f"{secs[i]:.3f}") * 1000)
+
+    return _join_timestamps(hours, minutes, second_ms, separator)
+
+
+def _sentence_timestamps(sentences: List[Dict[str, Any]]):
+    """批量格式化所有句子的开始、结束时间戳（"." 分隔）"""
+    stamps = format_timestamps(
+        [s["start_time"] for s in sentences] + [s["end_time"] for s in sentences]
+    )
+    return stamps[:len(sentences)], stamps[len(sentences):]
+
+
+def _to_comma(stamps: List[str]) -> List[str]:
+    """把 "HH:MM:SS.mmm" 格式的时间戳转为 SRT 使用的逗号分隔格式"""
+    return [stamp[:-4] + "," + stamp[-3:] for stamp in stamps]
+
+
+def render_txt(sentences: List[Dict[str, Any]], timestamps=None) -> str:
+    """生成完整的 TXT 文档，内容与 save_as_txt 逐字节一致"""
+    starts, ends = timestamps or _sentence_timestamps(sentences)
+    parts = [TXT_HEADER]
+    parts.extend(
+        f"[{start} --> {end}]\n{sentence['text']}\n\n"
+        for start, end, sentence in zip(starts, ends, sentences)
+    )
+    return "".join(parts)
+
+
+def render_srt(sentences: List[Dict[str, Any]], timestamps=None) -> str:
+    """生成完整的 SRT 文档，内容与 save_as_srt 逐字节一致"""
+    starts, ends = timestamps or _sentence_timestamps(sentences)
+    return "".join(
+        f"{i}\n{start} --> {end}\n{sentence['text']}\n\n"
+        for i, (start, end, sentence) in enumerate(zip(_to_comma(starts), _to_comma(ends), sentences), 1)
+    )
+
+
+def render_vtt(sentences: List[Dict[str, Any]], timestamps=None) -> str:
+    """生成 WebVTT 字幕文档"""
+    starts, ends = timestamps or _sentence_timestamps(sentences)
+    parts = ["WEBVTT\n\n"]
+    parts.extend(
+        f"{start} --> {end}\n{sentence['text']}\n\n"
+        for start, end, sentence in zip(starts, ends, sentences)
+    )
+    return "".join(parts)
+
+
+def render_jsonl(sentences: List[Dict[str, Any]], timestamps=None) -> str:
+    """生成 JSON Lines 文档，每行一个句子"""
+    return "".join(json.dumps(sentence, ensure_ascii=False) + "\n" for sentence in sentences)
+
+
+def _encode_scalar(value: Any) -> str:
+    """按 json 模块的规则编码标量，不支持的类型抛出 TypeError"""
+    if isinstance(value, str):
+        return encode_basestring(value)
+    if value is None:
+        return "null"
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    if isinstance(value, int):
+        return int.__repr__(value)
+    if isinstance(value, float):
+        if value != value:
+            return "NaN"
+        if value in (float("inf"), float("-inf")):
+            return "Infinity" if value > 0 else "-Infinity"
+        return float.__repr__(value)
+    raise TypeError(type(value).__name__)
+
+
+def _encode_column(values: List[Any]) -> List[str]:
+    """按列编码同一字段的所有值，类型单一时直接使用内置的 repr/编码函数"""
+    kinds = set(map(type, values))
+    if kinds == {str}:
+        return list(map(encode_basestring, values))
+    if kinds == {int}:
+        return list(map(int.__repr__, values))
+    if kinds == {float} and all(map(math.isfinite, values)):
+        return list(map(float.__repr__, values))
+    return list(map(_encode_scalar, values))
+
+
+def render_json(sentences: List[Dict[str, Any]], timestamps=None) -> str:
+    """
+    生成完整的 JSON 文档，内容与 save_as_json（indent=2, ensure_ascii=False）逐字节一致
+
+    所有句子字段相同且均为标量时按列编码后直接拼接字符串，否则退回 json.dumps
+    """
+    keys = list(sentences[0]) if sentences else []
+    if not keys or any(list(sentence) != keys for sentence in sentences):
+        return json.dumps({"total_sentences": len(sentences), "sentences": sentences},
+                          ensure_ascii=False, indent=2)
+
+    try:
+        columns = [_encode_column([sentence[key] for sentence in sentences]) for key in keys]
+    except TypeError:
+        return json.dumps({"total_sentences": len(sentences), "sentences": sentences},
+                          ensure_ascii=False, indent=2)
+
+    template = (
+        "    {{\n"
+        + ",\n".join(
+            "      " + encode_basestring(str(key)).replace("{", "{{").replace("}", "}}") + ": {}"
+            for key in keys
+        )
+        + "\n    }}"
+    )
+    blocks = map(template.format, *columns)
+
+    return (
+        "{\n"
+        f'  "total_sentences": {len(sentences)},\n'
+        '  "sentences": [\n'
+        + ",\n".join(blocks)
+        + "\n  ]\n}"
+    )
+
+
+def render_binary(sentences: List[Dict[str, Any]], timestamps=None) -> bytes:
+    """生成紧凑二进制转录（格式见 transcript_binary.py）"""
+    from transcript_binary import encode_transcript
+    return encode_transcript(sentences)
+
+
+RENDERERS = {
+    "json": render_json,
+    "txt": render_txt,
+    "srt": render_srt,
+    "vtt": render_vtt,
+    "jsonl": render_jsonl,
+    "bin": render_binary,
+}
+
+SUPPORTED_FORMATS = tuple(RENDERERS)
+
+
+def write_document(output_path: str, content: Union[str, bytes]) -> int:
+    """
+    一次性写入整个文档（文本按 UTF-8 编码），先写入同目录临时文件再原子重命名
+
+    Returns:
+        int: 写入的字节数
+    """
+    data = content if isinstance(content, bytes) else content.encode("utf-8")
+    # 临时文件名包含进程和线程 id：本地服务在线程池中并发执行任务，同一输出可能被同时写入
+    tmp_path = f"{output_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return len(data)
+
+
+def export_documents(sentences: List[Dict[str, Any]], output_paths: Dict[str, str],
+                     max_workers: int = None) -> Dict[str, Dict[str, Any]]:
+    """
+    一次遍历句子数据，并发渲染并写出多种格式
+
+    时间戳只格式化一次，由所有格式共用；每种格式在独立线程中渲染和写入，
+    单个格式失败不影响其他格式
+
+    Args:
+        sentences: 句子列表
+        output_paths: 格式到输出路径的映射，如 {"json": "a_transcript.json"}
+        max_workers: 最大并发线程数，默认为格式数量
+
+    Returns:
+        Dict: 每种格式的导出报告 {"path", "bytes", "seconds", "error"}
+    """
+    timestamps = _sentence_timestamps(sentences)
+
+    def export_one(format_type: str, output_path: str) -> Dict[str, Any]:
+        start = time.perf_counter()
+        report = {"path": output_path, "bytes": 0, "seconds": 0.0, "error": None}
+        try:
+            renderer = RENDERERS.get(format_type)
+            if renderer is None:
+                raise ValueError(f"不支持的输出格式: {format_type}")
+            report["bytes"] = write_document(output_path, renderer(sentences, timestamps))
+        except Exception as e:
+            report["error"] = str(e)
+        report["seconds"] = time.perf_counter() - start
+        return report
+
+    if not output_paths:
+        return {}
+    with ThreadPoolExecutor(max_workers=max_workers or len(output_paths)) as executor:
+        futures = {
+            format_type.lower(): executor.submit(export_one, format_type.lower(), output_path)
+            for format_type, output_path in output_paths.items()
+        }
+        return {format_type: future.result() for format_type, future in futures.items()}
@@ -8,34 +8,67 @@
 import os
 import sys
 import json
+import time
+import sqlite3
 import argparse
+import threading
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple, Union
+import numpy as np
 import whisper
-from moviepy.editor import VideoFileClip
 import torch
+from transcript_render import (format_timestamps, render_json, render_txt, render_srt,
+                               write_document, export_documents, SUPPORTED_FORMATS)
+from transcript_index import TranscriptIndex
+from audio_fingerprint import FingerprintIndex, load_wav, fingerprint_audio, uncovered_spans
+
+# 与 video_clipper 共用异步 ffmpeg 执行器和分阶段性能分析器
+CLIPPER_DIR = Path(__file__).resolve().parent.parent / "video_clipper"
+if str(CLIPPER_DIR) not in sys.path:
+    sys.path.insert(0, str(CLIPPER_DIR))
+from ffmpeg_runner import FFmpegRunner
+from stage_profiler import StageProfiler
+from source_probe import file_fingerprint
+
+# 分块转录时，在名义切点前后该范围内寻找最安静的位置作为实际切点，避免把词切断
+CHUNK_SEARCH_SECONDS = 30.0
+# 计算音量时的帧长（秒）
+CHUNK_FRAME_SECONDS = 0.1
 
 class VideoToTextConverter:
-    def __init__(self, model_size: str = "base"):
+    # 级联复核使用的大模型，按模型大小缓存
+    _escalation_models: Dict[str, Any] = {}
+    _escalation_lock = threading.Lock()
+    
+    def __init__(self, model_size: str = "base", ffmpeg_timeout: float = None, device: str = None):
         """
         初始化视频转文字转换器
         
         Args:
             model_size: Whisper模型大小 ("tiny", "base", "small", "medium", "large")
+            ffmpeg_timeout: 音频提取的超时（秒），None 表示不限
+            device: 模型所在设备（如 "cpu"、"cuda"），None 表示有 GPU 时使用 GPU
         """
         self.model_size = model_size
+        self.device = device
         self.model = None
+        self.ffmpeg = FFmpegRunner(timeout=ffmpeg_timeout)
         self.load_model()
     
     def load_model(self):
-        """加载Whisper模型"""
+        """
+        加载Whisper模型
+
+        Raises:
+            RuntimeError: 模型加载失败（由调用方决定退出进程还是只让当前任务失败）
+        """
         try:
             print(f"正在加载 Whisper {self.model_size} 模型...")
-            self.model = whisper.load_model(self.model_size)
+            self.model = whisper.load_model(self.model_size, device=self.device)
             print("模型加载完成")
         except Exception as e:
             print(f"模型加载失败: {e}")
-            sys.exit(1)
+            raise RuntimeError(f"Whisper {self.model_size} 模型加载失败: {e}") from e
     
     def extract_audio_from_video(self, video_path: str, audio_path: str) -> bool:
         """
@@ -51,23 +84,25 @@ class VideoToTextConverter:
         try:
             print(f"正在从视频文件提取音频: {video_path}")
             
-            # 加载视频文件
-            video = VideoFileClip(video_path)
+            # 直接输出 Whisper 使用的 16kHz 单声道 WAV
+            result = self.ffmpeg.run_sync([
+                '-i', video_path,
+                '-vn',
+                '-ac', '1',
+                '-ar', str(whisper.audio.SAMPLE_RATE),
+                '-c:a', 'pcm_s16le',
+                '-y', audio_path
+            ], name=os.path.basename(audio_path))
             
-            # 提取音频
-            audio = video.audio
-            
-            # 保存为WAV格式（Whisper支持的格式）
-            audio.write_audiofile(audio_path, verbose=False, logger=None)
-            
-            # 清理资源
-            audio.close()
-            video.close()
+            if result["status"] != "ok":
+                print(f"音频提取失败（{result['status']}）: {result['stderr']}")
+                return False
             
-            print(f"音频提取完成: {audio_path}")
+            speed = f"，{result['speed']:.0f}x" if result["speed"] else ""
+            print(f"音频提取完成: {audio_path}（{result['seconds']:.1f}s{speed}）")
             return True
             
-        except Exception as e:
+        except OSError as e:
             print(f"音频提取失败: {e}")
             return False
     
@@ -99,6 +134,550 @@ class VideoToTextConverter:
             print(f"语音识别失败: {e}")
             return {}
     
+    def plan_chunk_boundaries(self, audio: np.ndarray, sample_rate: int,
+                              chunk_duration: float) -> List[int]:
+        """
+        规划分块切点：在每个名义切点前后 CHUNK_SEARCH_SECONDS 内选音量最低的帧作为切点
+
+        Returns:
+            List[int]: 各块的起止采样点，首项为 0，末项为音频长度
+        """
+        chunk_samples = int(chunk_duration * sample_rate)
+        frame = max(1, int(CHUNK_FRAME_SECONDS * sample_rate))
+        search = int(CHUNK_SEARCH_SECONDS * sample_rate)
+        boundaries = [0]
+        nominal = chunk_samples
+        while nominal < len(audio):
+            # 搜索范围不越过上一个切点之后的半块，保证每块都有实际长度
+            begin = max(nominal - search, boundaries[-1] + chunk_samples // 2)
+            end = min(nominal + search, len(audio))
+            cut = nominal
+            if end - begin >= frame:
+                frames = audio[begin:begin + (end - begin) // frame * frame].reshape(-1, frame)
+                energy = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+                cut = begin + int(np.argmin(energy)) * frame + frame // 2
+            if len(audio) - cut < frame:
+                break
+            boundaries.append(cut)
+            nominal = cut + chunk_samples
+        boundaries.append(len(audio))
+        return boundaries
+
+    def read_checkpoint(self, checkpoint_path: str) -> Dict[str, Any]:
+        """读取检查点，不存在或损坏时返回空字典"""
+        if not os.path.exists(checkpoint_path):
+            return {}
+        try:
+            with open(checkpoint_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def transcribe_audio_checkpointed(self, audio_path: str, checkpoint_path: str,
+                                      chunk_duration: float = 600.0,
+                                      source: Optional[str] = None) -> Dict[str, Any]:
+        """
+        分块转录音频，每完成一块即写入检查点文件，中断后可从最后完成的块继续
+
+        块的切点落在名义切点附近最安静的位置，并随检查点保存；每块以上一块的文字作为提示
+        （与 Whisper 在块内沿用前文的方式相同），因此恢复运行与不中断运行的结果一致。
+
+        Args:
+            audio_path: 音频文件路径
+            checkpoint_path: 检查点文件路径
+            chunk_duration: 每块音频的名义时长（秒）
+            source: 源视频的文件指纹，与检查点中记录的不同时放弃检查点重新开始
+
+        Returns:
+            Dict: 与 transcribe_audio 相同结构的转录结果
+        """
+        try:
+            audio = whisper.load_audio(audio_path)
+            sample_rate = whisper.audio.SAMPLE_RATE
+
+            state = {
+                "source": source,
+                "model_size": self.model_size,
+                "chunk_duration": chunk_duration,
+                "num_samples": len(audio),
+                "boundaries": [],
+                "chunks": []
+            }
+            saved = self.read_checkpoint(checkpoint_path)
+            if saved and all(saved.get(key) == state[key]
+                             for key in ("source", "model_size", "chunk_duration", "num_samples")) \
+                    and saved.get("boundaries"):
+                state["boundaries"] = saved["boundaries"]
+                state["chunks"] = saved.get("chunks", [])
+                print(f"从检查点恢复: 已完成 {len(state['chunks'])}/{len(state['boundaries']) - 1} 块")
+            else:
+                if saved:
+                    print("检查点与当前任务不匹配，重新开始转录")
+                state["boundaries"] = self.plan_chunk_boundaries(audio, sample_rate, chunk_duration)
+            self.write_checkpoint(state, checkpoint_path)
+
+            boundaries = state["boundaries"]
+            total_chunks = len(boundaries) - 1
+            for index in range(len(state["chunks"]), total_chunks):
+                offset = boundaries[index] / sample_rate
+                prompt = state["chunks"][-1]["text"].strip() if state["chunks"] else ""
+                print(f"正在进行语音识别: 第 {index + 1}/{total_chunks} 块")
+                result = self.model.transcribe(
+                    audio[boundaries[index]:boundaries[index + 1]],
+                    language="zh",
+                    word_timestamps=True,
+                    initial_prompt=prompt or None,
+                    verbose=False
+                )
+
+                segments = []
+                for segment in result.get("segments", []):
+                    segment = dict(segment)
+                    segment["start"] = segment.get("start", 0) + offset
+                    segment["end"] = segment.get("end", 0) + offset
+                    if "words" in segment:
+                        segment["words"] = [
+                            dict(word, start=word["start"] + offset, end=word["end"] + offset)
+                            for word in segment["words"]
+                        ]
+                    segment.pop("tokens", None)
+                    segments.append(segment)
+
+                state["chunks"].append({
+                    "index": index,
+                    "offset": offset,
+                    "text": result.get("text", ""),
+                    "segments": segments
+                })
+                self.write_checkpoint(state, checkpoint_path)
+
+            segments = []
+            for chunk in state["chunks"]:
+                for segment in chunk["segments"]:
+                    segments.append(dict(segment, id=len(segments)))
+
+            print("语音识别完成")
+            return {
+                "text": "".join(chunk["text"] for chunk in state["chunks"]),
+                "segments": segments,
+                "language": "zh"
+            }
+
+        except Exception as e:
+            print(f"语音识别失败: {e}")
+            return {}
+
+    def get_escalation_model(self, model_size: str):
+        """
+        获取级联复核使用的模型，按模型大小缓存并在所有转换器实例间共享
+        
+        Args:
+            model_size: Whisper模型大小
+            
+        Returns:
+            Whisper模型
+        """
+        if model_size == self.model_size:
+            return self.model
+        with VideoToTextConverter._escalation_lock:
+            if model_size not in VideoToTextConverter._escalation_models:
+                print(f"正在加载复核模型 Whisper {model_size}...")
+                VideoToTextConverter._escalation_models[model_size] = whisper.load_model(model_size, device=self.device)
+            return VideoToTextConverter._escalation_models[model_size]
+
+    def find_weak_spans(self, segments: List[Dict[str, Any]], duration: float,
+                        logprob_threshold: float = -0.8,
+                        compression_threshold: float = 2.4,
+                        no_speech_threshold: float = 0.6,
+                        padding: float = 0.5) -> List[Dict[str, Any]]:
+        """
+        找出置信度低的语句，把相邻的低置信语句合并为需要重新解码的音频区间
+
+        平均对数概率过低或压缩比过高（重复输出）的语句视为低置信；
+        no_speech_prob 高且对数概率低的语句是静音，与 Whisper 的判断一致，不复核。
+        区间向两侧扩展 padding 秒，但不会覆盖相邻的高置信语句。
+
+        Args:
+            segments: 转录结果中的语句
+            duration: 音频总时长（秒）
+            logprob_threshold: 平均对数概率阈值
+            compression_threshold: 压缩比阈值
+            no_speech_threshold: 静音概率阈值
+            padding: 区间两侧扩展的秒数
+
+        Returns:
+            List[Dict]: {"start", "end", "indices"}，indices 为区间内语句的下标
+        """
+        spans = []
+        for index, segment in enumerate(segments):
+            logprob = segment.get("avg_logprob", 0.0)
+            silent = segment.get("no_speech_prob", 0.0) > no_speech_threshold and logprob < -1.0
+            weak = logprob < logprob_threshold or segment.get("compression_ratio", 0.0) > compression_threshold
+            if not weak or silent:
+                continue
+            if spans and spans[-1]["indices"][-1] == index - 1:
+                spans[-1]["indices"].append(index)
+            else:
+                spans.append({"indices": [index]})
+
+        for span in spans:
+            first, last = span["indices"][0], span["indices"][-1]
+            lower = segments[first - 1]["end"] if first > 0 else 0.0
+            upper = segments[last + 1]["start"] if last + 1 < len(segments) else duration
+            span["start"] = max(lower, segments[first]["start"] - padding, 0.0)
+            span["end"] = min(upper, segments[last]["end"] + padding, duration)
+        return spans
+
+    def refine_low_confidence(self, audio_path: str, result: Dict[str, Any],
+                              model_size: str = "small",
+                              logprob_threshold: float = -0.8,
+                              compression_threshold: float = 2.4) -> Dict[str, Any]:
+        """
+        级联识别：只用更大的模型重新解码低置信度的音频区间，并把结果拼回原转录
+
+        Args:
+            audio_path: 音频文件路径
+            result: 快速模型的转录结果
+            model_size: 复核使用的模型大小
+            logprob_threshold: 平均对数概率阈值
+            compression_threshold: 压缩比阈值
+
+        Returns:
+            Dict: 拼接后的转录结果，cascade 字段为复核统计；失败时返回原结果
+        """
+        try:
+            start = time.perf_counter()
+            audio = whisper.load_audio(audio_path)
+            sample_rate = whisper.audio.SAMPLE_RATE
+            duration = len(audio) / sample_rate
+            segments = result.get("segments", [])
+            spans = self.find_weak_spans(segments, duration, logprob_threshold, compression_threshold)
+
+            stats = {
+                "model": self.model_size,
+                "escalation_model": model_size,
+                "segments": len(segments),
+                "weak_segments": sum(len(span["indices"]) for span in spans),
+                "spans": len(spans),
+                "audio_seconds": duration,
+                "escalated_seconds": sum(span["end"] - span["start"] for span in spans),
+            }
+            stats["escalated_fraction"] = stats["escalated_seconds"] / duration if duration else 0.0
+            print(f"低置信语句 {stats['weak_segments']}/{len(segments)} 个，"
+                  f"需复核音频 {stats['escalated_seconds']:.1f}s（{stats['escalated_fraction'] * 100:.1f}%）")
+
+            replacements = {}
+            if spans:
+                model = self.get_escalation_model(model_size)
+                for number, span in enumerate(spans, 1):
+                    print(f"正在复核: 第 {number}/{len(spans)} 段 "
+                          f"{self.format_timestamp(span['start'])}-{self.format_timestamp(span['end'])}")
+                    offset = span["start"]
+                    refined = model.transcribe(
+                        audio[int(offset * sample_rate):int(span["end"] * sample_rate)],
+                        language="zh",
+                        word_timestamps=True,
+                        verbose=False
+                    )
+                    new_segments = []
+                    for segment in refined.get("segments", []):
+                        if not segment.get("text", "").strip():
+                            continue
+                        segment = dict(segment)
+                        segment["start"] = min(segment.get("start", 0) + offset, span["end"])
+                        segment["end"] = min(segment.get("end", 0) + offset, span["end"])
+                        if "words" in segment:
+                            segment["words"] = [
+                                dict(word, start=min(word["start"] + offset, span["end"]),
+                                     end=min(word["end"] + offset, span["end"]))
+                                for word in segment["words"]
+                            ]
+                        segment.pop("tokens", None)
+                        segment["escalated"] = True
+                        new_segments.append(segment)
+                    # 大模型判断为静音时保留原结果
+                    if new_segments:
+                        replacements[span["indices"][0]] = (span["indices"], new_segments)
+
+            merged = []
+            skip = set()
+            for index, segment in enumerate(segments):
+                if index in replacements:
+                    indices, new_segments = replacements[index]
+                    skip.update(indices)
+                    merged.extend(new_segments)
+                elif index not in skip:
+                    merged.append(segment)
+            merged = [dict(segment, id=i) for i, segment in enumerate(merged)]
+
+            stats["replaced_spans"] = len(replacements)
+            stats["seconds"] = time.perf_counter() - start
+            print(f"复核完成，替换 {len(replacements)} 段，用时 {stats['seconds']:.1f}s")
+            return dict(result,
+                        text="".join(segment.get("text", "") for segment in merged),
+                        segments=merged,
+                        cascade=stats)
+
+        except Exception as e:
+            print(f"级联复核失败，保留原识别结果: {e}")
+            return result
+
+    def transcribe_with_fingerprints(self, video_path: str, audio_path: str,
+                                     fingerprint_db: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        用音频指纹匹配已转录的源文件：匹配区间复用源文件的转录（时间按偏移平移），
+        只对未匹配的区间做语音识别
+
+        Args:
+            video_path: 视频文件路径（与自身路径相同的旧记录不参与匹配）
+            audio_path: 已提取的音频文件路径
+            fingerprint_db: 指纹索引数据库路径
+
+        Returns:
+            Tuple: (转录结果, 指纹)；没有匹配时转录结果为空字典，指纹计算失败时两者都为空
+        """
+        try:
+            samples, sample_rate = load_wav(audio_path)
+            fingerprint = fingerprint_audio(samples, sample_rate)
+            index = FingerprintIndex(fingerprint_db)
+            try:
+                regions = index.match(fingerprint, exclude_path=video_path)
+                reused = [segment for region in regions for segment in index.reuse_segments(region)]
+            finally:
+                index.close()
+        except (OSError, ValueError, sqlite3.Error) as e:
+            print(f"音频指纹匹配失败，完整识别: {e}")
+            return {}, {}
+
+        print(f"音频指纹: {len(fingerprint['hashes'])} 个哈希，用时 {fingerprint['seconds']:.1f}s")
+        if not reused:
+            print("未匹配到已转录的源文件")
+            return {}, fingerprint
+
+        for region in regions:
+            print(f"匹配: {self.format_timestamp(region['start'])}-{self.format_timestamp(region['end'])} "
+                  f"-> {region['path']}（偏移 {region['offset']:+.2f}s）")
+
+        # 匹配区间以实际复用的语句为准，边界处被截断的语句连同空隙一起重新识别
+        covered = []
+        for region in regions:
+            inside = [s for s in reused if region["start"] - 1 <= s["start"] and s["end"] <= region["end"] + 1]
+            if inside:
+                covered.append((min(s["start"] for s in inside), max(s["end"] for s in inside)))
+        duration = fingerprint["duration"]
+        gaps = uncovered_spans(duration, covered)
+
+        segments = list(reused)
+        for number, (start, end) in enumerate(gaps, 1):
+            print(f"正在识别未匹配区间: 第 {number}/{len(gaps)} 段 "
+                  f"{self.format_timestamp(start)}-{self.format_timestamp(end)}")
+            partial = self.model.transcribe(
+                samples[int(start * sample_rate):int(end * sample_rate)],
+                language="zh",
+                word_timestamps=True,
+                verbose=False
+            )
+            for segment in partial.get("segments", []):
+                if not segment.get("text", "").strip():
+                    continue
+                segment = dict(segment)
+                segment["start"] = min(segment.get("start", 0) + start, end)
+                segment["end"] = min(segment.get("end", 0) + start, end)
+                if "words" in segment:
+                    # 词时间与语句一样平移后限制在语句范围内
+                    low, high = segment["start"], segment["end"]
+                    segment["words"] = [
+                        dict(word, start=min(max(word["start"] + start, low), high),
+                             end=min(max(word["end"] + start, low), high))
+                        for word in segment["words"]
+                    ]
+                segment.pop("tokens", None)
+                segments.append(segment)
+
+        segments.sort(key=lambda segment: segment["start"])
+        segments = [dict(segment, id=i) for i, segment in enumerate(segments)]
+        transcribed = sum(end - start for start, end in gaps)
+        stats = {
+            "sources": sorted({region["path"] for region in regions}),
+            "regions": regions,
+            "reused_segments": len(reused),
+            "audio_seconds": duration,
+            "transcribed_seconds": transcribed,
+            "reused_fraction": 1 - transcribed / duration if duration else 0.0,
+        }
+        print(f"复用 {len(reused)} 个语句，识别 {transcribed:.1f}s / {duration:.1f}s 音频"
+              f"（复用 {stats['reused_fraction'] * 100:.1f}%）")
+        return {
+            "text": "".join(segment.get("text", "") for segment in segments),
+            "segments": segments,
+            "language": "zh",
+            "fingerprint": stats,
+        }, fingerprint
+
+    def register_fingerprint(self, fingerprint_db: str, video_path: str,
+                             fingerprint: Dict[str, Any], result: Dict[str, Any]) -> bool:
+        """
+        把文件的指纹和转录语句登记到指纹索引（登记失败不影响转换结果）
+
+        Returns:
+            bool: 是否成功登记
+        """
+        try:
+            index = FingerprintIndex(fingerprint_db)
+            try:
+                index.add(video_path, fingerprint, result.get("segments", []))
+            finally:
+                index.close()
+            print(f"已登记音频指纹: {fingerprint_db}")
+            return True
+        except (OSError, ValueError, sqlite3.Error) as e:
+            print(f"登记音频指纹失败: {e}")
+            return False
+
+    def transcribe_batch(self, audio_inputs: List[Union[str, Any]],
+                         batch_size: int = 8) -> List[Dict[str, Any]]:
+        """
+        批量转录多个短音频，将各输入切成30秒窗口后拼成批次，一次前向计算多个窗口
+
+        适用于大量30-90秒的短视频，可以摊薄逐个调用 transcribe 的额外开销。
+        与 transcribe 相比不做温度回退和按时间戳滑窗，窗口边界处的句子可能被截断。
+
+        Args:
+            audio_inputs: 音频文件路径或16kHz单声道波形数组的列表
+            batch_size: 每批解码的窗口数
+
+        Returns:
+            List[Dict]: 与输入一一对应的转录结果，结构与 transcribe_audio 相同
+        """
+        try:
+            sample_rate = whisper.audio.SAMPLE_RATE
+            window_samples = whisper.audio.N_SAMPLES
+            time_precision = whisper.audio.HOP_LENGTH * 2 / sample_rate
+            n_mels = getattr(self.model.dims, "n_mels", 80)
+            tokenizer = whisper.tokenizer.get_tokenizer(
+                self.model.is_multilingual,
+                num_languages=getattr(self.model, "num_languages", 99),
+                language="zh",
+                task="transcribe"
+            )
+            options = whisper.DecodingOptions(
+                language="zh",
+                without_timestamps=False,
+                fp16=self.model.device.type == "cuda"
+            )
+
+            # 切分窗口: (输入序号, 窗口起始秒数, 窗口时长, 波形)
+            windows = []
+            for index, audio in enumerate(audio_inputs):
+                if isinstance(audio, str):
+                    audio = whisper.load_audio(audio)
+                for start in range(0, max(len(audio), 1), window_samples):
+                    chunk = audio[start:start + window_samples]
+                    windows.append((index, start / sample_rate, len(chunk) / sample_rate, chunk))
+
+            results = [{"text": "", "segments": [], "language": "zh"} for _ in audio_inputs]
+
+            for batch_start in range(0, len(windows), batch_size):
+                batch = windows[batch_start:batch_start + batch_size]
+                mel = torch.stack([
+                    whisper.log_mel_spectrogram(whisper.pad_or_trim(torch.as_tensor(chunk)), n_mels=n_mels)
+                    for _, _, _, chunk in batch
+                ]).to(self.model.device)
+
+                with torch.no_grad():
+                    decoded = whisper.decode(self.model, mel, options)
+
+                for (index, offset, window_duration, _), decoding in zip(batch, decoded):
+                    # 与 transcribe 相同的静音判断
+                    if decoding.no_speech_prob > 0.6 and decoding.avg_logprob < -1.0:
+                        continue
+                    result = results[index]
+                    for start, end, text_tokens in self.split_timestamped_tokens(
+                            decoding.tokens, tokenizer, time_precision, window_duration):
+                        text = tokenizer.decode(text_tokens)
+                        result["segments"].append({
+                            "id": len(result["segments"]),
+                            "start": offset + start,
+                            "end": offset + min(end, window_duration),
+                            "text": text,
+                            "avg_logprob": decoding.avg_logprob,
+                            "no_speech_prob": decoding.no_speech_prob,
+                            "compression_ratio": decoding.compression_ratio
+                        })
+                        result["text"] += text
+
+            return results
+
+        except Exception as e:
+            print(f"批量语音识别失败: {e}")
+            return [{} for _ in audio_inputs]
+
+    def transcribe_batch_to_sentences(self, audio_inputs: List[Union[str, Any]],
+                                      batch_size: int = 8,
+                                      merge_sentences: bool = True,
+                                      min_duration: float = 8.0,
+                                      max_gap: float = 2.0) -> List[List[Dict[str, Any]]]:
+        """
+        批量转录并按输入拆分为句子列表（格式与 process_transcription_result 相同）
+
+        Args:
+            audio_inputs: 音频文件路径或波形数组的列表
+            batch_size: 每批解码的窗口数
+            merge_sentences: 是否合并短句子
+            min_duration: 最小段落持续时间（秒）
+            max_gap: 句子间最大合并间隔（秒）
+
+        Returns:
+            List[List[Dict]]: 每个输入对应的句子列表
+        """
+        all_sentences = []
+        for result in self.transcribe_batch(audio_inputs, batch_size):
+            sentences = self.process_transcription_result(result)
+            if merge_sentences:
+                sentences = self.merge_short_sentences(sentences, min_duration, max_gap)
+            all_sentences.append(sentences)
+        return all_sentences
+
+    def split_timestamped_tokens(self, tokens: List[int], tokenizer, time_precision: float,
+                                 window_duration: float) -> List[tuple]:
+        """
+        按时间戳标记把解码得到的 token 序列切成语句
+
+        Returns:
+            List[tuple]: (开始秒数, 结束秒数, 文本token列表)
+        """
+        segments = []
+        start = None
+        last_timestamp = 0.0
+        text_tokens = []
+        for token in tokens:
+            if token >= tokenizer.timestamp_begin:
+                timestamp = (token - tokenizer.timestamp_begin) * time_precision
+                last_timestamp = timestamp
+                if start is not None and text_tokens:
+                    segments.append((start, timestamp, text_tokens))
+                    start = None
+                    text_tokens = []
+                else:
+                    start = timestamp
+            elif token < tokenizer.eot:
+                # 上一句结束后没有新的开始时间戳，新语句从上一个时间戳开始
+                if start is None:
+                    start = last_timestamp
+                text_tokens.append(token)
+        if text_tokens:
+            segments.append((start, window_duration, text_tokens))
+        return segments
+
+    def write_checkpoint(self, state: Dict[str, Any], checkpoint_path: str):
+        """原子地写入检查点文件（先写临时文件再重命名）"""
+        tmp_path = checkpoint_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, checkpoint_path)
+
     def format_timestamp(self, seconds: float) -> str:
         """
         将秒数转换为时间戳格式 (HH:MM:SS.mmm)
@@ -124,22 +703,28 @@ class VideoToTextConverter:
         Returns:
             List[Dict]: 包含句子和时间戳的列表
         """
-        sentences = []
+        segments = [
+            segment for segment in result.get("segments", [])
+            if segment.get("text", "").strip()  # 只添加非空文本
+        ]
+        starts = [segment.get("start", 0) for segment in segments]
+        ends = [segment.get("end", 0) for segment in segments]
         
-        if "segments" in result:
-            for segment in result["segments"]:
-                sentence_data = {
-                    "id": segment.get("id", 0),
-                    "text": segment.get("text", "").strip(),
-                    "start_time": segment.get("start", 0),
-                    "end_time": segment.get("end", 0),
-                    "start_timestamp": self.format_timestamp(segment.get("start", 0)),
-                    "end_timestamp": self.format_timestamp(segment.get("end", 0)),
-                    "duration": segment.get("end", 0) - segment.get("start", 0)
-                }
-                
-                if sentence_data["text"]:  # 只添加非空文本
-                    sentences.append(sentence_data)
+        # 批量格式化时间戳
+        start_timestamps = format_timestamps(starts)
+        end_timestamps = format_timestamps(ends)
+        
+        sentences = []
+        for i, segment in enumerate(segments):
+            sentences.append({
+                "id": segment.get("id", 0),
+                "text": segment.get("text", "").strip(),
+                "start_time": starts[i],
+                "end_time": ends[i],
+                "start_timestamp": start_timestamps[i],
+                "end_timestamp": end_timestamps[i],
+                "duration": ends[i] - starts[i]
+            })
         
         return sentences
     
@@ -203,68 +788,95 @@ class VideoToTextConverter:
         
         return merged_sentences
     
-    def save_results(self, sentences: List[Dict[str, Any]], output_path: str, format_type: str = "json"):
+    def save_results(self, sentences: List[Dict[str, Any]], output_path: str, format_type: str = "json") -> bool:
         """
         保存转录结果到文件
         
         Args:
             sentences: 句子列表
             output_path: 输出文件路径
-            format_type: 输出格式 ("json", "txt", "srt")
+            format_type: 输出格式 ("json", "txt", "srt", "vtt", "jsonl")
+            
+        Returns:
+            bool: 是否保存成功
         """
-        try:
-            if format_type.lower() == "json":
-                self.save_as_json(sentences, output_path)
-            elif format_type.lower() == "txt":
-                self.save_as_txt(sentences, output_path)
-            elif format_type.lower() == "srt":
-                self.save_as_srt(sentences, output_path)
+        report = self.export_results(sentences, {format_type: output_path})
+        return all(item["error"] is None for item in report.values())
+    
+    def export_results(self, sentences: List[Dict[str, Any]],
+                       output_paths: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+        """
+        一次遍历句子数据，并发导出多种格式（原子写入）
+        
+        Args:
+            sentences: 句子列表
+            output_paths: 格式到输出路径的映射
+            
+        Returns:
+            Dict: 每种格式的导出报告 {"path", "bytes", "seconds", "error"}
+        """
+        report = export_documents(sentences, output_paths)
+        for format_type, item in report.items():
+            if item["error"] is None:
+                print(f"结果已保存为{format_type.upper()}格式: {item['path']} "
+                      f"({item['bytes']} 字节, {item['seconds'] * 1000:.1f} ms)")
             else:
-                print(f"不支持的输出格式: {format_type}")
-                
-        except Exception as e:
-            print(f"保存文件失败: {e}")
+                print(f"保存{format_type.upper()}文件失败: {item['error']}")
+        return report
     
     def save_as_json(self, sentences: List[Dict[str, Any]], output_path: str):
         """保存为JSON格式"""
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump({
-                "total_sentences": len(sentences),
-                "sentences": sentences
-            }, f, ensure_ascii=False, indent=2)
+        write_document(output_path, render_json(sentences))
         print(f"结果已保存为JSON格式: {output_path}")
     
     def save_as_txt(self, sentences: List[Dict[str, Any]], output_path: str):
         """保存为TXT格式"""
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write("视频语音转文字结果\n")
-            f.write("=" * 50 + "\n\n")
-            
-            for sentence in sentences:
-                f.write(f"[{sentence['start_timestamp']} --> {sentence['end_timestamp']}]\n")
-                f.write(f"{sentence['text']}\n\n")
-        
+        write_document(output_path, render_txt(sentences))
         print(f"结果已保存为TXT格式: {output_path}")
     
     def save_as_srt(self, sentences: List[Dict[str, Any]], output_path: str):
         """保存为SRT字幕格式"""
-        with open(output_path, 'w', encoding='utf-8') as f:
-            for i, sentence in enumerate(sentences, 1):
-                # SRT格式时间戳 (HH:MM:SS,mmm)
-                start_time = sentence['start_timestamp'].replace('.', ',')
-                end_time = sentence['end_timestamp'].replace('.', ',')
-                
-                f.write(f"{i}\n")
-                f.write(f"{start_time} --> {end_time}\n")
-                f.write(f"{sentence['text']}\n\n")
-        
+        write_document(output_path, render_srt(sentences))
         print(f"结果已保存为SRT格式: {output_path}")
     
+    def update_index(self, index_db: str, transcript_path: str = None) -> bool:
+        """
+        把转录JSON导入全文索引（索引失败不影响转换结果）
+        
+        Args:
+            index_db: 索引数据库路径
+            transcript_path: 转录JSON文件路径
+            
+        Returns:
+            bool: 是否成功导入
+        """
+        if not transcript_path:
+            print("未输出JSON格式，跳过索引更新")
+            return False
+        try:
+            index = TranscriptIndex(index_db)
+            try:
+                count = index.ingest_file(transcript_path, force=True)
+            finally:
+                index.close()
+            print(f"已将 {count} 个段落导入索引: {index_db}")
+            return True
+        except (OSError, ValueError, sqlite3.Error) as e:
+            print(f"更新索引失败: {e}")
+            return False
+    
     def convert_video_to_text(self, video_path: str, output_dir: str = None, 
                             output_formats: List[str] = None, 
                             min_duration: float = 8.0, 
                             max_gap: float = 2.0, 
-                            merge_sentences: bool = True) -> bool:
+                            merge_sentences: bool = True,
+                            checkpoint: bool = False,
+                            chunk_duration: float = 600.0,
+                            index_db: str = None,
+                            cascade_model: str = None,
+                            logprob_threshold: float = -0.8,
+                            fingerprint_db: str = None,
+                            profile: bool = False) -> bool:
         """
         完整的视频转文字流程
         
@@ -275,6 +887,15 @@ class VideoToTextConverter:
             min_duration: 最小段落持续时间（秒）
             max_gap: 句子间最大合并间隔（秒）
             merge_sentences: 是否合并短句子
+            checkpoint: 是否启用分块检查点（中断后重新运行会从最后完成的块继续）
+            chunk_duration: 启用检查点时每块音频时长（秒）
+            index_db: 转录索引数据库路径，给出时将生成的JSON结果增量导入索引
+            cascade_model: 级联复核模型大小，给出时用它重新解码低置信度的语句
+            logprob_threshold: 级联复核的平均对数概率阈值
+            fingerprint_db: 音频指纹索引数据库路径，给出时复用重复上传文件的已有转录，
+                            并把本次结果登记到索引
+            profile: 是否分阶段采集性能分析数据（调用栈、cProfile 统计和 torch 算子耗时），
+                     结果写在转录文件旁
             
         Returns:
             bool: 是否成功完成转换
@@ -299,54 +920,93 @@ class VideoToTextConverter:
         # 生成临时音频文件路径
         video_name = Path(video_path).stem
         audio_path = os.path.join(output_dir, f"{video_name}_temp_audio.wav")
+        checkpoint_path = os.path.join(output_dir, f"{video_name}_transcript.checkpoint.json")
+        completed = False
+        profiler = StageProfiler(output_dir, f"{video_name}_profile", enabled=profile)
+        
+        # 源视频指纹：检查点只对同一个源文件有效（同名的其他视频或重新上传的文件都要重新提取）
+        source = file_fingerprint(video_path) if checkpoint else None
         
         try:
-            # 步骤1: 提取音频
-            if not self.extract_audio_from_video(video_path, audio_path):
-                return False
+            # 步骤1: 提取音频（同一源文件的检查点存在时，上次提取的音频已完整，可直接复用）
+            with profiler.stage("extract_audio"):
+                if checkpoint and os.path.exists(audio_path) \
+                        and self.read_checkpoint(checkpoint_path).get("source") == source:
+                    print(f"复用已提取的音频: {audio_path}")
+                elif not self.extract_audio_from_video(video_path, audio_path):
+                    return False
             
-            # 步骤2: 语音识别
-            result = self.transcribe_audio(audio_path)
+            # 步骤2: 语音识别（给出指纹索引时先匹配已转录的源文件，只识别未匹配的区间）
+            with profiler.stage("asr", torch_ops=True):
+                result, fingerprint = {}, {}
+                if fingerprint_db:
+                    result, fingerprint = self.transcribe_with_fingerprints(video_path, audio_path, fingerprint_db)
+                if not result:
+                    if checkpoint:
+                        result = self.transcribe_audio_checkpointed(audio_path, checkpoint_path, chunk_duration,
+                                                                    source=source)
+                    else:
+                        result = self.transcribe_audio(audio_path)
             if not result:
                 return False
             
-            # 步骤3: 处理结果
-            sentences = self.process_transcription_result(result)
-            if not sentences:
-                print("未识别到任何文字内容")
-                return False
+            # 步骤2.5: 级联复核低置信度语句
+            if cascade_model:
+                with profiler.stage("cascade", torch_ops=True):
+                    result = self.refine_low_confidence(audio_path, result, cascade_model, logprob_threshold)
             
-            print(f"原始识别到 {len(sentences)} 个语句")
+            # 步骤2.6: 登记音频指纹，供之后重复上传的文件复用
+            if fingerprint:
+                self.register_fingerprint(fingerprint_db, video_path, fingerprint, result)
             
-            # 步骤3.5: 合并短句子
-            if merge_sentences:
-                merged_sentences = self.merge_short_sentences(sentences, min_duration, max_gap)
-                print(f"合并后得到 {len(merged_sentences)} 个段落")
-                final_sentences = merged_sentences
-            else:
-                print("跳过句子合并")
-                final_sentences = sentences
-            
-            # 步骤4: 保存结果
-            for format_type in output_formats:
-                if format_type.lower() == "json":
-                    output_path = os.path.join(output_dir, f"{video_name}_transcript.json")
-                elif format_type.lower() == "txt":
-                    output_path = os.path.join(output_dir, f"{video_name}_transcript.txt")
-                elif format_type.lower() == "srt":
-                    output_path = os.path.join(output_dir, f"{video_name}_transcript.srt")
-                else:
-                    continue
+            # 步骤3: 处理结果
+            with profiler.stage("postprocess"):
+                sentences = self.process_transcription_result(result)
+                if not sentences:
+                    print("未识别到任何文字内容")
+                    return False
+                
+                print(f"原始识别到 {len(sentences)} 个语句")
                 
-                self.save_results(final_sentences, output_path, format_type)
+                # 步骤3.5: 合并短句子
+                if merge_sentences:
+                    merged_sentences = self.merge_short_sentences(sentences, min_duration, max_gap)
+                    print(f"合并后得到 {len(merged_sentences)} 个段落")
+                    final_sentences = merged_sentences
+                else:
+                    print("跳过句子合并")
+                    final_sentences = sentences
             
+            # 步骤4: 保存结果（所有格式一次遍历、并发写出）
+            output_paths = {
+                format_type.lower(): os.path.join(output_dir, f"{video_name}_transcript.{format_type.lower()}")
+                for format_type in output_formats
+                if format_type.lower() in SUPPORTED_FORMATS
+            }
+            with profiler.stage("export"):
+                report = self.export_results(final_sentences, output_paths)
+            if any(item["error"] is not None for item in report.values()):
+                return False
+            
+            # 步骤5: 增量更新转录索引
+            if index_db:
+                with profiler.stage("index"):
+                    self.update_index(index_db, output_paths.get("json"))
+            
+            completed = True
             return True
             
         finally:
-            # 清理临时音频文件
-            if os.path.exists(audio_path):
-                os.remove(audio_path)
-                print("已清理临时音频文件")
+            profiler.write_report()
+            # 清理临时音频文件（启用检查点时，只在成功后清理，以便中断后继续）
+            if checkpoint and not completed:
+                print(f"检查点已保存，重新运行即可继续: {checkpoint_path}")
+            else:
+                if os.path.exists(audio_path):
+                    os.remove(audio_path)
+                    print("已清理临时音频文件")
+                if os.path.exists(checkpoint_path):
+                    os.remove(checkpoint_path)
 
 
 def main():
@@ -355,7 +1015,7 @@ def main():
     parser.add_argument("-o", "--output", help="输出目录（默认为视频文件所在目录）")
     parser.add_argument("-m", "--model", choices=["tiny", "base", "small", "medium", "large"], 
                        default="base", help="Whisper模型大小（默认: base）")
-    parser.add_argument("-f", "--formats", nargs="+", choices=["json", "txt", "srt"], 
+    parser.add_argument("-f", "--formats", nargs="+", choices=list(SUPPORTED_FORMATS), 
                        default=["json", "txt"], help="输出格式（默认: json txt）")
     parser.add_argument("--min-duration", type=float, default=20.0,
                        help="最小段落持续时间（秒），默认: 20.0")
@@ -363,11 +1023,28 @@ def main():
                        help="句子间最大合并间隔（秒），默认: 3.0")
     parser.add_argument("--no-merge", action="store_true",
                        help="禁用句子合并，保留原始短句子")
+    parser.add_argument("--checkpoint", action="store_true",
+                       help="启用分块检查点，中断后重新运行同一命令即可继续")
+    parser.add_argument("--chunk-duration", type=float, default=600.0,
+                       help="启用检查点时每块音频时长（秒），默认: 600.0")
+    parser.add_argument("--cascade-model", choices=["small", "medium", "large"],
+                       help="级联模式：先用 -m 指定的模型快速识别，再用该模型重新解码低置信度语句")
+    parser.add_argument("--logprob-threshold", type=float, default=-0.8,
+                       help="级联模式下平均对数概率低于该值的语句会被复核，默认: -0.8")
+    parser.add_argument("--fingerprint-db",
+                       help="音频指纹索引数据库路径，重复上传的视频复用已有转录，只识别未匹配的部分")
+    parser.add_argument("--profile", action="store_true",
+                       help="分阶段性能分析：输出调用栈（collapsed 格式）、cProfile 统计和识别阶段的 torch 算子耗时")
+    parser.add_argument("--index-db",
+                       help="转录索引数据库路径，转换完成后将JSON结果增量导入索引")
     
     args = parser.parse_args()
     
     # 创建转换器
-    converter = VideoToTextConverter(model_size=args.model)
+    try:
+        converter = VideoToTextConverter(model_size=args.model)
+    except RuntimeError:
+        sys.exit(1)
     
     # 执行转换
     success = converter.convert_video_to_text(
@@ -376,7 +1053,14 @@ def main():
         output_formats=args.formats,
         min_duration=args.min_duration,
         max_gap=args.max_gap,
-        merge_sentences=not args.no_merge
+        merge_sentences=not args.no_merge,
+        checkpoint=args.checkpoint,
+        chunk_duration=args.chunk_duration,
+        index_db=args.index_db,
+        cascade_model=args.cascade_model,
+        logprob_threshold=args.logprob_threshold,
+        fingerprint_db=args.fingerprint_db,
+        profile=args.profile
     )
     
     if success: